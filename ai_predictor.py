@@ -1,19 +1,78 @@
 # ai_predictor.py - REAL TRAINED AI MODEL (NOT DUMMY ANYMORE)
 import time
-import sqlite3
 import joblib
 import numpy as np
 from datetime import datetime
 import os
+import sys
+import json
+import signal
+from alert_engine import AlertEngine, alert_patients
+from write_behind import WriteBehindWriter, PREDICTION_SQL
+from feature_store import FeatureStore, FEATURE_NAMES
+from collections import deque
+import vitals_channel
+import event_bus
+import database
+import risk_models
+import storage
+from loop_profiler import LoopProfiler
 
 MODEL_PATH = "real_hospital_model.pkl"
+MODEL_NAME = "Real ICU AI v2"
+RISK_THRESHOLD = 0.52  # Fine-tuned threshold
+
+# New readings arrive over the shared-memory channel (vitals_channel.py) and
+# the loop sleeps on the event bus (event_bus.py) until a producer announces
+# them; the SQLite poll is only a backstop for rows neither delivered.
+# CHANNEL_POLL is the fallback wakeup interval while the bus is down.
+CHANNEL_POLL = float(os.environ.get("PREDICTOR_CHANNEL_POLL", "0.01"))  # seconds
+DB_POLL = 3  # seconds
+
+# Written once the model is loaded and the loop is about to start (run_all.py
+# waits for it); holds our pid so a file left by a killed run is not trusted.
+READY_PATH = "ai_predictor.ready"
+
+# DISTILLED MODELS (distill_model.py)
+# With a per-reading latency budget set, the most faithful model in
+# risk_models.json that fits it (and agrees with the forest on at least
+# MIN_AGREEMENT of labels) is used instead of the 300-tree forest.
+LATENCY_BUDGET_US = os.environ.get("PREDICTOR_LATENCY_BUDGET_US")
+MIN_AGREEMENT = float(os.environ.get("PREDICTOR_MIN_AGREEMENT", "0.99"))
+
+# SCORING CASCADE
+# Unambiguous readings are decided by vectorized rules; only the band in
+# between goes to the 300-tree forest. Every prediction records its stage.
+#   rule_critical : generate_vitals.classify_status CRITICAL cut-offs, except
+#                   SpO2 < 85 instead of < 90 - the forest scores an isolated
+#                   SpO2 of 85-89 as low risk, and the rules must agree with it
+#   rule_normal   : every vital comfortably inside the normal range
+#   model         : everything else
+# bench_cascade.py reports throughput and agreement with model-only scoring.
+CASCADE = {
+    "enabled": os.environ.get("PREDICTOR_CASCADE", "1") != "0",
+    "critical_hr_above": 130,
+    "critical_temp_at_least": 39.0,
+    "critical_spo2_below": 85,
+    "normal_hr": (55, 100),
+    "normal_temp": (36.0, 37.5),
+    "normal_spo2_at_least": 95,
+    "critical_prob": 0.99,
+    "normal_prob": 0.01,
+}
+
+
+def load_or_train_model():
+    # TRAIN A REAL MODEL IF NOT EXISTS
+    if os.path.exists(MODEL_PATH):
+        model = joblib.load(MODEL_PATH)
+        print("[OK] Loaded real trained AI model")
+        return model
 
-# TRAIN A REAL MODEL IF NOT EXISTS
-if not os.path.exists(MODEL_PATH):
     print("Training REAL AI model from actual hospital patterns...")
-    
+
     # Connect to DB to collect training data from simulator behavior
-    conn = sqlite3.connect("hospital.db")
+    conn = storage.connect()
     c = conn.cursor()
     c.execute("SELECT heart_rate_bpm, temperature_c, spo2_percent, health_status FROM vitals WHERE health_status IS NOT NULL")
     rows = c.fetchall()
@@ -24,29 +83,24 @@ if not os.path.exists(MODEL_PATH):
         # Generate realistic training data based on medical rules
         np.random.seed(42)
         n_samples = 2000
-        
+
         hr = np.random.normal(90, 20, n_samples)
         temp = np.random.normal(37.0, 0.8, n_samples)
         spo2 = np.random.normal(96, 4, n_samples)
-        
+
         # Simulate critical cases
         critical = np.random.choice([True, False], n_samples, p=[0.25, 0.75])
         hr[critical] = np.random.normal(135, 20, sum(critical))
         temp[critical] = np.random.normal(39.2, 0.9, sum(critical))
         spo2[critical] = np.random.normal(82, 6, sum(critical))
-        
+
         X = np.column_stack([hr, temp, spo2])
         y = critical.astype(int)
     else:
         X = np.array([[r[0], r[1], r[2]] for r in rows])
         y = np.array([1 if r[3] == "CRITICAL" else 0 for r in rows])
 
-    # Normalize features
-    X_norm = np.column_stack([
-        X[:,0] / 200,    # HR
-        (X[:,1] - 30) / 15,  # Temp (30–45 range)
-        X[:,2] / 100     # SpO2
-    ])
+    X_norm = normalize(X[:,0], X[:,1], X[:,2])
 
     from sklearn.ensemble import RandomForestClassifier
     model = RandomForestClassifier(
@@ -60,47 +114,260 @@ if not os.path.exists(MODEL_PATH):
     joblib.dump(model, MODEL_PATH)
     print(f"REAL AI MODEL TRAINED & SAVED → {MODEL_PATH}")
     print(f"   Accuracy on training: {model.score(X_norm, y):.1%}")
-else:
-    model = joblib.load(MODEL_PATH)
-    print("[OK] Loaded real trained AI model")
-
-# MAIN PREDICTION LOOP
-print("[OK] AI Predictor loop: monitoring and classifying vital signs...")
-while True:
-    conn = sqlite3.connect("hospital.db")
+    return model
+
+
+def load_model():
+    """The model to score with, and the model_name its predictions are recorded under."""
+    if LATENCY_BUDGET_US:
+        manifest = risk_models.load_manifest()
+        chosen = manifest and risk_models.select_model(manifest, float(LATENCY_BUDGET_US), MIN_AGREEMENT)
+        if not chosen or not os.path.exists(chosen["path"]):
+            print(f"[WARN] No model in {risk_models.MANIFEST_PATH} fits {LATENCY_BUDGET_US} µs/reading "
+                  f"- run distill_model.py; using the forest")
+        elif chosen["path"] != MODEL_PATH:
+            model = joblib.load(chosen["path"])
+            print(f"[OK] Loaded distilled model {chosen['name']} ({chosen['latency_us']['1']} µs/reading, "
+                  f"{chosen['label_agreement']:.2%} label agreement with the forest)")
+            return model, f"{MODEL_NAME} / {chosen['name']}"
+    return load_or_train_model(), MODEL_NAME
+
+
+def normalize(hr, temp, spo2):
+    """Model feature space: HR/200, temp over the 30–45 range, SpO2/100."""
+    return np.column_stack([
+        np.asarray(hr, dtype=float) / 200,
+        (np.asarray(temp, dtype=float) - 30) / 15,
+        np.asarray(spo2, dtype=float) / 100,
+    ])
+
+
+def takes_trend(model):
+    """True for a model trained on the base features plus feature_store's FEATURE_NAMES."""
+    return getattr(model, "n_features_in_", 3) == 3 + len(FEATURE_NAMES)
+
+
+def model_inputs(model, hr, temp, spo2, trend=None):
+    """Base features, plus the rolling trend features for a model trained with them."""
+    X = normalize(hr, temp, spo2)
+    if trend is not None and takes_trend(model):
+        X = np.column_stack([X, trend])
+    return X
+
+
+def score(model, hr, temp, spo2, cascade=CASCADE, trend=None):
+    """Score a batch of readings. Returns (probabilities, stage per row).
+
+    trend is an optional (n, len(FEATURE_NAMES)) array from feature_store;
+    it is only fed to models that take those extra inputs.
+    """
+    hr = np.asarray(hr, dtype=float)
+    temp = np.asarray(temp, dtype=float)
+    spo2 = np.asarray(spo2, dtype=float)
+    probs = np.empty(len(hr))
+    stages = np.full(len(hr), "model", dtype=object)
+
+    if cascade and cascade["enabled"]:
+        critical = ((hr > cascade["critical_hr_above"])
+                    | (temp >= cascade["critical_temp_at_least"])
+                    | (spo2 < cascade["critical_spo2_below"]))
+        normal = (~critical
+                  & (hr >= cascade["normal_hr"][0]) & (hr <= cascade["normal_hr"][1])
+                  & (temp >= cascade["normal_temp"][0]) & (temp <= cascade["normal_temp"][1])
+                  & (spo2 >= cascade["normal_spo2_at_least"]))
+        probs[critical] = cascade["critical_prob"]
+        probs[normal] = cascade["normal_prob"]
+        stages[critical] = "rule_critical"
+        stages[normal] = "rule_normal"
+        ambiguous = ~(critical | normal)
+    else:
+        ambiguous = np.ones(len(hr), dtype=bool)
+
+    if ambiguous.any():
+        X = model_inputs(model, hr[ambiguous], temp[ambiguous], spo2[ambiguous],
+                         None if trend is None else np.asarray(trend, dtype=float)[ambiguous])
+        probs[ambiguous] = model.predict_proba(X)[:, 1]
+    return probs, stages
+
+
+def ensure_prediction_columns(conn):
+    """Add predictions.stage (and the vitals_id index the poll probes) to an older database."""
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(predictions)")}
+    if "stage" not in cols:
+        conn.execute("ALTER TABLE predictions ADD COLUMN stage TEXT")
+    conn.commit()
+    database.create_history_indexes(conn)
+
+
+def process_rows(model, rows, writer, alerts, store, model_name=MODEL_NAME):
+    """Score one batch of (vitals id, patient, hr, temp, spo2, status, timestamp) rows and queue the writes.
+
+    store is the FeatureStore of a model that takes trend features, None otherwise.
+    """
+    _, _, hrs, temps, spo2s, _, _ = zip(*rows)
+
+    # Rolling trend features come from memory, not from another history query
+    trend = None
+    if store is not None:
+        trend = []
+        for vid, pid, hr, temp, spo2, status, ts in rows:
+            store.push(pid, ts, hr, temp, spo2)
+            trend.append(store.features(pid))
+    probs, stages = score(model, hrs, temps, spo2s, trend=trend)
+
+    for i, ((vid, pid, hr, temp, spo2, status, ts), prob, stage) in enumerate(zip(rows, probs, stages)):
+        prob = float(prob)
+        label = "High Risk" if prob > RISK_THRESHOLD else "Low Risk"
+        confidence = round(prob, 3)
+        detail = {"risk_score": confidence, "hr": hr, "temp": temp, "spo2": spo2, "stage": stage}
+        if trend is not None:
+            # The inputs the model was scored on
+            detail["trend"] = {name: round(value, 3) for name, value in zip(FEATURE_NAMES, trend[i])}
+
+        writer.add_prediction((
+            datetime.utcnow().isoformat(), pid, model_name, json.dumps(detail),
+            label, confidence, vid, stage))
+
+        # Open / extend / resolve the patient's alert episode (HIGH confidence critical opens one)
+        event = alerts.observe(writer, pid, vid, prob, hr, temp, spo2)
+        if event in ("opened", "reopened", "resolved"):
+            print(f"[ALERT] {pid} episode {event} (risk {confidence:.1%}, {stage})")
+
+
+class RecentIds:
+    """Bounded set of recently scored vitals ids (a reading can arrive by channel and by DB poll)."""
+    def __init__(self, maxlen=100000):
+        self.order = deque()
+        self.ids = set()
+        self.maxlen = maxlen
+
+    def add(self, vid):
+        """Remember vid; False if it was already seen."""
+        if vid in self.ids:
+            return False
+        self.ids.add(vid)
+        self.order.append(vid)
+        if len(self.order) > self.maxlen:
+            self.ids.discard(self.order.popleft())
+        return True
+
+
+def poll_db(writer):
+    conn = storage.connect()
     c = conn.cursor()
-    
+
+    # Rows already scored and waiting in the write buffer are skipped by id, not by
+    # a floor: channel rows can be scored ahead of older rows still unscored here
     c.execute("""
-        SELECT v.id, v.patient_id, heart_rate_bpm, temperature_c, spo2_percent, health_status
+        SELECT v.id, v.patient_id, heart_rate_bpm, temperature_c, spo2_percent, health_status,
+               v.timestamp_utc
         FROM vitals v
-        LEFT JOIN predictions p ON v.id = p.vitals_id
-        WHERE p.vitals_id IS NULL
+        WHERE v.id NOT IN (SELECT value FROM json_each(?))
+          -- NOT EXISTS rather than LEFT JOIN: stays an index probe when predictions is a view
+          AND NOT EXISTS (SELECT 1 FROM predictions p WHERE p.vitals_id = v.id)
+        ORDER BY v.id
         LIMIT 15
-    """)
+    """, (json.dumps(writer.pending_vitals()),))
     rows = c.fetchall()
+    conn.close()
+    return rows
 
-    for row in rows:
-        vid, pid, hr, temp, spo2, status = row
-        
-        features = np.array([[hr/200, (temp-30)/15, spo2/100]])
-        prob = model.predict_proba(features)[0][1]
-        label = "High Risk" if prob > 0.52 else "Low Risk"  # Fine-tuned threshold
-        confidence = round(prob, 3)
 
-        c.execute("""INSERT INTO predictions 
-            (timestamp_utc, patient_id, model_name, prediction_json, predicted_label, confidence, vitals_id)
-            VALUES (?,?,?,?,?,?,?)""",
-            (datetime.utcnow().isoformat(), pid, "Real ICU AI v2", 
-             f'{{"risk_score": {confidence}, "hr": {hr}, "temp": {temp}, "spo2": {spo2}}}',
-             label, confidence, vid))
+def read_channels(channels, attach=False):
+    """Drain every attached producer ring (attach=True also picks up new producers)."""
+    if attach and vitals_channel.ENABLED:
+        for name in vitals_channel.CHANNELS:
+            if channels.get(name) is None:
+                channels[name] = vitals_channel.VitalsChannel.attach(name)
+    rows = []
+    for ch in channels.values():
+        if ch is None:
+            continue
+        records, missed = ch.read()
+        if missed:
+            print(f"[WARN] vitals channel dropped {missed} readings; the DB poll will pick them up")
+        rows.extend((r["vitals_id"], r["patient_id"], r["heart_rate_bpm"], r["temperature_c"],
+                     r["spo2_percent"], r["health_status"], r["ts"]) for r in records)
+    return rows
 
-        # Trigger alert only for HIGH confidence critical
-        if prob > 0.7:
-            c.execute("""INSERT INTO alerts (timestamp_utc, patient_id, alert_type, alert_message, vitals_id)
-                         VALUES (?,?,?,?,?)""",
-                      (datetime.utcnow().isoformat(), pid, "AI Critical Alert",
-                       f"CRITICAL RISK DETECTED → {confidence:.1%} (HR:{hr} Temp:{temp}°C SpO2:{spo2}%)", vid))
 
-    conn.commit()
-    conn.close()
-    time.sleep(3)
\ No newline at end of file
+def announce_flush(bus, ops):
+    """Publish what a write-behind flush just committed."""
+    scored = [params for sql, params in ops if sql == PREDICTION_SQL]
+    if scored:
+        bus.publish("predictions", {"vitals_ids": [p[6] for p in scored],
+                                    "patients": sorted({p[1] for p in scored})})
+    patients = alert_patients(ops)
+    if patients:
+        bus.publish("alerts", {"patients": patients})
+
+
+def main():
+    model, model_name = load_model()
+
+    # Predictions/alerts are buffered and flushed in short batched transactions,
+    # and announced on the event bus once committed
+    publisher = event_bus.Publisher()
+    writer = WriteBehindWriter("hospital.db", on_flush=lambda ops: announce_flush(publisher, ops))
+    ensure_prediction_columns(writer.conn)
+
+    # One open alert per patient episode instead of one alert per critical reading
+    alerts = AlertEngine(writer.conn)
+
+    # Trend windows start from the already-scored history; new rows arrive via the loop.
+    # Only a model trained on them gets trend features, so only then is the store kept.
+    store = None
+    if takes_trend(model):
+        store = FeatureStore()
+        last_scored = writer.conn.execute("SELECT MAX(vitals_id) FROM predictions").fetchone()[0] or 0
+        print(f"[OK] Feature store warmed with {store.warm(writer.conn, last_scored)} readings")
+
+    # run_all.py stops us with SIGTERM: turn it into SystemExit so the buffer is flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # MAIN PREDICTION LOOP
+    with open(READY_PATH, "w") as f:
+        f.write(str(os.getpid()))
+    print("[OK] AI Predictor loop: monitoring and classifying vital signs...")
+    channels = {}
+    recent = RecentIds()
+    bus = event_bus.Subscriber(["vitals"])
+    announced = []
+    next_db_poll = 0.0
+    profiler = LoopProfiler("ai_predictor")  # LOOP_PROFILE=1, see loop_profiler.py
+    try:
+        while True:
+            with profiler.cycle():
+                now = time.monotonic()
+                due = now >= next_db_poll
+                rows = read_channels(channels, attach=due)  # look for new producers at DB-poll pace
+
+                # Announced readings the channel did not carry are fetched from the DB right away
+                delivered = {r[0] for r in rows}
+                if due or any(vid not in delivered and vid not in recent.ids for vid in announced):
+                    rows.extend(poll_db(writer))
+                    next_db_poll = now + DB_POLL
+
+                rows = sorted(r for r in rows if recent.add(r[0]))
+                if rows:
+                    process_rows(model, rows, writer, alerts, store, model_name)
+                writer.maybe_flush()
+
+            # Sleep until a producer announces vitals, the buffer is due or the backstop poll
+            events = bus.wait(min(next_db_poll - time.monotonic(), writer.seconds_until_flush()))
+            if events is None:  # bus down: fall back to timed polling
+                announced = []
+                time.sleep(CHANNEL_POLL if any(channels.values()) else DB_POLL)
+            else:
+                announced = [vid for e in events if e["topic"] == "vitals"
+                             for vid in (e["data"] or {}).get("ids", ())]
+    finally:
+        if os.path.exists(READY_PATH):
+            os.remove(READY_PATH)
+        writer.close()
+        bus.close()
+        publisher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# alert_engine.py - PER-PATIENT ALERT EPISODES (OPEN → UPDATED → RESOLVED)
+"""
+Coalesces AI risk scores into one alert row per clinical episode instead of
+one row per critical reading.
+
+    no episode --prob > OPEN_THRESHOLD--> open (INSERT, handled=0)
+    open       --still high-------------> updated (UPDATE same row, throttled)
+    open       --RESOLVE_AFTER readings below RESOLVE_THRESHOLD--> resolved (handled=1)
+    resolved   --prob > OPEN_THRESHOLD within COOLDOWN_SECONDS--> same row reopened
+
+The gap between OPEN_THRESHOLD and RESOLVE_THRESHOLD is the hysteresis band:
+a patient hovering around 0.7 keeps a single open episode instead of
+flapping. While open, the row is only rewritten when the peak risk rises or
+every UPDATE_INTERVAL seconds, so writes scale with episodes, not samples.
+
+Every statement addresses the open row by (patient_id, handled) rather than
+by alert id, so callers may queue the writes (see write_behind.py later on)
+without needing lastrowid.
+"""
+import time
+from datetime import datetime, timezone
+
+ALERT_TYPE = "AI Critical Alert"
+OPEN_THRESHOLD = 0.7       # same trigger as the old per-reading alert
+RESOLVE_THRESHOLD = 0.5    # must drop below this to count toward resolution
+RESOLVE_AFTER = 3          # consecutive low readings that close an episode
+COOLDOWN_SECONDS = 300     # re-trigger inside this window reopens the last episode
+UPDATE_INTERVAL = 60       # max age of samples/updated_utc on an open row
+
+OPEN_SQL = """INSERT INTO alerts
+    (timestamp_utc, patient_id, alert_type, alert_message, vitals_id, handled,
+     updated_utc, samples, peak_confidence)
+    VALUES (?,?,?,?,?,0,?,1,?)"""
+UPDATE_SQL = """UPDATE alerts SET alert_message = ?, vitals_id = ?, updated_utc = ?,
+    samples = ?, peak_confidence = ?
+    WHERE patient_id = ? AND handled = 0"""
+RESOLVE_SQL = """UPDATE alerts SET handled = 1, updated_utc = ?, samples = ?
+    WHERE patient_id = ? AND handled = 0"""
+REOPEN_SQL = """UPDATE alerts SET handled = 0, alert_message = ?, vitals_id = ?, updated_utc = ?,
+    samples = samples + 1, peak_confidence = MAX(COALESCE(peak_confidence, 0), ?)
+    WHERE id = (SELECT MAX(id) FROM alerts WHERE patient_id = ? AND handled = 1)"""
+
+# Position of patient_id in each statement's parameters
+PATIENT_PARAM = {OPEN_SQL: 1, UPDATE_SQL: 5, RESOLVE_SQL: 2, REOPEN_SQL: 4}
+
+
+def alert_patients(ops):
+    """Patients whose alert rows are touched by a list of (sql, params) statements."""
+    return sorted({params[PATIENT_PARAM[sql]] for sql, params in ops if sql in PATIENT_PARAM})
+
+
+def ensure_alert_columns(conn):
+    """Add the episode columns to an alerts table created by an older database.py."""
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+    for name, decl in (("updated_utc", "TEXT"), ("samples", "INTEGER DEFAULT 1"),
+                       ("peak_confidence", "REAL")):
+        if name not in cols:
+            conn.execute(f"ALTER TABLE alerts ADD COLUMN {name} {decl}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts(patient_id, handled)")
+    conn.commit()
+
+
+def alert_message(prob, hr, temp, spo2):
+    return f"CRITICAL RISK DETECTED → {prob:.1%} (HR:{hr} Temp:{temp}°C SpO2:{spo2}%)"
+
+
+def _epoch(iso):
+    """updated_utc (ISO-8601, naive means UTC as observe() writes it) -> epoch seconds."""
+    try:
+        dt = datetime.fromisoformat(iso)
+    except (TypeError, ValueError):
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class Episode:
+    def __init__(self, is_open, peak=0.0, samples=0, last_write=0.0, resolved_at=0.0):
+        self.is_open = is_open
+        self.peak = peak
+        self.samples = samples
+        self.low_streak = 0
+        self.last_write = last_write
+        self.resolved_at = resolved_at
+
+
+class AlertEngine:
+    def __init__(self, conn, open_threshold=OPEN_THRESHOLD, resolve_threshold=RESOLVE_THRESHOLD,
+                 resolve_after=RESOLVE_AFTER, cooldown=COOLDOWN_SECONDS, update_interval=UPDATE_INTERVAL):
+        if resolve_threshold > open_threshold:
+            raise ValueError("resolve_threshold must not exceed open_threshold")
+        self.open_threshold = open_threshold
+        self.resolve_threshold = resolve_threshold
+        self.resolve_after = resolve_after
+        self.cooldown = cooldown
+        self.update_interval = update_interval
+        self.episodes = {}
+        ensure_alert_columns(conn)
+        self._load(conn)
+
+    def _load(self, conn):
+        """Rebuild in-memory state from the DB so a restart does not duplicate episodes."""
+        for pid, peak, samples, updated in conn.execute(
+                "SELECT patient_id, peak_confidence, samples, updated_utc FROM alerts "
+                "WHERE handled = 0 AND alert_type = ?", (ALERT_TYPE,)):
+            self.episodes[pid] = Episode(True, peak or 0.0, samples or 1, _epoch(updated))
+        # The row REOPEN_SQL would reopen (newest resolved one); its peak and samples carry
+        # over, or the next UPDATE/RESOLVE would overwrite them with a count from zero
+        for pid, _, peak, samples, updated in conn.execute(
+                "SELECT patient_id, MAX(id), peak_confidence, samples, updated_utc FROM alerts "
+                "WHERE handled = 1 AND alert_type = ? GROUP BY patient_id", (ALERT_TYPE,)):
+            if pid not in self.episodes:
+                self.episodes[pid] = Episode(False, peak or 0.0, samples or 1, resolved_at=_epoch(updated))
+
+    def observe(self, c, pid, vid, prob, hr, temp, spo2, now=None):
+        """Feed one scored reading; write through cursor c if the episode changes.
+
+        Returns "opened", "reopened", "updated", "resolved" or None.
+        """
+        now = time.time() if now is None else now
+        ts = datetime.utcfromtimestamp(now).isoformat()
+        ep = self.episodes.get(pid)
+
+        if ep is None or not ep.is_open:
+            if prob <= self.open_threshold:
+                return None
+            msg = alert_message(prob, hr, temp, spo2)
+            if ep is not None and now - ep.resolved_at < self.cooldown:
+                c.execute(REOPEN_SQL, (msg, vid, ts, prob, pid))
+                ep.is_open, ep.low_streak, ep.last_write = True, 0, now
+                ep.samples += 1
+                ep.peak = max(ep.peak, prob)
+                return "reopened"
+            c.execute(OPEN_SQL, (ts, pid, ALERT_TYPE, msg, vid, ts, prob))
+            self.episodes[pid] = Episode(True, prob, 1, now)
+            return "opened"
+
+        ep.samples += 1
+        if prob < self.resolve_threshold:
+            ep.low_streak += 1
+            if ep.low_streak >= self.resolve_after:
+                c.execute(RESOLVE_SQL, (ts, ep.samples, pid))
+                ep.is_open, ep.resolved_at, ep.last_write = False, now, now
+                return "resolved"
+            return None
+
+        ep.low_streak = 0
+        if prob > ep.peak or now - ep.last_write >= self.update_interval:
+            ep.peak = max(ep.peak, prob)
+            c.execute(UPDATE_SQL, (alert_message(prob, hr, temp, spo2), vid, ts, ep.samples, ep.peak, pid))
+            ep.last_write = now
+            return "updated"
+        return None
@@ -1,14 +1,38 @@
 # api.py - ENHANCED VERSION WITH MOBILE APP INTEGRATION
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import asyncio
+import base64
+import gzip
+import json
+import os
 import sqlite3
 import uvicorn
 from datetime import datetime, timedelta
 import hashlib
 import secrets
 from typing import Optional
-
-app = FastAPI(title="Al-Salam Hospital API")
+from async_db import AsyncDB
+from response_cache import ResponseCache
+from fast_json import FastJSONResponse, RawJSONResponse, fetch_json_array, json_array_sql
+import math
+import numpy as np
+import early_warning
+import event_bus
+import compact_storage
+import database
+import storage
+import ai_predictor
+from micro_batcher import MicroBatcher
+
+app = FastAPI(title="Al-Salam Hospital API", default_response_class=FastJSONResponse)
+
+# Read endpoints run their queries on a dedicated DB executor (see async_db.py)
+db = AsyncDB()
+
+# /patients, /alerts and /dashboard/summary are cached until the next commit (see response_cache.py)
+cache = ResponseCache()
 
 # Enable CORS for Flutter Mobile & Web
 app.add_middleware(
@@ -20,12 +44,32 @@ app.add_middleware(
 )
 
 def get_db():
-    conn = sqlite3.connect("hospital.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    return storage.connect(row_factory=sqlite3.Row)
+
+
+@app.on_event("startup")
+def _migrate_db():
+    # serve.py already did this once for all workers
+    if os.environ.get("API_PRELOADED") != "1":
+        conn = storage.connect()
+        database.create_schema(conn)  # e.g. patient_latest on a database from an older version
+        conn.close()
+
+
+@app.on_event("shutdown")
+def _close_db():
+    db.close()
+    cache.close()
+
 
+# Auth tables only need creating once per process; serve.py creates them
+# before starting its workers and tells them so through API_PRELOADED.
+_auth_tables_ready = os.environ.get("API_PRELOADED") == "1"
 
 def _ensure_auth_tables():
+    global _auth_tables_ready
+    if _auth_tables_ready:
+        return
     conn = get_db()
     c = conn.cursor()
     # Users table
@@ -58,6 +102,7 @@ def _ensure_auth_tables():
     ''')
     conn.commit()
     conn.close()
+    _auth_tables_ready = True
 
 
 def _hash_password(password: str, salt: Optional[str] = None):
@@ -231,56 +276,74 @@ def users_me(request: Request):
     
     return {"user": user}
 
-@app.get("/patients")
-def get_patients():
-    conn = get_db()
-    c = conn.cursor()
-    
-    # THIS QUERY IS THE FIX — always returns latest vital + prediction for each patient
-    c.execute("""
-        SELECT 
-            p.patient_id,
-            p.full_name,
-            p.sex,
-            v.heart_rate_bpm,
-            v.temperature_c,
-            v.spo2_percent,
-            COALESCE(v.health_status, 'NORMAL') as health_status,
-            COALESCE(pr.predicted_label, 'Low Risk') as risk_level,
-            COALESCE(pr.confidence, 0.0) as confidence
-        FROM patients p
-        LEFT JOIN (
-            SELECT *, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) as rn
-            FROM vitals
-        ) v ON p.patient_id = v.patient_id AND v.rn = 1
-        LEFT JOIN (
-            SELECT *, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) as rn
-            FROM predictions
-        ) pr ON p.patient_id = pr.patient_id AND pr.rn = 1
-    """)
-    
-    rows = c.fetchall()
-    conn.close()
-    
-    result = []
-    for row in rows:
-        result.append({
-            "patient_id": row["patient_id"],
-            "full_name": row["full_name"],
-            "sex": row["sex"],
-            "heart_rate_bpm": row["heart_rate_bpm"] or 0,
-            "temperature_c": round(row["temperature_c"], 1) if row["temperature_c"] else 0.0,
-            "spo2_percent": row["spo2_percent"] or 0,
-            "health_status": row["health_status"],
-            "risk_level": row["risk_level"],
-            "confidence": float(row["confidence"])
-        })
-    return result
+PATIENT_FIELDS = [
+    ("patient_id", "patient_id"),
+    ("full_name", "full_name"),
+    ("sex", "sex"),
+    ("heart_rate_bpm", "COALESCE(heart_rate_bpm, 0)"),
+    ("temperature_c", "CASE WHEN temperature_c THEN ROUND(temperature_c, 1) ELSE 0.0 END"),
+    ("spo2_percent", "COALESCE(spo2_percent, 0)"),
+    ("health_status", "COALESCE(health_status, 'NORMAL')"),
+    ("risk_level", "COALESCE(predicted_label, 'Low Risk')"),
+    ("confidence", "CAST(COALESCE(confidence, 0.0) AS REAL)"),
+]
+
+PATIENT_SORT_KEYS = ["patient_id", "confidence", "heart_rate_bpm", "temperature_c", "spo2_percent"]
+RISK_LABELS = {"high": "High Risk", "low": "Low Risk"}
+
+def _read_patients(conn, status=(), risk=(), sort="patient_id", order="asc", limit=None):
+    # Latest vital + prediction per patient come from patient_latest (kept current by
+    # triggers, see database.py): filters, ORDER BY and LIMIT run on its indexes, so a
+    # "top 10 highest risk" read touches 10 index entries instead of the whole ward.
+    # (coercions are done in SQL so the JSON comes straight out of SQLite)
+    where, params = [], []
+    if status:
+        where.append(f"l.health_status IN ({','.join('?' * len(status))})")
+        params.extend(status)
+    if risk:
+        where.append(f"l.predicted_label IN ({','.join('?' * len(risk))})")
+        params.extend(risk)
+    direction = "DESC" if order == "desc" else "ASC"
+    # patients without readings yet go last whichever way a vital is sorted
+    order_by = f"l.{sort} {direction}" + ("" if sort == "patient_id" else f" NULLS LAST, l.patient_id {direction}")
+    params.append(-1 if limit is None else limit)
+    return fetch_json_array(conn, PATIENT_FIELDS, f"""
+        SELECT p.patient_id, p.full_name, p.sex,
+               l.heart_rate_bpm, l.temperature_c, l.spo2_percent, l.health_status,
+               l.predicted_label, l.confidence
+        FROM patient_latest l
+        CROSS JOIN patients p ON p.patient_id = l.patient_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {order_by}
+        LIMIT ?
+    """, params)
 
-@app.get("/patients/{patient_id}")
-def get_patient_detail(patient_id: str):
-    """Get detailed info for a specific patient with vitals history"""
-    conn = get_db()
+def _split_param(value):
+    return tuple(v.strip() for v in value.split(",") if v.strip()) if value else ()
+
+@app.get("/patients")
+async def get_patients(status: Optional[str] = None, risk: Optional[str] = None,
+                       sort: str = "patient_id", order: Optional[str] = None,
+                       limit: Optional[int] = None):
+    """Latest state of every patient.
+
+    status=CRITICAL,WARNING  risk=high|low  sort=confidence|heart_rate_bpm|temperature_c|
+    spo2_percent|patient_id  order=asc|desc (default desc, asc for patient_id)  limit=N
+    e.g. /patients?sort=confidence&limit=10 -> the ten highest-risk patients
+    """
+    if sort not in PATIENT_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {PATIENT_SORT_KEYS}")
+    order = order or ("asc" if sort == "patient_id" else "desc")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    statuses = tuple(s.upper() for s in _split_param(status))
+    risks = tuple(RISK_LABELS.get(r.lower(), r) for r in _split_param(risk))
+    if limit is not None:
+        limit = max(limit, 0)
+    key = ("patients", statuses, risks, sort, order, limit)
+    return RawJSONResponse(await cache.get(key, lambda: db.run(_read_patients, statuses, risks, sort, order, limit)))
+
+def _read_patient_detail(conn, patient_id):
     c = conn.cursor()
     
     # Get patient info
@@ -288,7 +351,6 @@ def get_patient_detail(patient_id: str):
     patient = c.fetchone()
     
     if not patient:
-        conn.close()
         return {"error": "Patient not found"}
     
     # Get latest vitals
@@ -309,102 +371,463 @@ def get_patient_detail(patient_id: str):
     """, (patient_id,))
     prediction = c.fetchone()
     
-    conn.close()
-    
     return {
         "patient": dict(patient) if patient else None,
         "latest_vital": dict(vital) if vital else None,
         "latest_prediction": dict(prediction) if prediction else None
     }
 
-@app.get("/vitals/{patient_id}")
-def get_vitals_history(patient_id: str, limit: int = 20):
-    """Get vital signs history for a patient (for charts)"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, patient_id, heart_rate_bpm, temperature_c, spo2_percent, 
-               health_status, timestamp
-        FROM vitals 
-        WHERE patient_id = ? 
-        ORDER BY timestamp DESC 
-        LIMIT ?
+@app.get("/patients/{patient_id}")
+async def get_patient_detail(patient_id: str):
+    """Get detailed info for a specific patient with vitals history"""
+    return await db.run(_read_patient_detail, patient_id)
+
+VITAL_FIELDS = [
+    ("id", "id"),
+    ("patient_id", "patient_id"),
+    ("heart_rate_bpm", "heart_rate_bpm"),
+    ("temperature_c", "temperature_c"),
+    ("spo2_percent", "spo2_percent"),
+    ("health_status", "health_status"),
+    ("timestamp", "timestamp_utc"),
+]
+
+# In compact storage (compact_storage.py) history and /sync read the store
+# tables directly, rendering timestamp_utc only for the rows they return.
+LEGACY_SOURCES = {"vitals": ("vitals", "timestamp_utc"), "predictions": ("predictions", "timestamp_utc")}
+COMPACT_SOURCES = {"vitals": ("vitals_store", compact_storage.VITALS_TIMESTAMP),
+                   "predictions": ("predictions_store", compact_storage.PREDICTIONS_TIMESTAMP)}
+
+
+def _row_sources(conn):
+    """{"vitals": (table, timestamp_utc expression), "predictions": (...)} for this database."""
+    # One lookup in the (cached) schema table; a converted database is picked up without a restart
+    return COMPACT_SOURCES if compact_storage.is_compact(conn) else LEGACY_SOURCES
+
+
+def _read_vitals_history(conn, patient_id, limit):
+    # Newest `limit` rows, returned in chronological order
+    table, ts = _row_sources(conn)["vitals"]
+    return fetch_json_array(conn, VITAL_FIELDS, f"""
+        SELECT id, patient_id, heart_rate_bpm, temperature_c, spo2_percent,
+               health_status, {ts} AS timestamp_utc
+        FROM (
+            SELECT * FROM {table}
+            WHERE patient_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ) ORDER BY id
     """, (patient_id, limit))
-    
-    rows = c.fetchall()
-    conn.close()
-    
-    # Return in chronological order
-    result = [dict(row) for row in reversed(rows)]
-    return result
 
-@app.get("/alerts")
-def get_alerts(limit: int = 20):
-    """Get recent alerts for all patients or specific patient"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("""
+@app.get("/vitals/{patient_id}")
+async def get_vitals_history(patient_id: str, limit: int = 20):
+    """Get vital signs history for a patient (for charts)"""
+    return RawJSONResponse(await db.run(_read_vitals_history, patient_id, limit))
+
+ALERT_FIELDS = [
+    ("id", "id"),
+    ("timestamp_utc", "timestamp_utc"),
+    ("patient_id", "patient_id"),
+    ("alert_type", "alert_type"),
+    ("alert_message", "alert_message"),
+    ("vitals_id", "vitals_id"),
+    ("handled", "handled"),
+    ("updated_utc", "updated_utc"),
+    ("samples", "samples"),
+    ("peak_confidence", "peak_confidence"),
+    ("full_name", "full_name"),
+]
+
+def _read_alerts(conn, patient_id, limit):
+    if patient_id is None:
+        return fetch_json_array(conn, ALERT_FIELDS, """
+            SELECT a.*, p.full_name
+            FROM alerts a
+            JOIN patients p ON a.patient_id = p.patient_id
+            ORDER BY a.id DESC LIMIT ?
+        """, (limit,))
+    return fetch_json_array(conn, ALERT_FIELDS, """
         SELECT a.*, p.full_name
         FROM alerts a
         JOIN patients p ON a.patient_id = p.patient_id
+        WHERE a.patient_id = ?
         ORDER BY a.id DESC LIMIT ?
-    """, (limit,))
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    """, (patient_id, limit))
+
+@app.get("/alerts")
+async def get_alerts(limit: int = 20):
+    """Get recent alerts for all patients or specific patient"""
+    return RawJSONResponse(await cache.get(("alerts", limit), lambda: db.run(_read_alerts, None, limit)))
 
 @app.get("/alerts/{patient_id}")
-def get_patient_alerts(patient_id: str, limit: int = 10):
+async def get_patient_alerts(patient_id: str, limit: int = 10):
     """Get alerts for a specific patient"""
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("""
-        SELECT a.*, p.full_name
-        FROM alerts a
-        JOIN patients p ON a.patient_id = p.patient_id
-        WHERE a.patient_id = ?
-        ORDER BY a.id DESC LIMIT ?
-    """, (patient_id, limit))
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return RawJSONResponse(await db.run(_read_alerts, patient_id, limit))
+
+# ---------------------------------------------------------------- delta sync
+# /sync keeps the mobile app current without re-downloading /vitals, /alerts:
+# the opaque cursor holds the last vitals, prediction and alert ids the
+# client has, plus an updated_utc watermark because alert episodes are
+# updated in place (alert_engine.py). The first call (no cursor) returns the
+# newest SYNC_INITIAL_ROWS of each list; later calls return what was added
+# since, SYNC_PAGE_ROWS per list at most ("more": true -> call again now).
+# Alerts page by id through the set "id > a or updated_utc > u": while a
+# pass is unfinished the cursor keeps a / u, the last id sent ("ai") and the
+# watermark to move on to once the pass is done ("w").
+SYNC_PAGE_ROWS = int(os.environ.get("SYNC_PAGE_ROWS", "500"))
+SYNC_INITIAL_ROWS = int(os.environ.get("SYNC_INITIAL_ROWS", "100"))
+# Alert rows may be committed up to the write-behind delay after their
+# updated_utc, so the watermark trails the read time by this many seconds;
+# clients upsert alerts by id, a repeated row just overwrites itself.
+SYNC_ALERT_OVERLAP = float(os.environ.get("SYNC_ALERT_OVERLAP", "30"))
+SYNC_GZIP_MIN_BYTES = int(os.environ.get("SYNC_GZIP_MIN_BYTES", "1024"))
+
+PREDICTION_FIELDS = [
+    ("id", "id"),
+    ("patient_id", "patient_id"),
+    ("vitals_id", "vitals_id"),
+    ("predicted_label", "predicted_label"),
+    ("confidence", "confidence"),
+    ("stage", "stage"),
+    ("model_name", "model_name"),
+    ("timestamp", "timestamp_utc"),
+]
+
+SYNC_PATIENTS = "patient_id IN (SELECT patient_id FROM user_patients WHERE user_id = ?)"
+
+
+def _encode_cursor(cursor):
+    raw = json.dumps(cursor, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_time(value):
+    """An ISO-8601 watermark from a cursor (ValueError / TypeError when it is not one)."""
+    if not isinstance(value, str):
+        raise TypeError("watermark must be a string")
+    datetime.fromisoformat(value)
+    return value
+
+
+def _decode_cursor(text):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(text + "=" * (-len(text) % 4)))
+        cursor = {key: int(data[key]) for key in ("v", "p", "a")}
+        cursor["u"] = _cursor_time(data["u"])
+        if "ai" in data:
+            cursor["ai"], cursor["w"] = int(data["ai"]), _cursor_time(data["w"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="invalid sync cursor")
+    return cursor
+
+
+def _sync_page(conn, fields, columns, name, user_id, after, limit):
+    """Rows of the user's patients after id `after` (newest `limit` if None) -> (json, max id, count)."""
+    table, ts = _row_sources(conn)[name]
+    columns = f"{columns}, {ts} AS timestamp_utc"
+    if after is None:
+        source = f"""SELECT {columns} FROM (SELECT * FROM {table} WHERE {SYNC_PATIENTS}
+                     ORDER BY id DESC LIMIT ?) ORDER BY id"""
+        params = (user_id, limit)
+    else:
+        source = f"SELECT {columns} FROM {table} WHERE id > ? AND {SYNC_PATIENTS} ORDER BY id LIMIT ?"
+        params = (after, user_id, limit)
+    rows, last, count = conn.execute(json_array_sql(fields, source, extra=("MAX(id)", "COUNT(*)")),
+                                     params).fetchone()
+    return rows or "[]", last, count
+
+
+def _read_sync(conn, token, cursor, compress):
+    """Body of one /sync response (None for an unknown or expired token)."""
+    now = datetime.utcnow()
+    conn.execute("BEGIN")  # one snapshot for every list and the new cursor
+    try:
+        row = conn.execute("SELECT user_id FROM sessions WHERE token = ? AND expires_at > ?",
+                           (token, now.isoformat())).fetchone()
+        if row is None:
+            return None
+        user_id = row[0]
+        patients = [r[0] for r in conn.execute(
+            "SELECT patient_id FROM user_patients WHERE user_id = ? ORDER BY patient_id", (user_id,))]
+        sources = _row_sources(conn)
+        heads = [h or 0 for h in conn.execute(
+            f"SELECT (SELECT MAX(id) FROM {sources['vitals'][0]}), (SELECT MAX(id) FROM {sources['predictions'][0]}), "
+            "(SELECT MAX(id) FROM alerts)").fetchone()]
+        watermark = (now - timedelta(seconds=SYNC_ALERT_OVERLAP)).isoformat()
+        initial = cursor is None
+        limit = SYNC_INITIAL_ROWS if initial else SYNC_PAGE_ROWS
+        new = {}
+        more = False
+        pages = {}
+        for key, name, fields, columns in (
+                ("v", "vitals", VITAL_FIELDS, "id, patient_id, heart_rate_bpm, temperature_c, spo2_percent, "
+                                              "health_status"),
+                ("p", "predictions", PREDICTION_FIELDS, "id, patient_id, vitals_id, predicted_label, "
+                                                        "confidence, stage, model_name")):
+            pages[name], last, count = _sync_page(conn, fields, columns, name, user_id,
+                                                  None if initial else cursor[key], limit)
+            # A full page may have stopped short of the head: continue after its last row
+            if not initial and count == limit:
+                new[key], more = last, True
+            else:
+                new[key] = heads[0 if key == "v" else 1]
+        if initial:
+            alerts = fetch_json_array(conn, ALERT_FIELDS, f"""
+                SELECT * FROM (
+                    SELECT a.*, p.full_name FROM alerts a JOIN patients p ON a.patient_id = p.patient_id
+                    WHERE a.{SYNC_PATIENTS} ORDER BY a.id DESC LIMIT ?
+                ) ORDER BY id
+            """, (user_id, limit))
+            new["a"], new["u"] = heads[2], watermark
+        else:
+            # New episodes by id, updated/resolved ones by updated_utc
+            source = f"""
+                SELECT a.*, p.full_name FROM alerts a JOIN patients p ON a.patient_id = p.patient_id
+                WHERE a.{SYNC_PATIENTS} AND (a.id > ? OR a.updated_utc > ?) AND a.id > ?
+                ORDER BY a.id LIMIT ?
+            """
+            alerts, last, count = conn.execute(
+                json_array_sql(ALERT_FIELDS, source, extra=("MAX(id)", "COUNT(*)")),
+                (user_id, cursor["a"], cursor["u"], cursor.get("ai", 0), limit)).fetchone()
+            alerts = alerts or "[]"
+            # A full page: same pass next call, after its last id; a / u move on when it ends
+            if count == limit:
+                new.update(a=cursor["a"], u=cursor["u"], ai=last, w=cursor.get("w", watermark))
+                more = True
+            else:
+                new["a"], new["u"] = heads[2], max(cursor["u"], cursor.get("w", watermark))
+    finally:
+        conn.commit()
+    body = (f'{{"cursor":"{_encode_cursor(new)}","more":{json.dumps(more)},"patients":{json.dumps(patients)},'
+            f'"vitals":{pages["vitals"]},"predictions":{pages["predictions"]},"alerts":{alerts}}}').encode()
+    if compress and len(body) >= SYNC_GZIP_MIN_BYTES:
+        return gzip.compress(body, compresslevel=6), True
+    return body, False
 
-@app.get("/dashboard/summary")
-def get_dashboard_summary():
-    """Get summary stats for the dashboard"""
-    conn = get_db()
+
+@app.get("/sync")
+async def sync(request: Request, since: Optional[str] = None):
+    """New vitals, predictions and alerts of the caller's patients since `since` (Authorization: Bearer <token>)"""
+    auth = request.headers.get('authorization') or ''
+    if not auth.lower().startswith('bearer '):
+        raise HTTPException(status_code=401, detail='Authorization header missing')
+    token = auth.split(' ', 1)[1].strip()
+    _ensure_auth_tables()
+    cursor = _decode_cursor(since) if since else None
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    result = await db.run(_read_sync, token, cursor, compress)
+    if result is None:
+        raise HTTPException(status_code=401, detail='invalid or expired token')
+    body, gzipped = result
+    headers = {"Vary": "Accept-Encoding"}
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return RawJSONResponse(body, headers=headers)
+
+def _read_dashboard_summary(conn):
     c = conn.cursor()
     
-    # Count critical vs normal
+    # Count critical vs normal (one row per patient in patient_latest)
     c.execute("""
         SELECT 
             COUNT(*) as total_patients,
-            SUM(CASE WHEN health_status = 'CRITICAL' THEN 1 ELSE 0 END) as critical_count,
-            SUM(CASE WHEN risk_level = 'High Risk' THEN 1 ELSE 0 END) as high_risk_count
-        FROM (
-            SELECT DISTINCT p.patient_id, 
-                   COALESCE(v.health_status, 'NORMAL') as health_status,
-                   COALESCE(pr.predicted_label, 'Low Risk') as risk_level
-            FROM patients p
-            LEFT JOIN (
-                SELECT *, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) as rn
-                FROM vitals
-            ) v ON p.patient_id = v.patient_id AND v.rn = 1
-            LEFT JOIN (
-                SELECT *, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) as rn
-                FROM predictions
-            ) pr ON p.patient_id = pr.patient_id AND pr.rn = 1
-        )
+            SUM(CASE WHEN l.health_status = 'CRITICAL' THEN 1 ELSE 0 END) as critical_count,
+            SUM(CASE WHEN l.predicted_label = 'High Risk' THEN 1 ELSE 0 END) as high_risk_count
+        FROM patient_latest l
+        JOIN patients p ON p.patient_id = l.patient_id
     """)
     
     summary = c.fetchone()
-    conn.close()
     
     return {
         "total_patients": summary["total_patients"] or 0,
         "critical_patients": summary["critical_count"] or 0,
         "high_risk_patients": summary["high_risk_count"] or 0,
-        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/dashboard/summary")
+async def get_dashboard_summary():
+    """Get summary stats for the dashboard"""
+    summary = await cache.get("dashboard_summary", lambda: db.run(_read_dashboard_summary))
+    # counts may come from the cache, the timestamp is always "now"
+    return {**summary, "timestamp": datetime.now().isoformat()}
+
+WARD_SORT_KEYS = ["score", "patient_id"] + early_warning.COLUMNS
+
+def _read_ward_vitals(conn):
+    return conn.execute("""
+        SELECT p.patient_id, p.full_name, v.timestamp_utc,
+               v.rr, v.spo2_percent, v.systolic_bp, v.heart_rate_bpm, v.temperature_c
+        FROM patients p
+        -- patient_latest points at each patient's newest reading: one primary-key lookup
+        -- per patient instead of ranking the whole vitals history
+        LEFT JOIN patient_latest l ON l.patient_id = p.patient_id
+        LEFT JOIN vitals v ON v.id = l.vitals_id
+    """).fetchall()
+
+@app.get("/ward/early-warning")
+async def get_ward_early_warning(sort: str = "score", order: str = "desc", limit: Optional[int] = None):
+    """NEWS2 early-warning score for every patient's latest vitals (sortable ward view)"""
+    if sort not in WARD_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {WARD_SORT_KEYS}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+
+    rows = await db.run(_read_ward_vitals)
+    if not rows:
+        return []
+    pids = np.array([r["patient_id"] for r in rows], dtype=object)
+    vitals = {col: np.array([r[col] for r in rows], dtype=float) for col in early_warning.COLUMNS}
+    news = early_warning.score_ward(vitals)
+
+    # Highest score first by default; patient_id breaks ties, missing vitals sort last
+    if sort == "patient_id":
+        idx = np.argsort(pids, kind="stable")
+        if order == "desc":
+            idx = idx[::-1]
+    else:
+        key = news["total"] if sort == "score" else vitals[sort]
+        idx = np.lexsort((pids, -key if order == "desc" else key))
+    if limit is not None:
+        idx = idx[:max(limit, 0)]
+
+    result = []
+    for i in idx.tolist():
+        row = rows[i]
+        result.append({
+            "patient_id": row["patient_id"],
+            "full_name": row["full_name"],
+            "news2_score": int(news["total"][i]),
+            "clinical_risk": news["risk"][i],
+            "incomplete": bool(news["incomplete"][i]),
+            "subscores": {name: int(news[name][i]) for name in early_warning.PARAMETERS},
+            "vitals": {col: row[col] for col in early_warning.COLUMNS},
+            "timestamp": row["timestamp_utc"],
+        })
+    return result
+
+# ---------------------------------------------------------------- live events
+# One subscription to the local event bus per API process; every /events
+# client gets its own bounded queue, so changes fan out without re-querying
+# the database and a slow client only ever loses its own oldest events.
+EVENT_TOPICS = ["vitals", "predictions", "alerts"]
+EVENT_QUEUE_SIZE = 100
+EVENT_KEEPALIVE = 15  # seconds between SSE comments on an idle stream
+_event_clients = set()
+
+
+async def _relay_events():
+    async for event in event_bus.subscribe(EVENT_TOPICS):
+        for queue in list(_event_clients):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+@app.on_event("startup")
+async def _start_event_relay():
+    app.state.event_relay = asyncio.create_task(_relay_events())
+
+
+@app.on_event("shutdown")
+async def _stop_event_relay():
+    app.state.event_relay.cancel()
+
+
+@app.get("/events")
+async def stream_events(topics: Optional[str] = None):
+    """Server-Sent Events stream of new vitals / predictions / alerts (?topics=alerts,predictions)"""
+    wanted = set(topics.split(",")) if topics else set(EVENT_TOPICS)
+    unknown = wanted - set(EVENT_TOPICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown topics {sorted(unknown)}; use {EVENT_TOPICS}")
+
+    queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+    _event_clients.add(queue)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["topic"] in wanted:
+                    yield f"event: {event['topic']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            _event_clients.discard(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+# ---------------------------------------------------------------- on-demand scoring
+# The risk model is loaded once per worker process at startup (ai_predictor.load_model,
+# so PREDICTOR_LATENCY_BUDGET_US selects a distilled model here as well) and
+# concurrent /predict requests share model calls through a MicroBatcher. serve.py's
+# preload only checks that the pickle loads; workers are spawned, not forked, and
+# each holds its own copy.
+PREDICT_FIELDS = ["heart_rate_bpm", "temperature_c", "spo2_percent"]
+PREDICT_MAX_READINGS = 1000
+
+
+def _score_readings(model, X):
+    probs, stages = ai_predictor.score(model, X[:, 0], X[:, 1], X[:, 2])
+    return [(round(float(p), 3), "High Risk" if p > ai_predictor.RISK_THRESHOLD else "Low Risk", stage)
+            for p, stage in zip(probs, stages)]
+
+
+@app.on_event("startup")
+def _load_model():
+    app.state.model_name = None
+    app.state.batcher = None
+    if not os.path.exists(ai_predictor.MODEL_PATH):
+        print(f"[WARN] {ai_predictor.MODEL_PATH} not found - /predict is unavailable until "
+              f"ai_predictor.py has trained it")
+        return
+    model, app.state.model_name = ai_predictor.load_model()
+    app.state.batcher = MicroBatcher(lambda X: _score_readings(model, X))
+
+
+@app.on_event("shutdown")
+def _close_batcher():
+    if app.state.batcher is not None:
+        app.state.batcher.close()
+
+
+def _parse_readings(data):
+    """Body -> (n, 3) array. Accepts [reading, ...], {"readings": [...]} or one reading."""
+    if isinstance(data, dict):
+        data = data["readings"] if "readings" in data else [data]
+    if not isinstance(data, list) or not data:
+        raise HTTPException(status_code=400, detail="expected a non-empty array of readings")
+    if len(data) > PREDICT_MAX_READINGS:
+        raise HTTPException(status_code=413, detail=f"at most {PREDICT_MAX_READINGS} readings per request")
+    rows = []
+    for i, reading in enumerate(data):
+        values = [reading.get(name) if isinstance(reading, dict) else None for name in PREDICT_FIELDS]
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+                   for v in values):
+            raise HTTPException(status_code=400, detail=f"reading {i} needs numeric {PREDICT_FIELDS}")
+        rows.append(values)
+    return np.array(rows, dtype=float)
+
+
+@app.post("/predict")
+async def predict(request: Request):
+    """Risk score for arbitrary readings without storing them (same model and cascade as ai_predictor.py)"""
+    if app.state.batcher is None:
+        raise HTTPException(status_code=503, detail="risk model not loaded")
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="body must be JSON")
+    results = await app.state.batcher.submit(_parse_readings(data))
+    return {
+        "model": app.state.model_name,
+        "predictions": [{"risk_score": p, "predicted_label": label, "stage": stage}
+                        for p, label, stage in results],
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+# async_db.py - DEDICATED DB EXECUTOR FOR THE ASYNC READ ENDPOINTS
+"""
+Async data-access layer for api.py.
+
+sqlite3 is blocking, so every read still has to run on a thread - the point is
+WHICH threads. A sync `def` endpoint borrows a thread from Starlette's shared
+threadpool (40 tokens by default) for the whole request, so a few hundred
+phones polling /patients starve everything else (auth, health checks).
+
+AsyncDB owns its own small executor with its own queue. Endpoints are
+`async def` and simply await a future: thousands of waiting requests cost a
+coroutine each, not a thread, and the DB threads keep one long-lived
+connection each instead of reconnecting per request.
+
+API_DB_MODE=sync keeps the old behaviour (Starlette threadpool + a fresh
+connection per call) so bench_api.py can compare both modes.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+DB_PATH = "hospital.db"
+DB_WORKERS = int(os.environ.get("API_DB_WORKERS", "4"))
+DB_MODE = os.environ.get("API_DB_MODE", "async")  # "async" or "sync"
+
+
+class AsyncDB:
+    def __init__(self, path=DB_PATH, workers=DB_WORKERS, mode=DB_MODE):
+        if mode not in ("async", "sync"):
+            raise ValueError(f"API_DB_MODE must be 'async' or 'sync', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.workers = workers
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hospital-db")
+
+    def _connect(self):
+        return storage.connect(self.path, row_factory=sqlite3.Row, check_same_thread=False)
+
+    def _thread_conn(self):
+        # One connection per executor thread, opened lazily and kept open
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _call(self, fn, args):
+        return fn(self._thread_conn(), *args)
+
+    def _call_fresh(self, fn, args):
+        conn = self._connect()
+        try:
+            return fn(conn, *args)
+        finally:
+            conn.close()
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) off the event loop and return its result."""
+        if self.mode == "sync":
+            from starlette.concurrency import run_in_threadpool
+            return await run_in_threadpool(self._call_fresh, fn, args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
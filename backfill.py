@@ -0,0 +1,236 @@
+# backfill.py - RE-SCORE VITALS HISTORY WITH A MODEL VERSION (PROCESS POOL, RESUMABLE)
+"""
+ai_predictor.py only scores readings that have no prediction yet, so a new
+model never sees the history. This re-scores a vitals id or time range with
+any model file and stores the result per model version:
+
+    python backfill.py                                  # whole history, real_hospital_model.pkl
+    python backfill.py --model risk_model_grid_fine.pkl --since 2025-12-01
+    python backfill.py --from-id 1 --to-id 2000000 --workers 8 --chunk 20000
+    python backfill.py --restart                        # ignore the checkpoints of this job
+
+* the range is cut into id chunks; a process pool scores them (each worker
+  loads the model once, reads its chunk on its own read-only connection and
+  scores it in one vectorized ai_predictor.score() call, cascade included)
+* the parent is the only writer: one short transaction per chunk writes the
+  rows into prediction_versions (PK model_version, vitals_id) AND the chunk's
+  checkpoint, so the live predictor is never locked out for longer than
+  that, and an interrupted job resumes exactly after its last chunk
+* live `predictions` are not touched; compare versions with SQL, e.g.
+      SELECT COUNT(*) FROM prediction_versions v JOIN predictions p USING (vitals_id)
+      WHERE v.model_version = ? AND v.predicted_label != p.predicted_label
+
+The version defaults to "<model file>@<first 12 hex of its sha256>", and the
+job name to the version, so re-running the same command continues the job.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import joblib
+
+import compact_storage
+import storage
+from ai_predictor import MODEL_PATH, RISK_THRESHOLD, score
+
+DB_PATH = "hospital.db"
+CHUNK_ROWS = 10000
+WORKERS = os.cpu_count() or 1
+PROGRESS_EVERY = 2.0   # seconds between progress lines
+BUSY_TIMEOUT_MS = 10000
+
+BACKFILL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_versions (
+    model_version TEXT NOT NULL,
+    vitals_id INTEGER NOT NULL,
+    patient_id TEXT,
+    predicted_label TEXT,
+    confidence REAL,
+    stage TEXT,
+    scored_utc TEXT,
+    PRIMARY KEY (model_version, vitals_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    job TEXT NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    chunk_end INTEGER NOT NULL,
+    model_version TEXT,
+    rows INTEGER,
+    done_utc TEXT,
+    PRIMARY KEY (job, chunk_start)
+);
+"""
+
+# ---------------------------------------------------------------- worker side
+_model = None
+_conn = None
+
+
+def _init_worker(model_path, db_path):
+    global _model, _conn
+    _model = joblib.load(model_path)
+    _conn = storage.connect(db_path, readonly=True)
+
+
+def score_chunk(start, end):
+    """Score vitals ids [start, end). Returns (start, end, rows to write)."""
+    rows = _conn.execute("""
+        SELECT id, patient_id, heart_rate_bpm, temperature_c, spo2_percent
+        FROM vitals
+        WHERE id >= ? AND id < ? AND heart_rate_bpm IS NOT NULL
+          AND temperature_c IS NOT NULL AND spo2_percent IS NOT NULL
+    """, (start, end)).fetchall()
+    if not rows:
+        return start, end, []
+    ids, pids, hrs, temps, spo2s = zip(*rows)
+    probs, stages = score(_model, hrs, temps, spo2s)
+    now = datetime.utcnow().isoformat()
+    return start, end, [
+        (vid, pid, "High Risk" if p > RISK_THRESHOLD else "Low Risk", round(float(p), 3), stage, now)
+        for vid, pid, p, stage in zip(ids, pids, probs.tolist(), stages.tolist())
+    ]
+
+
+# ---------------------------------------------------------------- parent side
+def model_version(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return f"{os.path.basename(path)}@{h.hexdigest()[:12]}"
+
+
+def id_range(conn, args):
+    """Resolve --from-id/--to-id/--since/--until into an inclusive id range (or None)."""
+    where, params = [], []
+    if args.since or args.until:
+        if compact_storage.is_compact(conn):
+            table, column = "vitals_store", "ts_ms"
+            convert = compact_storage.to_ms
+        else:
+            table, column = "vitals", "timestamp_utc"
+            convert = str
+        if args.since:
+            where.append(f"{column} >= ?")
+            params.append(convert(args.since))
+        if args.until:
+            where.append(f"{column} < ?")
+            params.append(convert(args.until))
+    else:
+        table = "vitals"
+    if args.from_id is not None:
+        where.append("id >= ?")
+        params.append(args.from_id)
+    if args.to_id is not None:
+        where.append("id <= ?")
+        params.append(args.to_id)
+    sql = f"SELECT MIN(id), MAX(id) FROM {table}" + (" WHERE " + " AND ".join(where) if where else "")
+    lo, hi = conn.execute(sql, params).fetchone()
+    return None if lo is None else (lo, hi)
+
+
+def pending_chunks(done, lo, hi, size):
+    """Chunks of at most `size` ids covering [lo, hi] minus the checkpointed [start, end) ranges in done.
+
+    Coverage, not chunk starts, decides what is left, so a job resumed after
+    new vitals arrived or with another --chunk still scores every id once.
+    """
+    gaps, pos = [], lo
+    for start, end in sorted(done):
+        if start > pos:
+            gaps.append((pos, min(start, hi + 1)))
+        pos = max(pos, end)
+        if pos > hi:
+            break
+    if pos <= hi:
+        gaps.append((pos, hi + 1))
+    return [(s, min(s + size, end)) for start, end in gaps if start < end for s in range(start, end, size)]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--version", help="model_version to store (default: file name + content hash)")
+    ap.add_argument("--job", help="checkpoint name (default: the version)")
+    ap.add_argument("--from-id", type=int)
+    ap.add_argument("--to-id", type=int)
+    ap.add_argument("--since", help="ISO-8601 timestamp (inclusive)")
+    ap.add_argument("--until", help="ISO-8601 timestamp (exclusive)")
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="vitals ids per chunk")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--restart", action="store_true", help="drop this job's checkpoints first")
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.model):
+        sys.exit(f"{args.model} not found")
+    if getattr(joblib.load(args.model), "n_features_in_", 3) != 3:
+        sys.exit(f"{args.model} needs trend features - history re-scoring supports the 3-vital models only")
+    version = args.version or model_version(args.model)
+    job = args.job or version
+
+    # WAL (storage.py): the workers' reads and our chunk commits never block the live services' readers
+    conn = storage.connect(args.db, busy_timeout_ms=BUSY_TIMEOUT_MS)
+    conn.executescript(BACKFILL_SCHEMA)
+    if args.restart:
+        conn.execute("DELETE FROM backfill_checkpoints WHERE job = ?", (job,))
+        conn.commit()
+
+    span = id_range(conn, args)
+    if span is None:
+        sys.exit("no vitals in the requested range")
+    lo, hi = span
+    done = conn.execute("SELECT chunk_start, chunk_end FROM backfill_checkpoints WHERE job = ?", (job,)).fetchall()
+    todo = pending_chunks(done, lo, hi, args.chunk)
+    left = sum(end - start for start, end in todo)
+    print(f"Backfill {version} over vitals ids {lo}..{hi}: {len(todo)} chunks of up to {args.chunk} to score, "
+          f"{hi + 1 - lo - left} ids already done, {args.workers} workers")
+
+    t0 = last_report = time.perf_counter()
+    scored = finished = 0
+    pending = set()
+    queue = iter(todo)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.model, args.db)) as pool:
+        while True:
+            # Keep a bounded number of chunks in flight so results never pile up in memory
+            while len(pending) < args.workers * 2:
+                chunk = next(queue, None)
+                if chunk is None:
+                    break
+                pending.add(pool.submit(score_chunk, *chunk))
+            if not pending:
+                break
+            complete, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in complete:
+                start, end, rows = future.result()
+                with conn:  # one short write transaction: rows + checkpoint, atomically
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO prediction_versions (model_version, vitals_id, patient_id, "
+                        "predicted_label, confidence, stage, scored_utc) VALUES (?,?,?,?,?,?,?)",
+                        [(version, *row) for row in rows])
+                    conn.execute("INSERT OR REPLACE INTO backfill_checkpoints VALUES (?,?,?,?,?,?)",
+                                 (job, start, end, version, len(rows), datetime.utcnow().isoformat()))
+                scored += len(rows)
+                finished += 1
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY or not pending:
+                last_report = now
+                rate = scored / (now - t0) if now > t0 else 0.0
+                left = len(todo) - finished
+                eta = left * (now - t0) / finished if finished else float("nan")
+                print(f"  {finished}/{len(todo)} chunks  {scored} rows  {rate:,.0f} rows/s  ETA {eta:,.0f}s")
+
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] {scored} readings re-scored as {version} in {elapsed:.1f}s "
+          f"({scored / elapsed if elapsed else 0:,.0f} rows/s)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# bench_api.py - LOAD BENCHMARK FOR THE READ ENDPOINTS (SYNC vs ASYNC DB MODE)
+"""
+Starts api.py under uvicorn against a throw-away seeded hospital.db, hammers
+the read endpoints with many concurrent keep-alive connections and prints
+RPS and latency percentiles for each API_DB_MODE.
+
+    python bench_api.py                      # both modes, 500 connections
+    python bench_api.py --concurrency 2000 --requests 20000 --modes async
+    python bench_api.py --modes async --cache off,on   # response cache effect
+
+The load generator is plain asyncio (no extra dependencies) and is reused by
+the other bench_*.py scripts.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENDPOINTS = [
+    "/patients",
+    "/patients/P001",
+    "/vitals/P001?limit=50",
+    "/alerts",
+    "/dashboard/summary",
+]
+
+
+# ---------------------------------------------------------------- seeding
+def seed_db(workdir, patients=50, rows_per_patient=200):
+    """Create hospital.db in workdir with synthetic vitals/predictions/alerts."""
+    subprocess.run([sys.executable, os.path.join(BASE_DIR, "database.py")],
+                   cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    conn = sqlite3.connect(os.path.join(workdir, "hospital.db"))
+    c = conn.cursor()
+    pids = [f"B{i:04d}" for i in range(patients)]
+    c.executemany("INSERT OR IGNORE INTO patients (patient_id, full_name, sex) VALUES (?,?,?)",
+                  [(pid, f"Bench Patient {pid}", random.choice(["Male", "Female"])) for pid in pids])
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).isoformat()
+    for pid in pids + ["P001"]:
+        for _ in range(rows_per_patient):
+            hr = rng.randint(55, 170)
+            temp = round(rng.uniform(36.0, 41.0), 1)
+            spo2 = rng.randint(80, 100)
+            status = "CRITICAL" if hr > 130 or temp >= 39.0 or spo2 < 90 else "NORMAL"
+            c.execute("""INSERT INTO vitals (timestamp_utc, patient_id, heart_rate_bpm, temperature_c,
+                         spo2_percent, systolic_bp, diastolic_bp, rr, health_status)
+                         VALUES (?,?,?,?,?,?,?,?,?)""",
+                      (now, pid, hr, temp, spo2, 120, 80, 16, status))
+            vid = c.lastrowid
+            conf = round(rng.random(), 3)
+            c.execute("""INSERT INTO predictions (timestamp_utc, patient_id, model_name, prediction_json,
+                         predicted_label, confidence, vitals_id) VALUES (?,?,?,?,?,?,?)""",
+                      (now, pid, "bench", "{}", "High Risk" if conf > 0.52 else "Low Risk", conf, vid))
+            if conf > 0.9:
+                c.execute("""INSERT INTO alerts (timestamp_utc, patient_id, alert_type, alert_message, vitals_id)
+                             VALUES (?,?,?,?,?)""", (now, pid, "AI Critical Alert", "bench", vid))
+    conn.commit()
+    conn.close()
+
+
+# ---------------------------------------------------------------- server
+def start_api(workdir, port, env=None, args=None):
+    """Launch uvicorn serving api:app from this repo with cwd=workdir."""
+    cmd = args or [sys.executable, "-m", "uvicorn", "api:app",
+                   "--app-dir", BASE_DIR, "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning"]
+    full_env = dict(os.environ, PYTHONPATH=BASE_DIR)
+    full_env.update(env or {})
+    proc = subprocess.Popen(cmd, cwd=workdir, env=full_env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            status, _ = asyncio.run(http_request("127.0.0.1", port, "GET", "/"))
+            if status == 200:
+                return proc
+        except OSError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API did not become ready within 30s")
+
+
+def stop_api(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ---------------------------------------------------------------- client
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    body = await reader.readexactly(length) if length else b""
+    return status, body
+
+
+def _build_request(method, path, body=b"", headers=None):
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: keep-alive"]
+    if body:
+        lines.append("Content-Type: application/json")
+        lines.append(f"Content-Length: {len(body)}")
+    for k, v in (headers or {}).items():
+        lines.append(f"{k}: {v}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def http_request(host, port, method, path, body=b"", headers=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(_build_request(method, path, body, headers))
+        await writer.drain()
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def _worker(host, port, requests_iter, latencies, errors):
+    reader = writer = None
+    for method, path, body in requests_iter:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            t0 = time.perf_counter()
+            writer.write(_build_request(method, path, body))
+            await writer.drain()
+            status, _ = await _read_response(reader)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run_load(host, port, requests, concurrency):
+    latencies, errors = [], []
+    it = iter(requests)
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_worker(host, port, it, latencies, errors) for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - t0
+
+
+def run_load(port, requests, concurrency, host="127.0.0.1"):
+    """Replay (method, path, body) tuples over `concurrency` connections.
+
+    Returns a dict with rps, p50/p95/p99 latency in ms and the error count.
+    """
+    latencies, errors, elapsed = asyncio.run(_run_load(host, port, requests, concurrency))
+    latencies.sort()
+
+    def pct(p):
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def print_result(label, r):
+    print(f"{label:<28} {r['rps']:>9.0f} rps  p50 {r['p50_ms']:>7.1f} ms  "
+          f"p95 {r['p95_ms']:>7.1f} ms  p99 {r['p99_ms']:>7.1f} ms  errors {r['errors']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modes", default="sync,async", help="comma separated API_DB_MODE values")
+    ap.add_argument("--cache", default="on", help="response cache: on, off or off,on to compare")
+    ap.add_argument("--concurrency", type=int, default=500)
+    ap.add_argument("--requests", type=int, default=5000, help="requests per endpoint")
+    ap.add_argument("--patients", type=int, default=50)
+    ap.add_argument("--rows", type=int, default=200, help="vitals rows per patient")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    # Many concurrent sockets need a raised fd limit on Linux/macOS
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.concurrency * 2 + 256)), hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    try:
+        print(f"Seeding {args.patients} patients x {args.rows} rows in {workdir} ...")
+        seed_db(workdir, args.patients, args.rows)
+        for mode in args.modes.split(","):
+            for cache in args.cache.split(","):
+                print(f"\n=== API_DB_MODE={mode}  cache={cache}  concurrency={args.concurrency} ===")
+                proc = start_api(workdir, args.port,
+                                 env={"API_DB_MODE": mode, "API_CACHE": "0" if cache == "off" else "1"})
+                try:
+                    for path in ENDPOINTS:
+                        r = run_load(args.port, [("GET", path, b"")] * args.requests, args.concurrency)
+                        print_result(path, r)
+                finally:
+                    stop_api(proc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# bench_cascade.py - THROUGHPUT AND AGREEMENT OF THE SCORING CASCADE
+"""
+Scores the same synthetic stream of readings twice - model only and through
+ai_predictor's rule cascade - and reports rows/second plus how often the two
+agree on the risk label (> RISK_THRESHOLD) and on alert triggering (> 0.7).
+
+The stream mixes the two producers: data_simulator.py style (18% critical
+draws) and generate_vitals.py style smooth drifts with stress episodes.
+
+    python bench_cascade.py --rows 5000 --batches 1,15
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ai_predictor import CASCADE, RISK_THRESHOLD, load_or_train_model, score
+from alert_engine import OPEN_THRESHOLD
+from risk_models import synthetic_stream
+
+
+def run(model, X, batch, cascade):
+    probs, stages = [], []
+    t0 = time.perf_counter()
+    for i in range(0, len(X), batch):
+        p, s = score(model, X[i:i + batch, 0], X[i:i + batch, 1], X[i:i + batch, 2], cascade)
+        probs.append(p)
+        stages.append(s)
+    return np.concatenate(probs), np.concatenate(stages), time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--batches", default="1,15", help="rows per score() call (the predictor uses up to 15)")
+    args = ap.parse_args()
+
+    model = load_or_train_model()
+    X = synthetic_stream(args.rows)
+
+    for batch in (int(b) for b in args.batches.split(",")):
+        base_p, _, base_t = run(model, X, batch, dict(CASCADE, enabled=False))
+        casc_p, stages, casc_t = run(model, X, batch, dict(CASCADE, enabled=True))
+        print(f"\n{args.rows} readings, batch {batch}")
+        print(f"model only : {args.rows / base_t:>10.0f} rows/s")
+        print(f"cascade    : {args.rows / casc_t:>10.0f} rows/s  ({base_t / casc_t:.1f}x)")
+
+    label_agree = (base_p > RISK_THRESHOLD) == (casc_p > RISK_THRESHOLD)
+    alert_agree = (base_p > OPEN_THRESHOLD) == (casc_p > OPEN_THRESHOLD)
+    print(f"label agreement : {label_agree.mean():.2%}")
+    print(f"alert agreement : {alert_agree.mean():.2%}")
+    print("\nstage           share    label agreement")
+    for stage in ("rule_critical", "rule_normal", "model"):
+        m = stages == stage
+        if m.any():
+            print(f"{stage:<14} {m.mean():>7.1%}    {label_agree[m].mean():>7.2%}")
+
+
+if __name__ == "__main__":
+    main()
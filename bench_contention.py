@@ -0,0 +1,152 @@
+# bench_contention.py - MULTI-WRITER CONTENTION: BARE sqlite3.connect() vs storage.connect()
+"""
+Runs several writer processes (each committing small batches of vitals, like
+the producers) and reader processes (the /vitals/{id} history query, like the
+API) against one database for a fixed time, once per mode:
+
+  bare     sqlite3.connect(path), rollback journal, commit() per batch - how
+           every script opened hospital.db before storage.py
+  storage  storage.connect(path) (WAL, busy_timeout, synchronous=NORMAL,
+           mmap) and storage.write() (BEGIN IMMEDIATE + retry with backoff)
+
+and prints committed transactions/s, write latency percentiles, reads/s and
+how many operations failed with "database is locked".
+
+    python bench_contention.py                               # 4 writers, 4 readers, 5 s
+    python bench_contention.py --writers 8 --readers 16 --seconds 10 --rows 20
+    DB_BUSY_TIMEOUT_MS=200 python bench_contention.py        # short waits -> retries matter
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import database
+import storage
+from compact_storage import insert_vitals, is_compact
+
+PATIENTS = ["P001", "P002", "P003", "P004", "P005", "P006", "P007"]
+HISTORY_SQL = """SELECT id, heart_rate_bpm, temperature_c, spo2_percent, timestamp_utc
+                 FROM vitals WHERE patient_id = ? ORDER BY id DESC LIMIT 50"""
+
+
+def _connect(mode, path):
+    return storage.connect(path) if mode == "storage" else sqlite3.connect(path)
+
+
+def _insert_batch(conn, rows, rng, compact):
+    ts = datetime.now(timezone.utc).isoformat()
+    for _ in range(rows):
+        insert_vitals(conn, ts, rng.choice(PATIENTS), rng.randint(55, 170), round(rng.uniform(36.0, 41.0), 1),
+                      rng.randint(80, 100), health_status="NORMAL", compact=compact)
+
+
+def writer(mode, path, rows, start, deadline, results):
+    rng = random.Random(os.getpid())
+    conn = _connect(mode, path)
+    compact = is_compact(conn)
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start - time.time()))
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        try:
+            if mode == "storage":
+                storage.write(conn, _insert_batch, rows, rng, compact)
+            else:
+                _insert_batch(conn, rows, rng, compact)
+                conn.commit()
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.rollback()
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+    results.put(("write", latencies, errors))
+
+
+def reader(mode, path, start, deadline, results):
+    rng = random.Random(os.getpid())
+    conn = _connect(mode, path)
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start - time.time()))
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.execute(HISTORY_SQL, (rng.choice(PATIENTS),)).fetchall()
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+    results.put(("read", latencies, errors))
+
+
+def run(mode, workdir, args):
+    path = os.path.join(workdir, f"{mode}.db")
+    database.init_db(path)
+    if mode == "bare":
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")  # init_db opened it through storage.py
+        conn.close()
+    results = mp.Queue()
+    start = time.time() + 1.0  # every process connected before the clock starts
+    deadline = start + args.seconds
+    procs = [mp.Process(target=writer, args=(mode, path, args.rows, start, deadline, results))
+             for _ in range(args.writers)]
+    procs += [mp.Process(target=reader, args=(mode, path, start, deadline, results))
+              for _ in range(args.readers)]
+    for p in procs:
+        p.start()
+    out = {"write": ([], 0), "read": ([], 0)}
+    for _ in procs:
+        kind, latencies, errors = results.get()
+        out[kind] = (out[kind][0] + latencies, out[kind][1] + errors)
+    for p in procs:
+        p.join()
+    return out
+
+
+def pct(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else float("nan")
+
+
+def print_result(mode, out, args):
+    writes, write_errors = out["write"]
+    reads, read_errors = out["read"]
+    writes.sort()
+    reads.sort()
+    print(f"{mode:<8} writes {len(writes) / args.seconds:>7.0f} tx/s ({len(writes) * args.rows / args.seconds:>7.0f} rows/s)  "
+          f"p50 {pct(writes, 0.5):>6.1f}  p99 {pct(writes, 0.99):>7.1f}  max {pct(writes, 1.0):>7.1f} ms  "
+          f"locked {write_errors}")
+    print(f"{'':<8} reads  {len(reads) / args.seconds:>7.0f} q/s                      "
+          f"p50 {pct(reads, 0.5):>6.1f}  p99 {pct(reads, 0.99):>7.1f}  max {pct(reads, 1.0):>7.1f} ms  "
+          f"locked {read_errors}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modes", default="bare,storage")
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--rows", type=int, default=5, help="vitals rows per write transaction")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    print(f"{args.writers} writers x {args.rows} rows/tx, {args.readers} readers, {args.seconds:.0f}s per mode "
+          f"(busy timeout {storage.BUSY_TIMEOUT_MS} ms)")
+    workdir = tempfile.mkdtemp(prefix="bench_contention_")
+    try:
+        for mode in args.modes.split(","):
+            print_result(mode, run(mode, workdir, args), args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
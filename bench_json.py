@@ -0,0 +1,82 @@
+# bench_json.py - CPU/MEMORY COST OF BIG LIST RESPONSES (DICT PATH vs SQL JSON PATH)
+"""
+Compares, for a bulk /vitals/{id} history response:
+
+  dicts     : fetchall -> dict per row -> jsonable_encoder -> json.dumps
+              (what FastAPI does when an endpoint returns a list of dicts)
+  sql-json  : SQLite json_group_array/json_object -> one str -> bytes
+              (api.py's fetch_json_array + RawJSONResponse)
+
+    python bench_json.py --rows 20000 --repeat 20
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+
+from api import VITAL_FIELDS, _read_vitals_history
+from bench_api import seed_db
+
+
+def dict_path(conn, patient_id, limit):
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("""
+        SELECT id, patient_id, heart_rate_bpm, temperature_c, spo2_percent,
+               health_status, timestamp_utc AS timestamp
+        FROM vitals WHERE patient_id = ? ORDER BY id DESC LIMIT ?
+    """, (patient_id, limit)).fetchall()
+    result = [dict(row) for row in reversed(rows)]
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False,
+                      allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def sql_json_path(conn, patient_id, limit):
+    return _read_vitals_history(conn, patient_id, limit).encode("utf-8")
+
+
+def measure(fn, conn, limit, repeat):
+    fn(conn, "P001", limit)  # warm page cache
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        body = fn(conn, "P001", limit)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    tracemalloc.start()
+    fn(conn, "P001", limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu / repeat * 1000, wall / repeat * 1000, peak / 1024 / 1024, body
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=20000, help="history rows returned per request")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_json_")
+    print(f"Seeding {args.rows} vitals rows for P001 in {workdir} ...")
+    seed_db(workdir, patients=0, rows_per_patient=args.rows)
+    conn = sqlite3.connect(os.path.join(workdir, "hospital.db"))
+
+    results = {}
+    for name, fn in (("dicts", dict_path), ("sql-json", sql_json_path)):
+        conn.row_factory = None
+        cpu_ms, wall_ms, peak_mb, body = measure(fn, conn, args.rows, args.repeat)
+        results[name] = json.loads(body)
+        print(f"{name:<9} cpu {cpu_ms:8.2f} ms/req  wall {wall_ms:8.2f} ms/req  "
+              f"peak alloc {peak_mb:7.2f} MiB  body {len(body) / 1024:8.1f} KiB")
+
+    same = results["dicts"] == results["sql-json"]
+    print(f"identical payloads: {same}  ({len(VITAL_FIELDS)} fields x {len(results['dicts'])} rows)")
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench_predict.py - THROUGHPUT AND TAIL LATENCY OF POST /predict (MICRO-BATCHING OFF vs ON)
+"""
+Starts api.py under uvicorn (model loaded once at startup) and sends
+single-reading /predict requests over many concurrent connections, with
+API_PREDICT_BATCH=0 (one model call per request) and =1 (concurrent requests
+coalesced by micro_batcher.py), then the same readings as bulk requests.
+
+    python bench_predict.py                          # 1000 requests, 100 connections
+    python bench_predict.py --requests 5000 --concurrency 500 --bulk 100
+    PREDICTOR_LATENCY_BUDGET_US=100 python bench_predict.py   # with a distilled model
+
+Readings come from risk_models.synthetic_stream (both producers' patterns).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from ai_predictor import MODEL_PATH
+from bench_api import BASE_DIR, print_result, run_load, seed_db, start_api, stop_api
+from risk_models import MANIFEST_PATH, synthetic_stream
+
+
+def bodies(readings, per_request):
+    out = []
+    for i in range(0, len(readings), per_request):
+        chunk = [{"heart_rate_bpm": hr, "temperature_c": temp, "spo2_percent": spo2}
+                 for hr, temp, spo2 in readings[i:i + per_request].tolist()]
+        out.append(("POST", "/predict", json.dumps(chunk).encode()))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=1000, help="single-reading requests per run")
+    ap.add_argument("--concurrency", type=int, default=100)
+    ap.add_argument("--bulk", type=int, default=100, help="readings per request in the bulk run")
+    ap.add_argument("--port", type=int, default=8766)
+    args = ap.parse_args()
+
+    readings = synthetic_stream(args.requests)
+    workdir = tempfile.mkdtemp(prefix="bench_predict_")
+    try:
+        seed_db(workdir, patients=0, rows_per_patient=1)
+        # The API loads the model relative to its working directory
+        for name in [MODEL_PATH, MANIFEST_PATH] + [f for f in os.listdir(BASE_DIR) if f.startswith("risk_model_")]:
+            if os.path.exists(os.path.join(BASE_DIR, name)):
+                shutil.copy(os.path.join(BASE_DIR, name), workdir)
+
+        runs = [("batching off", "0", 1), ("batching on", "1", 1), (f"bulk x{args.bulk}", "1", args.bulk)]
+        for label, batch, per_request in runs:
+            proc = start_api(workdir, args.port, env={"API_PREDICT_BATCH": batch})
+            try:
+                reqs = bodies(readings, per_request)
+                run_load(args.port, reqs[:args.concurrency], args.concurrency)  # warm-up
+                r = run_load(args.port, reqs, min(args.concurrency, len(reqs)))
+                print_result(label, r)
+                print(f"{'':<28} {r['rps'] * per_request:>9.0f} readings/s")
+            finally:
+                stop_api(proc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
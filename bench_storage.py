@@ -0,0 +1,136 @@
+# bench_storage.py - LEGACY vs COMPACT STORAGE: BYTES PER ROW AND SCAN SPEED
+"""
+Seeds one database with generator-like rows (raw_payload = the typed
+columns as JSON, prediction_json like ai_predictor.py writes), copies it,
+converts the copy with compact_storage.migrate() and compares:
+
+  size      bytes per vitals / predictions row (dbstat) and file size
+  range     a time-window aggregate over vitals (ISO text vs ts_ms integer,
+            as purge.py / backfill.py filter it; and through the view for
+            comparison)
+  history   api.py's per-patient history read (what /vitals/{id} runs; it
+            reads vitals_store directly in the compact format)
+  full      SELECT * of every prediction (prediction_json rebuilt by the view)
+
+    python bench_storage.py --patients 20 --rows 5000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import compact_storage
+import database
+from api import _read_vitals_history
+
+
+def seed(path, patients, rows_per_patient):
+    database.init_db(path)
+    conn = sqlite3.connect(path)
+    pids = [f"S{i:04d}" for i in range(patients)]
+    conn.executemany("INSERT INTO patients (patient_id, full_name) VALUES (?,?)",
+                     [(pid, f"Storage Patient {pid}") for pid in pids])
+    rng = random.Random(42)
+    start = datetime.now(timezone.utc) - timedelta(seconds=5 * rows_per_patient)
+    for n in range(rows_per_patient):
+        ts = start + timedelta(seconds=5 * n)
+        for pid in pids:
+            v = {"heart_rate_bpm": rng.randint(55, 170), "temperature_c": round(rng.uniform(36.0, 41.0), 1),
+                 "spo2_percent": rng.randint(80, 100), "systolic_bp": rng.randint(100, 150),
+                 "diastolic_bp": rng.randint(60, 95), "rr": rng.randint(12, 24)}
+            cur = conn.execute("""INSERT INTO vitals (timestamp_utc, patient_id, device_id, heart_rate_bpm,
+                                  temperature_c, spo2_percent, systolic_bp, diastolic_bp, rr, raw_payload,
+                                  health_status) VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
+                               (ts.isoformat(), pid, f"DEV_{pid}", *v.values(), json.dumps(v),
+                                "CRITICAL" if v["heart_rate_bpm"] > 130 else "NORMAL"))
+            conf = round(rng.random(), 3)
+            detail = {"risk_score": conf, "hr": v["heart_rate_bpm"], "temp": v["temperature_c"],
+                      "spo2": v["spo2_percent"], "stage": "model",
+                      "trend": {name: round(rng.uniform(-2, 2), 3)
+                                for name in ("hr_slope", "temp_slope", "spo2_slope", "hr_std")}}
+            conn.execute("""INSERT INTO predictions (timestamp_utc, patient_id, model_name, prediction_json,
+                            predicted_label, confidence, vitals_id, stage) VALUES (?,?,?,?,?,?,?,?)""",
+                         ((ts + timedelta(milliseconds=40)).replace(tzinfo=None).isoformat(), pid, "bench", json.dumps(detail),
+                          "High Risk" if conf > 0.52 else "Low Risk", conf, cur.lastrowid, "model"))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return start
+
+
+def timed(conn, sql, args, repeat):
+    conn.execute(sql, args).fetchall()  # warm the page cache
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        rows = conn.execute(sql, args).fetchall()
+    return (time.perf_counter() - t0) / repeat * 1000, rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--patients", type=int, default=20)
+    ap.add_argument("--rows", type=int, default=5000, help="vitals + predictions rows per patient")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_storage_")
+    legacy = os.path.join(workdir, "legacy.db")
+    compact = os.path.join(workdir, "compact.db")
+    print(f"Seeding {args.patients} x {args.rows} rows in {workdir} ...")
+    start = seed(legacy, args.patients, args.rows)
+    shutil.copy(legacy, compact)
+    conn = sqlite3.connect(compact)
+    t0 = time.perf_counter()
+    compact_storage.migrate(conn)
+    print(f"migrate() took {time.perf_counter() - t0:.2f}s")
+    conn.close()
+
+    # Last quarter of the time range
+    since = start + timedelta(seconds=5 * args.rows * 3 // 4)
+    window = "SELECT COUNT(*), AVG(heart_rate_bpm) FROM {} WHERE {} >= ?"
+    results = {}
+    for name, path in (("legacy", legacy), ("compact", compact)):
+        conn = sqlite3.connect(path)
+        stats = compact_storage.storage_stats(conn)
+        r = results[name] = {"size": stats, "file": os.path.getsize(path)}
+        if name == "legacy":
+            r["range"] = timed(conn, window.format("vitals", "timestamp_utc"), (since.isoformat(),), args.repeat)
+        else:
+            r["range"] = timed(conn, window.format("vitals_store", "ts_ms"),
+                               (compact_storage.to_ms(since),), args.repeat)
+            r["range view"] = timed(conn, window.format("vitals", "timestamp_utc"),
+                                    (since.isoformat(),), args.repeat)
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            body = _read_vitals_history(conn, "S0000", args.rows)
+        r["history"] = ((time.perf_counter() - t0) / args.repeat * 1000, json.loads(body))
+        r["full"] = timed(conn, "SELECT * FROM predictions", (), args.repeat)
+        conn.close()
+
+    print(f"\n{'':<22}{'legacy':>14}{'compact':>14}")
+    for table in ("vitals", "predictions"):
+        a, b = results["legacy"]["size"][table], results["compact"]["size"][table]
+        print(f"{table + ' bytes/row':<22}{a['bytes_per_row'] or 0:>14.1f}{b['bytes_per_row'] or 0:>14.1f}")
+    print(f"{'file size (MiB)':<22}{results['legacy']['file'] / 2**20:>14.2f}"
+          f"{results['compact']['file'] / 2**20:>14.2f}")
+    for key, label in (("range", "range scan (ms)"), ("history", "history read (ms)"),
+                       ("full", "predictions * (ms)")):
+        print(f"{label:<22}{results['legacy'][key][0]:>14.2f}{results['compact'][key][0]:>14.2f}")
+    print(f"{'range via view (ms)':<22}{'':>14}{results['compact']['range view'][0]:>14.2f}")
+
+    same_range = results["legacy"]["range"][1] == results["compact"]["range"][1] == \
+        results["compact"]["range view"][1]
+    same_history = results["legacy"]["history"][1] == results["compact"]["history"][1]
+    same_full = results["legacy"]["full"][1] == results["compact"]["full"][1]
+    print(f"\nidentical results (byte for byte): range {same_range}, history {same_history}, "
+          f"predictions {same_full}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
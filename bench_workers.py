@@ -0,0 +1,67 @@
+# bench_workers.py - /patients THROUGHPUT vs NUMBER OF serve.py WORKERS (WAL DATABASE)
+"""
+Seeds a throw-away hospital.db (bench_api.seed_db), lets serve.py switch it
+to WAL and then measures /patients with 1, 2, 4 ... workers using the same
+asyncio load generator as bench_api.py.
+
+    python bench_workers.py                          # workers 1,2,4
+    python bench_workers.py --workers 1,2,4,8 --concurrency 200 --requests 5000
+
+Scaling is bounded by the machine's cores (printed first): once workers
+exceed cores the extra processes only add context switches.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from bench_api import BASE_DIR, seed_db, start_api, stop_api, run_load, print_result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--patients", type=int, default=50)
+    ap.add_argument("--rows", type=int, default=50, help="vitals rows per patient")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.concurrency * 2 + 256)), hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    print(f"CPU cores: {os.cpu_count()}")
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    try:
+        print(f"Seeding {args.patients} patients x {args.rows} rows in {workdir} ...")
+        seed_db(workdir, args.patients, args.rows)
+        baseline = None
+        for n in [int(w) for w in args.workers.split(",")]:
+            proc = start_api(workdir, args.port, args=[
+                sys.executable, os.path.join(BASE_DIR, "serve.py"), "--port", str(args.port),
+                "--workers", str(n), "--log-level", "warning"])
+            try:
+                run_load(args.port, [("GET", "/patients", b"")] * min(100, args.requests), args.concurrency)  # warm-up
+                r = run_load(args.port, [("GET", "/patients", b"")] * args.requests, args.concurrency)
+            finally:
+                stop_api(proc)
+            baseline = baseline or r["rps"]
+            print_result(f"/patients  workers={n}", r)
+            print(f"{'':<28} x{r['rps'] / baseline:.2f} vs first run")
+
+        conn = sqlite3.connect(os.path.join(workdir, "hospital.db"))
+        print(f"journal_mode: {conn.execute('PRAGMA journal_mode').fetchone()[0]}")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
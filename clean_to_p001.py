@@ -1,22 +1,10 @@
-import sqlite3
+# clean_to_p001.py - KEEP ONLY P001 (kept for run_all.py and old instructions)
+# The work is done by purge.py in small batches instead of one long
+# transaction that blocked the generator and predictor.
+import purge
 
-DB_PATH = "hospital.db"
 KEEP_ID = "P001"
 
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-
-# Delete everything for other patients from predictions & alerts first
-c.execute("DELETE FROM predictions WHERE patient_id != ?", (KEEP_ID,))
-c.execute("DELETE FROM alerts WHERE patient_id != ?", (KEEP_ID,))
-
-# Delete vitals of other patients
-c.execute("DELETE FROM vitals WHERE patient_id != ?", (KEEP_ID,))
-
-# Delete other patients themselves
-c.execute("DELETE FROM patients WHERE patient_id != ?", (KEEP_ID,))
-
-conn.commit()
-conn.close()
+purge.main(["--keep", KEEP_ID])
 
 print("✅ Cleaned database: only P001 remains in patients, vitals, predictions, and alerts.")
@@ -0,0 +1,413 @@
+# compact_storage.py - COMPACT ON-DISK FORMAT FOR vitals / predictions (OPT-IN)
+"""
+    python compact_storage.py            # convert hospital.db in place (then VACUUM), or update it
+    python compact_storage.py --status   # legacy or compact, rows and bytes per row
+
+Legacy rows repeat a lot: a 32-byte ISO-8601 timestamp string per row, a
+raw_payload JSON in every generate_vitals.py row that is just the typed
+columns again, and a prediction_json in every predictions row that repeats
+confidence, stage and the vitals it was computed from.
+
+The compact format keeps the data in two new tables:
+
+    vitals_store       ts_ms INTEGER (epoch milliseconds) and ts_us (the
+                       microseconds past it) instead of timestamp_utc;
+                       raw_payload only when it says more than the typed
+                       columns (has_payload remembers that there was one,
+                       and its separators)
+    predictions_store  ts_ms / ts_us; detail_extra holds only the part of
+                       prediction_json no other column already has (a
+                       trend model's features) - derived = 1 / 2 marks
+                       such rows
+
+and replaces `vitals` / `predictions` with VIEWS of the same name and
+columns, so every existing query and API response keeps working, with the
+same text: the view renders each table's usual timestamp spelling
+(isoformat() with microseconds, "+00:00" for vitals, naive for predictions)
+and rebuilds raw_payload / prediction_json with json_object() in the
+separators they were written with. Anything that would not come back byte
+for byte - another offset, no fraction, a hand-written payload - is stored
+verbatim (ts_text, raw_payload, detail_extra), so nothing is lost or
+reformatted. ts_ms is set on every row, so time-window readers (purge.py,
+backfill.py, api.py) filter vitals_store.ts_ms rather than the view.
+INSTEAD OF triggers accept the usual INSERT/DELETE statements on the views,
+so write-behind batches, seeds and clean-up scripts need no change.
+
+The one thing a view cannot give back is cursor.lastrowid (rows inserted by
+a trigger do not set it), so producers that need the new id insert through
+insert_vitals(). They look the format up once per connection, so restart
+them after converting. A database converted by an older version of this
+script is brought up to date by running it again (its old rows keep their
+millisecond timestamps). bench_storage.py measures bytes per row and scan
+speed of both formats.
+"""
+import json
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+import storage
+
+DB_PATH = "hospital.db"
+
+PAYLOAD_KEYS = ["heart_rate_bpm", "temperature_c", "spo2_percent", "systolic_bp", "diastolic_bp", "rr"]
+DERIVED_DETAIL_PATHS = "'$.risk_score', '$.hr', '$.temp', '$.spo2', '$.stage'"
+TS_PATTERN = ("[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T[0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+              ".[0-9][0-9][0-9][0-9][0-9][0-9]")
+# The one spelling per table the views render back: what its writers' isoformat() produces
+VITALS_TS_SUFFIX = "+00:00"      # producers: datetime.now(timezone.utc).isoformat()
+PREDICTIONS_TS_SUFFIX = ""       # predictor: datetime.utcnow().isoformat()
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _ts_canonical(t, suffix):
+    """SQL: true when t is a valid YYYY-MM-DDTHH:MM:SS.ffffff<suffix> timestamp."""
+    return (f"({t} GLOB '{TS_PATTERN}{suffix}' "
+            f"AND strftime('%Y-%m-%dT%H:%M:%S', substr({t}, 1, 19)) = substr({t}, 1, 19))")
+
+
+def _ts_columns(t, suffix):
+    """SQL: ts_ms, ts_us, ts_text for ISO-8601 text t (naive = UTC).
+
+    Canonical text is stored as epoch milliseconds plus the microseconds past them;
+    anything else keeps its text in ts_text, with ts_ms (rounded) for range queries.
+    """
+    canonical = _ts_canonical(t, suffix)
+    exact = f"strftime('%s', substr({t}, 1, 19)) * 1000 + CAST(substr({t}, 21, 3) AS INTEGER)"
+    other = f"CAST(ROUND((julianday({t}) - 2440587.5) * 86400000.0) AS INTEGER)"
+    return (f"CASE WHEN {canonical} THEN {exact} ELSE {other} END, "
+            f"CASE WHEN {canonical} THEN CAST(substr({t}, 24, 3) AS INTEGER) ELSE 0 END, "
+            f"CASE WHEN {canonical} THEN NULL ELSE {t} END")
+
+
+def _timestamp(prefix, suffix):
+    """SQL: timestamp_utc of a *_store row."""
+    ms, us = f"{prefix}ts_ms", f"{prefix}ts_us"
+    return (f"COALESCE({prefix}ts_text, strftime('%Y-%m-%dT%H:%M:%S', {ms} / 1000, 'unixepoch') "
+            f"|| printf('.%03d%03d', {ms} % 1000, {us}) || '{suffix}')")
+
+
+# timestamp_utc for readers that query vitals_store / predictions_store directly
+VITALS_TIMESTAMP = _timestamp("", VITALS_TS_SUFFIX)
+PREDICTIONS_TIMESTAMP = _timestamp("", PREDICTIONS_TS_SUFFIX)
+
+
+def _spaced(expr):
+    """SQL: compact JSON text as json.dumps() writes it (', ' and ': ' separators)."""
+    return f"""replace(replace({expr}, ',"', ', "'), '":', '": ')"""
+
+
+def _payload(prefix):
+    """SQL: the raw_payload generate_vitals.py would have written for these typed columns (compact JSON)."""
+    return "json_object(" + ", ".join(f"'{k}', {prefix}{k}" for k in PAYLOAD_KEYS) + ")"
+
+
+def _payload_flag(prefix):
+    """SQL: has_payload - 0 none, 1 stored verbatim or the compact rebuild, 2 the json.dumps() rebuild."""
+    raw = f"{prefix}raw_payload"
+    return (f"CASE WHEN {raw} IS NULL THEN 0 WHEN {raw} = {_spaced(_payload(prefix))} THEN 2 ELSE 1 END")
+
+
+def _payload_kept(prefix):
+    """SQL: raw_payload to store - NULL when the typed columns rebuild it byte for byte."""
+    raw = f"{prefix}raw_payload"
+    return (f"CASE WHEN {raw} = {_payload(prefix)} OR {raw} = {_spaced(_payload(prefix))} "
+            f"THEN NULL ELSE {raw} END")
+
+
+def _detail_base(p, v):
+    """SQL: the part of prediction_json that other columns already hold."""
+    return (f"json_object('risk_score', {p}confidence, 'hr', {v}heart_rate_bpm, "
+            f"'temp', {v}temperature_c, 'spo2', {v}spo2_percent, 'stage', {p}stage)")
+
+
+def _detail_extra(p):
+    return f"json_remove({p}prediction_json, {DERIVED_DETAIL_PATHS})"
+
+
+def _detail_derived(p, v):
+    """SQL: derived - 1 when base + extra rebuilds prediction_json as compact JSON, 2 as
+    json.dumps() writes it, 0 when it has to be stored verbatim."""
+    pj = f"{p}prediction_json"
+    rebuilt = f"json_patch({_detail_base(p, v)}, {_detail_extra(p)})"
+    return (f"CASE WHEN json_valid({pj}) AND json_type({pj}) = 'object' THEN "
+            f"CASE WHEN {rebuilt} = {pj} THEN 1 WHEN {_spaced(rebuilt)} = {pj} THEN 2 ELSE 0 END "
+            f"ELSE 0 END")
+
+
+def _detail_kept(p, v):
+    return (f"CASE WHEN {_detail_derived(p, v)} THEN NULLIF({_detail_extra(p)}, '{{}}') "
+            f"ELSE {p}prediction_json END")
+
+
+VITALS_COLUMNS = "patient_id, device_id, heart_rate_bpm, temperature_c, spo2_percent, systolic_bp, diastolic_bp, rr"
+VITALS_FIELDS = ["id", "timestamp_utc", *VITALS_COLUMNS.split(", "), "health_status", "raw_payload"]
+PREDICTION_FIELDS = ["id", "timestamp_utc", "patient_id", "model_name", "prediction_json", "predicted_label",
+                     "confidence", "vitals_id", "stage"]
+VITALS_STORE_COLUMNS = f"id, ts_ms, ts_us, ts_text, {VITALS_COLUMNS}, health_status, has_payload, raw_payload"
+PREDICTIONS_STORE_COLUMNS = ("id, ts_ms, ts_us, ts_text, patient_id, model_name, predicted_label, confidence, "
+                             "vitals_id, stage, derived, detail_extra")
+
+
+def _one_row(fields, value):
+    """SQL: a one-row subquery with the given columns, e.g. value="NEW.{}" or "?"."""
+    return "(SELECT " + ", ".join(f"{value.format(f)} AS {f}" for f in fields) + ")"
+
+
+def _vitals_rows(source):
+    """SQL: SELECT of VITALS_STORE_COLUMNS from legacy-shaped vitals rows (VITALS_FIELDS) in source."""
+    return f"""SELECT id, {_ts_columns("timestamp_utc", VITALS_TS_SUFFIX)}, {VITALS_COLUMNS}, health_status,
+           {_payload_flag("")}, {_payload_kept("")}
+    FROM {source}"""
+
+
+def _prediction_rows(source):
+    """SQL: SELECT of PREDICTIONS_STORE_COLUMNS from legacy-shaped predictions rows in source."""
+    return f"""SELECT p.id, {_ts_columns("p.timestamp_utc", PREDICTIONS_TS_SUFFIX)},
+           p.patient_id, p.model_name, p.predicted_label, p.confidence, p.vitals_id, p.stage,
+           {_detail_derived("p.", "v.")}, {_detail_kept("p.", "v.")}
+    FROM {source} p
+    LEFT JOIN vitals_store v ON v.id = p.vitals_id"""
+
+
+STORE_SCHEMA = f"""
+CREATE TABLE vitals_store (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_ms INTEGER,
+    ts_us INTEGER NOT NULL DEFAULT 0,
+    ts_text TEXT,
+    patient_id TEXT,
+    device_id TEXT,
+    heart_rate_bpm INTEGER,
+    temperature_c REAL,
+    spo2_percent INTEGER,
+    systolic_bp INTEGER,
+    diastolic_bp INTEGER,
+    rr INTEGER,
+    health_status TEXT,
+    has_payload INTEGER NOT NULL DEFAULT 0,
+    raw_payload TEXT
+);
+
+CREATE TABLE predictions_store (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts_ms INTEGER,
+    ts_us INTEGER NOT NULL DEFAULT 0,
+    ts_text TEXT,
+    patient_id TEXT,
+    model_name TEXT,
+    predicted_label TEXT,
+    confidence REAL,
+    vitals_id INTEGER,
+    stage TEXT,
+    derived INTEGER NOT NULL DEFAULT 0,
+    detail_extra TEXT
+);
+"""
+
+_DETAIL = f"json_patch({_detail_base('p.', 'v.')}, COALESCE(p.detail_extra, '{{}}'))"
+
+VIEWS_SCHEMA = f"""
+CREATE INDEX IF NOT EXISTS idx_predictions_vitals ON predictions_store(vitals_id);
+
+CREATE VIEW vitals AS
+SELECT id, {_timestamp("", VITALS_TS_SUFFIX)} AS timestamp_utc, {VITALS_COLUMNS},
+       CASE WHEN raw_payload IS NOT NULL THEN raw_payload
+            WHEN has_payload = 2 THEN {_spaced(_payload(""))}
+            WHEN has_payload THEN {_payload("")} END AS raw_payload,
+       health_status
+FROM vitals_store;
+
+CREATE VIEW predictions AS
+SELECT p.id, {_timestamp("p.", PREDICTIONS_TS_SUFFIX)} AS timestamp_utc, p.patient_id, p.model_name,
+       CASE p.derived WHEN 1 THEN {_DETAIL} WHEN 2 THEN {_spaced(_DETAIL)}
+            ELSE p.detail_extra END AS prediction_json,
+       p.predicted_label, p.confidence, p.vitals_id, p.stage
+FROM predictions_store p
+LEFT JOIN vitals_store v ON v.id = p.vitals_id AND p.derived;
+
+CREATE TRIGGER vitals_insert INSTEAD OF INSERT ON vitals
+BEGIN
+    INSERT INTO vitals_store ({VITALS_STORE_COLUMNS})
+    {_vitals_rows(_one_row(VITALS_FIELDS, "NEW.{}"))};
+END;
+
+CREATE TRIGGER vitals_delete INSTEAD OF DELETE ON vitals
+BEGIN
+    DELETE FROM vitals_store WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER predictions_insert INSTEAD OF INSERT ON predictions
+BEGIN
+    INSERT INTO predictions_store ({PREDICTIONS_STORE_COLUMNS})
+    {_prediction_rows(_one_row(PREDICTION_FIELDS, "NEW.{}"))};
+END;
+
+CREATE TRIGGER predictions_delete INSTEAD OF DELETE ON predictions
+BEGIN
+    DELETE FROM predictions_store WHERE id = OLD.id;
+END;
+
+-- patient_latest (database.py) is maintained from the store tables in compact mode
+CREATE TRIGGER trg_latest_vitals AFTER INSERT ON vitals_store
+BEGIN
+    INSERT INTO patient_latest (patient_id, vitals_id, timestamp_utc, heart_rate_bpm,
+                                temperature_c, spo2_percent, health_status)
+    VALUES (NEW.patient_id, NEW.id, {_timestamp("NEW.", VITALS_TS_SUFFIX)}, NEW.heart_rate_bpm,
+            NEW.temperature_c, NEW.spo2_percent, COALESCE(NEW.health_status, 'NORMAL'))
+    ON CONFLICT(patient_id) DO UPDATE SET
+        vitals_id = excluded.vitals_id, timestamp_utc = excluded.timestamp_utc,
+        heart_rate_bpm = excluded.heart_rate_bpm, temperature_c = excluded.temperature_c,
+        spo2_percent = excluded.spo2_percent, health_status = excluded.health_status
+    WHERE excluded.vitals_id > COALESCE(patient_latest.vitals_id, 0);
+END;
+
+CREATE TRIGGER trg_latest_prediction AFTER INSERT ON predictions_store
+BEGIN
+    INSERT INTO patient_latest (patient_id, prediction_id, predicted_label, confidence)
+    VALUES (NEW.patient_id, NEW.id, COALESCE(NEW.predicted_label, 'Low Risk'),
+            COALESCE(NEW.confidence, 0.0))
+    ON CONFLICT(patient_id) DO UPDATE SET
+        prediction_id = excluded.prediction_id, predicted_label = excluded.predicted_label,
+        confidence = excluded.confidence
+    WHERE excluded.prediction_id > COALESCE(patient_latest.prediction_id, 0);
+END;
+"""
+
+# Columns added since the first compact format; its rows (millisecond timestamps) get ts_us = 0
+ADDED_COLUMNS = [("ts_us", "INTEGER NOT NULL DEFAULT 0"), ("ts_text", "TEXT")]
+
+INSERT_VITALS_SQL = f"INSERT INTO vitals_store ({VITALS_STORE_COLUMNS}) {_vitals_rows(_one_row(VITALS_FIELDS, '?'))}"
+INSERT_LEGACY_VITALS_SQL = f"INSERT INTO vitals ({', '.join(VITALS_FIELDS)}) VALUES ({', '.join('?' * len(VITALS_FIELDS))})"
+
+
+def is_compact(conn):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'vitals'").fetchone()
+    return row is not None and row[0] == "view"
+
+
+def migrate(conn):
+    """Convert a legacy database to the compact format in one transaction (or bring an older
+    compact one up to date). Returns False if there was nothing to do."""
+    if is_compact(conn):
+        added = [f"ALTER TABLE {table} ADD COLUMN {name} {decl}"
+                 for table in ("vitals_store", "predictions_store")
+                 for name, decl in ADDED_COLUMNS
+                 if name not in {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}]
+        if not added:
+            return False
+        _transaction(conn, added + ["DROP VIEW vitals", "DROP VIEW predictions",
+                                    "DROP TRIGGER trg_latest_vitals", "DROP TRIGGER trg_latest_prediction",
+                                    *_statements(VIEWS_SCHEMA)])
+        return True
+    import database
+    database.create_schema(conn)  # make sure predictions.stage / patient_latest exist first
+    if "stage" not in {r[1] for r in conn.execute("PRAGMA table_info(predictions)")}:
+        conn.execute("ALTER TABLE predictions ADD COLUMN stage TEXT")
+    conn.commit()
+
+    _transaction(conn, [
+        *_statements(STORE_SCHEMA),
+        f"INSERT INTO vitals_store ({VITALS_STORE_COLUMNS}) {_vitals_rows('vitals')} ORDER BY id",
+        f"INSERT INTO predictions_store ({PREDICTIONS_STORE_COLUMNS}) {_prediction_rows('predictions')} ORDER BY p.id",
+        _carry_sequences,
+        "DROP TABLE vitals",        # also drops its patient_latest trigger
+        "DROP TABLE predictions",
+        *_statements(VIEWS_SCHEMA),
+    ])
+    storage.init_file(conn)  # the VACUUM also applies auto_vacuum to an older file
+    conn.execute("VACUUM")
+    return True
+
+
+def _carry_sequences(conn):
+    """AUTOINCREMENT: never hand out an id the legacy tables already used."""
+    for old, new in (("vitals", "vitals_store"), ("predictions", "predictions_store")):
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (old,)).fetchone()
+        if seq and not conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                                    (seq[0], new)).rowcount:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (new, seq[0]))
+
+
+def _transaction(conn, steps):
+    """Run SQL statements / fn(conn) steps in one BEGIN IMMEDIATE transaction."""
+    # executescript() would COMMIT half-way, so the statements run one by one in our own transaction
+    level, conn.isolation_level = conn.isolation_level, None
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = level
+
+
+def _statements(script):
+    """Split a schema script into statements (trigger bodies contain ';')."""
+    out, buf = [], ""
+    for line in script.splitlines(keepends=True):
+        if line.strip().startswith("--"):
+            continue
+        buf += line
+        if sqlite3.complete_statement(buf):
+            out.append(buf.strip())
+            buf = ""
+    return [s for s in out if s]
+
+
+def to_ms(ts=None):
+    """ISO-8601 string / datetime / None (now) -> epoch milliseconds (naive means UTC), as ts_ms stores it."""
+    if ts is None:
+        ts = datetime.now(timezone.utc)
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - EPOCH) // timedelta(milliseconds=1)
+
+
+def insert_vitals(conn, timestamp_utc, patient_id, heart_rate_bpm, temperature_c, spo2_percent,
+                  systolic_bp=None, diastolic_bp=None, rr=None, health_status=None,
+                  device_id=None, raw_payload=None, compact=None):
+    """Insert one vitals row in either format and return its id (lastrowid works in both).
+
+    compact is is_compact(conn); long-running producers look it up once per connection and
+    pass it in instead of querying sqlite_master on every row.
+    """
+    if compact is None:
+        compact = is_compact(conn)
+    cur = conn.execute(INSERT_VITALS_SQL if compact else INSERT_LEGACY_VITALS_SQL,
+                       (None, timestamp_utc, patient_id, device_id, heart_rate_bpm, temperature_c,
+                        spo2_percent, systolic_bp, diastolic_bp, rr, health_status, raw_payload))
+    return cur.lastrowid
+
+
+def storage_stats(conn):
+    """Row counts and approximate bytes per row of vitals / predictions (needs the dbstat table)."""
+    compact = is_compact(conn)
+    stats = {"format": "compact" if compact else "legacy"}
+    for name in ("vitals", "predictions"):
+        table = f"{name}_store" if compact else name
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        try:
+            size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()[0] or 0
+        except sqlite3.OperationalError:  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+            size = None
+        stats[name] = {"rows": rows, "bytes": size,
+                       "bytes_per_row": round(size / rows, 1) if size and rows else None}
+    return stats
+
+
+if __name__ == "__main__":
+    conn = storage.connect(DB_PATH)
+    if "--status" not in sys.argv:
+        print("Converted / updated hospital.db to compact storage" if migrate(conn)
+              else "hospital.db already uses compact storage")
+    print(json.dumps(storage_stats(conn), indent=2))
+    conn.close()
@@ -2,10 +2,16 @@
 import streamlit as st
 import requests
 import time
+from event_bus import Subscriber
 
 st.set_page_config(page_title="Al-Salam ICU", layout="wide", page_icon="🏥")
 
-REFRESH_SECONDS = 5  # how often to refresh the dashboard
+REFRESH_SECONDS = 5  # how often to refresh the dashboard when nothing happens
+MAX_PATIENT_CARDS = 50  # highest-risk patients shown as cards
+
+# redraw as soon as the predictor commits new predictions/alerts (event_bus.py)
+if "bus" not in st.session_state:
+    st.session_state.bus = Subscriber(["predictions", "alerts"])
 
 # track previous # of critical patients so we can trigger alarm when it increases
 if "last_critical" not in st.session_state:
@@ -28,8 +34,13 @@ while True:
 
         # -------- LOAD DATA FROM FASTAPI --------
         try:
+            # highest AI risk first - sorted/limited by the API, counts from the summary
             patients = requests.get(
-                "http://127.0.0.1:8000/patients", timeout=10
+                "http://127.0.0.1:8000/patients",
+                params={"sort": "confidence", "limit": MAX_PATIENT_CARDS}, timeout=10
+            ).json()
+            summary = requests.get(
+                "http://127.0.0.1:8000/dashboard/summary", timeout=10
             ).json()
             alerts = requests.get(
                 "http://127.0.0.1:8000/alerts", timeout=10
@@ -39,12 +50,12 @@ while True:
             time.sleep(REFRESH_SECONDS)
             continue
 
-        critical = sum(1 for p in patients if p["health_status"] == "CRITICAL")
+        critical = summary["critical_patients"]
 
         # -------- TOP METRICS --------
         col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Patients", len(patients))
-        col2.metric("Stable", len(patients) - critical)
+        col1.metric("Patients", summary["total_patients"])
+        col2.metric("Stable", summary["total_patients"] - critical)
         col3.metric("CRITICAL", critical if critical else 0)
         col4.metric("Time", time.strftime("%H:%M:%S"))
 
@@ -90,5 +101,6 @@ while True:
             for a in alerts[:5]:
                 st.warning(f"**{a['full_name']}** → {a['alert_message']}")
 
-    # wait a bit, then redraw the whole page with fresh data
-    time.sleep(REFRESH_SECONDS)
+    # wait for new predictions/alerts (or REFRESH_SECONDS), then redraw with fresh data
+    if st.session_state.bus.wait(REFRESH_SECONDS) is None:
+        time.sleep(REFRESH_SECONDS)  # event bus not running
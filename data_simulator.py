@@ -2,35 +2,58 @@
 import time
 import random
 from datetime import datetime, timezone
-import sqlite3
+from vitals_channel import CHANNELS, open_producer
+from event_bus import Publisher
+from compact_storage import insert_vitals, is_compact
+from loop_profiler import LoopProfiler
+import storage
 
 print("LIVE VITALS GENERATOR STARTED → 3-second updates")
 
-# Keep connection open forever → NO LOCKS!
-conn = sqlite3.connect("hospital.db", check_same_thread=False)
+# Keep connection open forever; storage.connect waits for the lock instead of failing
+conn = storage.connect()
 c = conn.cursor()
 c.execute("SELECT patient_id FROM patients")
 patients = [row[0] for row in c.fetchall()]
+# Storage format looked up once; restart after `python compact_storage.py` converts the file
+compact = is_compact(conn)
+
+# Committed readings are also published to the predictor over shared memory
+channel = open_producer(CHANNELS[1])
+# ... and announced on the event bus so nobody has to poll for them
+bus = Publisher()
+
+# LOOP_PROFILE=1 reports per-cycle cost and memory growth (see loop_profiler.py)
+profiler = LoopProfiler("data_simulator")
 
 while True:
-    for pid in patients:
-        # 18% chance of critical (you'll see it often!)
-        if random.random() < 0.18:
-            hr = random.randint(128, 178)
-            temp = round(random.uniform(38.9, 41.5), 1)
-            spo2 = random.randint(65, 89)
-            status = "CRITICAL"
-        else:
-            hr = random.randint(58, 108)
-            temp = round(random.uniform(36.2, 37.8), 1)
-            spo2 = random.randint(93, 100)
-            status = "NORMAL"
+    with profiler.cycle():
+        readings = []
+        for pid in patients:
+            # 18% chance of critical (you'll see it often!)
+            if random.random() < 0.18:
+                hr = random.randint(128, 178)
+                temp = round(random.uniform(38.9, 41.5), 1)
+                spo2 = random.randint(65, 89)
+                status = "CRITICAL"
+            else:
+                hr = random.randint(58, 108)
+                temp = round(random.uniform(36.2, 37.8), 1)
+                spo2 = random.randint(93, 100)
+                status = "NORMAL"
 
-        c.execute("""INSERT INTO vitals 
-            (timestamp_utc, patient_id, heart_rate_bpm, temperature_c, spo2_percent, health_status)
-            VALUES (?,?,?,?,?,?)""",
-            (datetime.now(timezone.utc).isoformat(), pid, hr, temp, spo2, status))
+            readings.append((pid, hr, temp, spo2, status))
 
-    conn.commit()  # Only commit once per cycle
-    print(f"New vitals generated @ {time.strftime('%H:%M:%S')} | Critical: {sum(1 for _ in c.execute('SELECT * FROM vitals WHERE health_status=? ORDER BY id DESC LIMIT 7', ('CRITICAL',)).fetchall())}")
+        # Only commit once per cycle; retried as a whole while another process holds the write lock
+        ts = datetime.now(timezone.utc).isoformat()
+        vids = storage.write(conn, lambda conn: [insert_vitals(conn, ts, pid, hr, temp, spo2, health_status=status,
+                                                               compact=compact)
+                                                 for pid, hr, temp, spo2, status in readings])
+        published = [(vid, pid, time.time(), hr, temp, spo2, None, None, None, status)
+                     for vid, (pid, hr, temp, spo2, status) in zip(vids, readings)]
+        if channel is not None:
+            for reading in published:
+                channel.publish(*reading)
+        bus.publish("vitals", {"ids": [r[0] for r in published], "patients": patients})
+        print(f"New vitals generated @ {time.strftime('%H:%M:%S')} | Critical: {sum(1 for _ in c.execute('SELECT * FROM vitals WHERE health_status=? ORDER BY id DESC LIMIT 7', ('CRITICAL',)).fetchall())}")
     time.sleep(3)
\ No newline at end of file
@@ -1,17 +1,16 @@
 # database.py
+import os
 import sqlite3
+import sys
 from datetime import datetime
 
-conn = sqlite3.connect("hospital.db")
-c = conn.cursor()
+import storage
 
-c.executescript("""
-DROP TABLE IF EXISTS alerts;
-DROP TABLE IF EXISTS predictions;
-DROP TABLE IF EXISTS vitals;
-DROP TABLE IF EXISTS patients;
+DB_PATH = "hospital.db"
+TABLES = ["patients", "vitals", "predictions", "alerts", "patient_latest"]
 
-CREATE TABLE patients (
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
     patient_id TEXT PRIMARY KEY,
     full_name TEXT,
     dob TEXT,
@@ -23,7 +22,7 @@ CREATE TABLE patients (
     notes TEXT
 );
 
-CREATE TABLE vitals (
+CREATE TABLE IF NOT EXISTS vitals (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp_utc TEXT,
     patient_id TEXT,
@@ -38,7 +37,7 @@ CREATE TABLE vitals (
     health_status TEXT
 );
 
-CREATE TABLE predictions (
+CREATE TABLE IF NOT EXISTS predictions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp_utc TEXT,
     patient_id TEXT,
@@ -46,21 +45,92 @@ CREATE TABLE predictions (
     prediction_json TEXT,
     predicted_label TEXT,
     confidence REAL,
-    vitals_id INTEGER
+    vitals_id INTEGER,
+    stage TEXT
 );
 
-CREATE TABLE alerts (
+CREATE TABLE IF NOT EXISTS alerts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp_utc TEXT,
     patient_id TEXT,
     alert_type TEXT,
     alert_message TEXT,
     vitals_id INTEGER,
-    handled INTEGER DEFAULT 0
+    handled INTEGER DEFAULT 0,
+    updated_utc TEXT,
+    samples INTEGER DEFAULT 1,
+    peak_confidence REAL
 );
-""")
+CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts(patient_id, handled);
+"""
+
+# Indexes on the history tables - only while they are plain tables; a compact
+# database (compact_storage.py) has views there and indexes its *_store tables
+HISTORY_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_predictions_vitals ON predictions(vitals_id);
+"""
 
-patients = [
+# LATEST STATE PER PATIENT
+# One row per patient with its newest vitals and prediction, kept current by
+# triggers, so /patients can filter, sort and take the top K through an index
+# instead of ranking every vitals/predictions row on each request.
+LATEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patient_latest (
+    patient_id TEXT PRIMARY KEY,
+    vitals_id INTEGER,
+    timestamp_utc TEXT,
+    heart_rate_bpm INTEGER,
+    temperature_c REAL,
+    spo2_percent INTEGER,
+    health_status TEXT NOT NULL DEFAULT 'NORMAL',
+    prediction_id INTEGER,
+    predicted_label TEXT NOT NULL DEFAULT 'Low Risk',
+    confidence REAL NOT NULL DEFAULT 0.0
+);
+-- patient_id is the tie-breaker of every /patients sort, so ORDER BY ... LIMIT walks an index
+CREATE INDEX IF NOT EXISTS idx_latest_confidence ON patient_latest(confidence, patient_id);
+CREATE INDEX IF NOT EXISTS idx_latest_status ON patient_latest(health_status, confidence, patient_id);
+CREATE INDEX IF NOT EXISTS idx_latest_risk ON patient_latest(predicted_label, confidence, patient_id);
+CREATE INDEX IF NOT EXISTS idx_latest_hr ON patient_latest(heart_rate_bpm, patient_id);
+CREATE INDEX IF NOT EXISTS idx_latest_temp ON patient_latest(temperature_c, patient_id);
+CREATE INDEX IF NOT EXISTS idx_latest_spo2 ON patient_latest(spo2_percent, patient_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_latest_patient AFTER INSERT ON patients
+BEGIN
+    INSERT OR IGNORE INTO patient_latest (patient_id) VALUES (NEW.patient_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_latest_patient_delete AFTER DELETE ON patients
+BEGIN
+    DELETE FROM patient_latest WHERE patient_id = OLD.patient_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_latest_vitals AFTER INSERT ON vitals
+BEGIN
+    INSERT INTO patient_latest (patient_id, vitals_id, timestamp_utc, heart_rate_bpm,
+                                temperature_c, spo2_percent, health_status)
+    VALUES (NEW.patient_id, NEW.id, NEW.timestamp_utc, NEW.heart_rate_bpm,
+            NEW.temperature_c, NEW.spo2_percent, COALESCE(NEW.health_status, 'NORMAL'))
+    ON CONFLICT(patient_id) DO UPDATE SET
+        vitals_id = excluded.vitals_id, timestamp_utc = excluded.timestamp_utc,
+        heart_rate_bpm = excluded.heart_rate_bpm, temperature_c = excluded.temperature_c,
+        spo2_percent = excluded.spo2_percent, health_status = excluded.health_status
+    WHERE excluded.vitals_id > COALESCE(patient_latest.vitals_id, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_latest_prediction AFTER INSERT ON predictions
+BEGIN
+    INSERT INTO patient_latest (patient_id, prediction_id, predicted_label, confidence)
+    VALUES (NEW.patient_id, NEW.id, COALESCE(NEW.predicted_label, 'Low Risk'),
+            COALESCE(NEW.confidence, 0.0))
+    ON CONFLICT(patient_id) DO UPDATE SET
+        prediction_id = excluded.prediction_id, predicted_label = excluded.predicted_label,
+        confidence = excluded.confidence
+    WHERE excluded.prediction_id > COALESCE(patient_latest.prediction_id, 0);
+END;
+"""
+
+PATIENTS = [
     ('P001', 'Ahmed Mostafa', '1985-04-15', 'Male', 'Cairo', 'Hypertension', 'Lisinopril 10mg', 'Moderate', ''),
     ('P002', 'Sara Ali', '1990-09-10', 'Female', 'Alexandria', 'Diabetes', 'Metformin 500mg', 'Mild', ''),
     ('P003', 'Mahmoud Hassan', '1978-06-20', 'Male', 'Giza', 'Asthma', 'Salbutamol', 'Mild', ''),
@@ -69,15 +139,114 @@ patients = [
     ('P006', 'Nour Adel', '1988-03-27', 'Female', 'Suez', 'None', 'None', 'Healthy', ''),
     ('P007', 'Hassan Ibrahim', '1970-11-11', 'Male', 'Aswan', 'COPD', 'Inhaler', 'Moderate', ''),
 ]
-c.executemany("INSERT INTO patients VALUES (?,?,?,?,?,?,?,?,?)", patients)
 
-now = datetime.utcnow().isoformat()
-vitals_sample = [
-    (now, 'P001', 'DEV1', 82, 36.9, 97, 125, 85, 16, '{}', 'Stable'),
-    (now, 'P002', 'DEV2', 90, 37.2, 95, 130, 88, 18, '{}', 'Warning'),
-]
-c.executemany("INSERT INTO vitals VALUES (NULL,?,?,?,?,?,?,?,?,?,?,?)", vitals_sample)
 
-conn.commit()
-conn.close()
-print("hospital.db created with 7 real patients")
+def create_schema(conn):
+    """Create any missing table/index/trigger (never touches existing data)."""
+    conn.executescript(SCHEMA)
+    create_history_indexes(conn)
+    backfill = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='patient_latest'").fetchone()
+    conn.executescript(LATEST_SCHEMA)
+    if backfill:
+        rebuild_patient_latest(conn)
+
+
+def create_history_indexes(conn):
+    """Create HISTORY_INDEXES unless vitals/predictions are compact views (views cannot be indexed)."""
+    kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE name IN ('vitals', 'predictions')"))
+    if "view" not in kinds.values():
+        conn.executescript(HISTORY_INDEXES)
+
+
+def rebuild_patient_latest(conn, patient_ids=None):
+    """Recompute patient_latest from patients/vitals/predictions (migration, after bulk deletes).
+
+    patient_ids limits the work to those patients (purge.py after deleting their newest rows).
+    """
+    only, params = "", []
+    if patient_ids is not None:
+        params = list(patient_ids)
+        only = f"WHERE patient_id IN ({','.join('?' * len(params))})"
+    conn.execute(f"DELETE FROM patient_latest {only}", params)
+    conn.execute(f"""
+        INSERT INTO patient_latest (patient_id, vitals_id, timestamp_utc, heart_rate_bpm,
+                                    temperature_c, spo2_percent, health_status,
+                                    prediction_id, predicted_label, confidence)
+        SELECT p.patient_id, v.id, v.timestamp_utc, v.heart_rate_bpm,
+               v.temperature_c, v.spo2_percent, COALESCE(v.health_status, 'NORMAL'),
+               pr.id, COALESCE(pr.predicted_label, 'Low Risk'), COALESCE(pr.confidence, 0.0)
+        FROM (SELECT patient_id FROM patients {only}) p
+        LEFT JOIN (SELECT patient_id, MAX(id) AS id FROM vitals {only} GROUP BY patient_id) lv
+               ON lv.patient_id = p.patient_id
+        LEFT JOIN vitals v ON v.id = lv.id
+        LEFT JOIN (SELECT patient_id, MAX(id) AS id FROM predictions {only} GROUP BY patient_id) lp
+               ON lp.patient_id = p.patient_id
+        LEFT JOIN predictions pr ON pr.id = lp.id
+    """, params * 3)
+    conn.commit()
+
+
+def schema_ready(path=DB_PATH):
+    """True when the database file exists and has every table the services use.
+
+    vitals / predictions may be views over compact tables (compact_storage.py).
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        conn = storage.connect(path, readonly=True)
+        try:
+            names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return all(t in names for t in TABLES)
+
+
+def seed(conn):
+    conn.executemany("INSERT INTO patients VALUES (?,?,?,?,?,?,?,?,?)", PATIENTS)
+    now = datetime.utcnow().isoformat()
+    vitals_sample = [
+        (now, 'P001', 'DEV1', 82, 36.9, 97, 125, 85, 16, '{}', 'Stable'),
+        (now, 'P002', 'DEV2', 90, 37.2, 95, 130, 88, 18, '{}', 'Warning'),
+    ]
+    conn.executemany("INSERT INTO vitals VALUES (NULL,?,?,?,?,?,?,?,?,?,?,?)", vitals_sample)
+
+
+def init_db(path=DB_PATH, reset=True):
+    """Create hospital.db with the 7 demo patients.
+
+    reset=True drops and recreates everything (the historical behaviour of
+    `python database.py`); reset=False keeps an existing database, only adds
+    missing tables and seeds an empty one. Returns True when it seeded.
+    """
+    conn = storage.connect(path)
+    # A new file gets auto_vacuum = INCREMENTAL (purge.py hands freed pages back with it) and WAL
+    storage.init_file(conn)
+    if reset:
+        # A compact database (compact_storage.py) has views named vitals/predictions
+        # over *_store tables; a reset goes back to the plain tables
+        kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')"))
+        for name in ["patient_latest", "alerts", "predictions", "vitals",
+                     "predictions_store", "vitals_store", "patients"]:
+            if name in kinds:
+                conn.execute(f"DROP {kinds[name].upper()} {name}")
+        conn.commit()
+    create_schema(conn)
+    fresh = conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0] == 0
+    if fresh:
+        seed(conn)
+    conn.commit()
+    conn.close()
+    return fresh
+
+
+if __name__ == "__main__":
+    # python database.py              -> wipe and recreate
+    # python database.py --if-missing -> only create when there is no usable database
+    if init_db(DB_PATH, reset="--if-missing" not in sys.argv):
+        print("hospital.db created with 7 real patients")
+    else:
+        print("hospital.db already exists - kept")
@@ -0,0 +1,152 @@
+# distill_model.py - DISTILL real_hospital_model.pkl INTO SMALLER MODELS + TRADE-OFF REPORT
+"""
+The forest has 300 trees of depth 8 for three input features. This trains
+smaller candidates on the forest's own probabilities (soft targets) over
+the range of readings the producers send, saves each next to the original
+and writes risk_models.json:
+
+    forest_50_d8     50 trees, depth 8          (RandomForestRegressor)
+    forest_10_d6     10 trees, depth 6
+    gbm_100_d3       100 boosting stages, depth 3 (GradientBoostingRegressor)
+    grid_fine        lookup grid, HR 2 bpm x temp 0.1 C x SpO2 1 %
+    grid_coarse      lookup grid, HR 5 bpm x temp 0.25 C x SpO2 2 %
+
+and reports for each (and the original): file size, load time, latency per
+reading at batch 1 and 15 (the predictor's batch) and agreement with the
+original on the risk label (> RISK_THRESHOLD) and alert trigger
+(> OPEN_THRESHOLD), on a held-out stream that was not used for training.
+
+    python distill_model.py                 # build, save, write the manifest
+    python distill_model.py --budget-us 50  # ... and show what the predictor would pick
+
+Latency depends on the machine: run it where the predictor runs.
+ai_predictor.py picks a model when PREDICTOR_LATENCY_BUDGET_US is set.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+from ai_predictor import MODEL_PATH, RISK_THRESHOLD, load_or_train_model, normalize
+from alert_engine import OPEN_THRESHOLD
+from risk_models import MANIFEST_PATH, GridRiskModel, ProbaRegressor, select_model, synthetic_stream
+
+# Raw (hr, temp, spo2) range the candidates must cover; outside it the grid clamps
+DOMAIN_LOW = (30, 33.0, 50)
+DOMAIN_HIGH = (220, 43.0, 100)
+GRIDS = {
+    "grid_fine": (2, 0.1, 1),
+    "grid_coarse": (5, 0.25, 2),
+}
+TRAIN_ROWS = 40000
+EVAL_ROWS = 20000
+LATENCY_CALLS = 300
+
+
+def domain_sample(n, seed):
+    """Readings from the producers' stream plus uniform draws over the whole domain."""
+    rng = np.random.default_rng(seed)
+    uniform = np.column_stack([
+        rng.integers(DOMAIN_LOW[0], DOMAIN_HIGH[0] + 1, n // 2),
+        np.round(rng.uniform(DOMAIN_LOW[1], DOMAIN_HIGH[1], n // 2), 1),
+        rng.integers(DOMAIN_LOW[2], DOMAIN_HIGH[2] + 1, n // 2),
+    ])
+    raw = np.vstack([synthetic_stream(n - n // 2, seed=seed), uniform])
+    return normalize(raw[:, 0], raw[:, 1], raw[:, 2])
+
+
+def candidates(teacher, X, soft):
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+    yield "forest_50_d8", ProbaRegressor(
+        RandomForestRegressor(n_estimators=50, max_depth=8, min_samples_leaf=20, random_state=42).fit(X, soft))
+    yield "forest_10_d6", ProbaRegressor(
+        RandomForestRegressor(n_estimators=10, max_depth=6, min_samples_leaf=20, random_state=42).fit(X, soft))
+    yield "gbm_100_d3", ProbaRegressor(
+        GradientBoostingRegressor(n_estimators=100, max_depth=3, random_state=42).fit(X, soft))
+    low = normalize(*DOMAIN_LOW)[0]
+    high = normalize(*DOMAIN_HIGH)[0]
+    for name, (hr, temp, spo2) in GRIDS.items():
+        steps = high - normalize(DOMAIN_HIGH[0] - hr, DOMAIN_HIGH[1] - temp, DOMAIN_HIGH[2] - spo2)[0]
+        yield name, GridRiskModel.fit(teacher, low, high, steps)
+
+
+def measure(name, path, X_eval, reference):
+    """Size, load time, latency and agreement of the model saved at path."""
+    loads = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        model = joblib.load(path)
+        loads.append(time.perf_counter() - t0)
+    latency = {}
+    for batch in (1, 15):
+        X = X_eval[:batch]
+        model.predict_proba(X)  # warm up
+        t0 = time.perf_counter()
+        for _ in range(LATENCY_CALLS):
+            model.predict_proba(X)
+        latency[str(batch)] = round((time.perf_counter() - t0) / LATENCY_CALLS / batch * 1e6, 1)
+    p = model.predict_proba(X_eval)[:, 1]
+    return {
+        "name": name,
+        "path": path,
+        "bytes": os.path.getsize(path),
+        "load_ms": round(min(loads) * 1000, 2),
+        "latency_us": latency,
+        "label_agreement": round(float(((p > RISK_THRESHOLD) == (reference > RISK_THRESHOLD)).mean()), 5),
+        "alert_agreement": round(float(((p > OPEN_THRESHOLD) == (reference > OPEN_THRESHOLD)).mean()), 5),
+        "mean_abs_diff": round(float(np.abs(p - reference).mean()), 5),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget-us", type=float, help="also show the model selected for this per-reading budget")
+    ap.add_argument("--min-agreement", type=float, default=0.99)
+    args = ap.parse_args()
+
+    teacher = load_or_train_model()
+    if getattr(teacher, "n_features_in_", 3) != 3:
+        raise SystemExit(f"{MODEL_PATH} uses trend features - only the 3-feature model can be distilled")
+
+    X_train = domain_sample(TRAIN_ROWS, seed=1)
+    X_eval = domain_sample(EVAL_ROWS, seed=2)
+    soft = teacher.predict_proba(X_train)[:, 1]
+    reference = teacher.predict_proba(X_eval)[:, 1]
+
+    models = [measure("forest_300_d8", MODEL_PATH, X_eval, reference)]
+    for name, model in candidates(teacher, X_train, soft):
+        path = f"risk_model_{name}.pkl"
+        joblib.dump(model, path)
+        models.append(measure(name, path, X_eval, reference))
+        print(f"[OK] {name} → {path}")
+
+    manifest = {
+        "teacher": MODEL_PATH,
+        "created_utc": datetime.now(timezone.utc).isoformat(),
+        "eval_rows": EVAL_ROWS,
+        "models": models,
+    }
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"\n{'model':<15}{'size KiB':>10}{'load ms':>9}{'µs/1':>9}{'µs/15':>8}"
+          f"{'label':>9}{'alert':>9}{'|Δp|':>8}")
+    for m in models:
+        print(f"{m['name']:<15}{m['bytes'] / 1024:>10.1f}{m['load_ms']:>9.1f}"
+              f"{m['latency_us']['1']:>9.1f}{m['latency_us']['15']:>8.1f}"
+              f"{m['label_agreement']:>9.2%}{m['alert_agreement']:>9.2%}{m['mean_abs_diff']:>8.4f}")
+    print(f"\nManifest → {MANIFEST_PATH}")
+
+    if args.budget_us is not None:
+        chosen = select_model(manifest, args.budget_us, args.min_agreement)
+        print(f"Budget {args.budget_us:g} µs/reading → "
+              + (chosen["name"] if chosen else f"nothing qualifies, the predictor keeps {MODEL_PATH}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# early_warning.py - VECTORIZED NEWS2 EARLY-WARNING SCORE FOR THE WHOLE WARD
+"""
+National Early Warning Score 2 (Royal College of Physicians, 2017) computed
+for every patient at once with NumPy - one searchsorted per vital instead of
+a Python if-ladder per patient, so thousands of beds score in ~1 ms.
+
+Parameter bands (value <= edge -> points; above the last edge -> last points):
+
+    respiration rate   <=8:3  9-11:1  12-20:0  21-24:2  >=25:3
+    SpO2 (scale 1)     <=91:3  92-93:2  94-95:1  >=96:0
+    systolic BP        <=90:3  91-100:2  101-110:1  111-219:0  >=220:3
+    pulse              <=40:3  41-50:1  51-90:0  91-110:1  111-130:2  >=131:3
+    temperature        <=35.0:3  35.1-36.0:1  36.1-38.0:0  38.1-39.0:1  >=39.1:2
+
+Our devices report neither supplemental oxygen nor level of consciousness,
+so both are assumed "air" / "alert" (0 points). A missing vital also scores
+0 and the row is flagged incomplete (data_simulator.py never fills BP/RR).
+
+Clinical risk: 0-4 low, any single parameter scoring 3 -> low-medium,
+5-6 medium, >=7 high.
+"""
+import numpy as np
+
+PARAMETERS = {
+    # name: (vitals column, band upper edges, points per band)
+    "respiration_rate": ("rr", [8, 11, 20, 24], [3, 1, 0, 2, 3]),
+    "spo2": ("spo2_percent", [91, 93, 95], [3, 2, 1, 0]),
+    "systolic_bp": ("systolic_bp", [90, 100, 110, 219], [3, 2, 1, 0, 3]),
+    "pulse": ("heart_rate_bpm", [40, 50, 90, 110, 130], [3, 1, 0, 1, 2, 3]),
+    "temperature": ("temperature_c", [35.0, 36.0, 38.0, 39.0], [3, 1, 0, 1, 2]),
+}
+COLUMNS = [col for col, _, _ in PARAMETERS.values()]
+RISK_BANDS = np.array(["low", "low-medium", "medium", "high"], dtype=object)
+
+
+def subscore(values, edges, points):
+    """Points for each value; NaN (missing) scores 0."""
+    values = np.asarray(values, dtype=float)
+    idx = np.searchsorted(np.asarray(edges, dtype=float), values, side="left")
+    out = np.asarray(points)[np.minimum(idx, len(points) - 1)]
+    return np.where(np.isnan(values), 0, out)
+
+
+def score_ward(vitals):
+    """Score every patient in one pass.
+
+    vitals maps each column in COLUMNS to an array (NaN where missing).
+    Returns dict with per-parameter points, "total", "risk" and "incomplete".
+    """
+    result = {}
+    missing = None
+    for name, (col, edges, points) in PARAMETERS.items():
+        values = np.asarray(vitals[col], dtype=float)
+        result[name] = subscore(values, edges, points)
+        missing = np.isnan(values) if missing is None else missing | np.isnan(values)
+
+    parts = np.vstack([result[name] for name in PARAMETERS])
+    total = parts.sum(axis=0)
+    any_three = (parts == 3).any(axis=0)
+    band = np.where(total >= 7, 3, np.where(total >= 5, 2, np.where(any_three, 1, 0)))
+
+    result["total"] = total
+    result["risk"] = RISK_BANDS[band]
+    result["incomplete"] = missing
+    return result
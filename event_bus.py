@@ -0,0 +1,254 @@
+# event_bus.py - LOCAL PUB/SUB BUS (UNIX DOMAIN SOCKET) FOR THE run_all SERVICES
+"""
+Tiny broker + clients so services wake up on events instead of sleeping and
+re-polling hospital.db.
+
+    python event_bus.py            # the broker (run_all.py starts it first)
+
+Topics:
+    vitals       {"ids": [...], "patients": [...]}           after a vitals commit
+    predictions  {"vitals_ids": [...], "patients": [...]}    after a predictor flush
+    alerts       {"patients": [...]}                          after alert rows change
+
+Wire format is one JSON object per line:
+    client -> broker   {"op": "sub", "topics": ["vitals", ...]}   ("*" = all)
+                       {"op": "pub", "topic": "vitals", "data": {...}}
+    broker -> client   {"topic": "vitals", "data": {...}, "ts": 1700000000.0}
+
+The bus is an accelerator, never a dependency: publish() is best effort and
+silently drops messages while the broker is down, and Subscriber.wait()
+returns None in that case so callers fall back to their old sleep/poll.
+Platforms without AF_UNIX (older Windows Pythons) use 127.0.0.1:BUS_PORT.
+"""
+import asyncio
+import json
+import os
+import select
+import socket
+import time
+
+BUS_PATH = os.environ.get("HOSPITAL_BUS", "hospital_bus.sock")
+BUS_PORT = int(os.environ.get("HOSPITAL_BUS_PORT", "8799"))
+USE_UNIX = hasattr(socket, "AF_UNIX")
+RECONNECT_EVERY = 1.0          # seconds between reconnect attempts
+MAX_SUBSCRIBER_BACKLOG = 1 << 20  # bytes queued for a slow subscriber before it is dropped
+
+
+def _connect(timeout=0.5):
+    if USE_UNIX:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        target = BUS_PATH
+    else:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target = ("127.0.0.1", BUS_PORT)
+    s.settimeout(timeout)
+    try:
+        s.connect(target)
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def _encode(obj):
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+# ---------------------------------------------------------------- publisher
+class Publisher:
+    def __init__(self):
+        self.sock = None
+        self._next_try = 0.0
+
+    def publish(self, topic, data=None):
+        """Best effort: returns False (and drops the message) when the broker is unreachable."""
+        if self.sock is None:
+            if time.monotonic() < self._next_try:
+                return False
+            try:
+                self.sock = _connect()
+            except OSError:
+                self._next_try = time.monotonic() + RECONNECT_EVERY
+                return False
+        try:
+            self.sock.sendall(_encode({"op": "pub", "topic": topic, "data": data or {}}))
+            return True
+        except OSError:
+            self.close()
+            self._next_try = time.monotonic() + RECONNECT_EVERY
+            return False
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+# ---------------------------------------------------------------- subscriber
+class Subscriber:
+    def __init__(self, topics):
+        self.topics = list(topics)
+        self.sock = None
+        self._buf = b""
+        self._next_try = 0.0
+
+    def _ensure(self):
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self._next_try:
+            return False
+        try:
+            self.sock = _connect()
+            self.sock.sendall(_encode({"op": "sub", "topics": self.topics}))
+            self.sock.setblocking(False)
+            return True
+        except OSError:
+            self.close()
+            self._next_try = time.monotonic() + RECONNECT_EVERY
+            return False
+
+    def wait(self, timeout):
+        """Block until events arrive or timeout elapses.
+
+        Returns a list of {"topic", "data", "ts"} dicts ([] on timeout), or
+        None when the broker is unavailable - the caller should then sleep
+        and poll as it did before the bus existed.
+        """
+        if not self._ensure():
+            return None
+        events = self._drain()
+        if self.sock is None:
+            return events or None
+        if events:
+            return events
+        try:
+            ready, _, _ = select.select([self.sock], [], [], max(0.0, timeout))
+        except (OSError, ValueError):
+            self.close()
+            return None
+        if not ready:
+            return []
+        events = self._drain()
+        if self.sock is None and not events:
+            return None
+        return events
+
+    def _drain(self):
+        while True:
+            try:
+                chunk = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                chunk = b""
+            if not chunk:  # broker went away
+                self.close()
+                self._next_try = time.monotonic() + RECONNECT_EVERY
+                break
+            self._buf += chunk
+        *lines, self._buf = self._buf.split(b"\n")
+        return [json.loads(line) for line in lines if line]
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._buf = b""
+
+
+# ---------------------------------------------------------------- asyncio subscriber (api.py)
+async def subscribe(topics):
+    """Async generator of events for asyncio services; reconnects forever."""
+    while True:
+        try:
+            if USE_UNIX:
+                reader, writer = await asyncio.open_unix_connection(BUS_PATH)
+            else:
+                reader, writer = await asyncio.open_connection("127.0.0.1", BUS_PORT)
+        except OSError:
+            await asyncio.sleep(RECONNECT_EVERY)
+            continue
+        try:
+            writer.write(_encode({"op": "sub", "topics": list(topics)}))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                yield json.loads(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            writer.close()
+        await asyncio.sleep(RECONNECT_EVERY)
+
+
+# ---------------------------------------------------------------- broker
+class Broker:
+    def __init__(self):
+        self.subscribers = {}  # StreamWriter -> set of topics
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if msg.get("op") == "sub":
+                    self.subscribers[writer] = set(msg.get("topics") or ["*"])
+                elif msg.get("op") == "pub":
+                    self.fan_out(msg.get("topic"), msg.get("data"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+    def fan_out(self, topic, data):
+        out = _encode({"topic": topic, "data": data, "ts": time.time()})
+        for w, topics in list(self.subscribers.items()):
+            if topic not in topics and "*" not in topics:
+                continue
+            if w.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG:
+                # A subscriber that stopped reading must not grow our memory forever
+                self.subscribers.pop(w, None)
+                w.close()
+                continue
+            w.write(out)
+
+    async def serve(self):
+        if USE_UNIX:
+            if os.path.exists(BUS_PATH):
+                try:
+                    _connect().close()
+                    raise SystemExit(f"another event bus is already listening on {BUS_PATH}")
+                except OSError:
+                    os.unlink(BUS_PATH)  # stale socket from a previous run
+            server = await asyncio.start_unix_server(self.handle, BUS_PATH)
+            where = BUS_PATH
+        else:
+            server = await asyncio.start_server(self.handle, "127.0.0.1", BUS_PORT)
+            where = f"127.0.0.1:{BUS_PORT}"
+        print(f"[OK] Event bus listening on {where}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # Only the socket this broker created; a second broker that exits above leaves it alone
+            if USE_UNIX and os.path.exists(BUS_PATH):
+                os.unlink(BUS_PATH)
+
+
+def main():
+    try:
+        asyncio.run(Broker().serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
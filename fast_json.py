@@ -0,0 +1,48 @@
+# fast_json.py - FAST JSON RESPONSES FOR LARGE LIST ENDPOINTS
+"""
+Two ways to get JSON out of api.py faster than FastAPI's default:
+
+* FastJSONResponse - drop-in JSONResponse that serializes with orjson when it
+  is installed (falls back to compact stdlib json otherwise).
+* json_array_sql() + RawJSONResponse - let SQLite's JSON1 functions build the
+  whole array inside the query, so a 10k-row history goes
+  sqlite -> one str -> bytes without a Python dict per row.
+"""
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already JSON text (e.g. from json_array_sql)."""
+    media_type = "application/json"
+
+
+def json_array_sql(fields, source_sql, extra=()):
+    """Wrap source_sql in a query returning its rows as a single JSON array.
+
+    fields is a list of (json_key, sql_expression) pairs; the expressions see
+    the output columns of source_sql (unqualified). Row order is kept.
+    extra aggregates (e.g. "MAX(id)") are returned as further columns.
+    """
+    pairs = ", ".join(f"'{key}', {expr}" for key, expr in fields)
+    more = "".join(f", {expr}" for expr in extra)
+    return f"SELECT json_group_array(json_object({pairs})){more} FROM ({source_sql})"
+
+
+def fetch_json_array(conn, fields, source_sql, params=()):
+    """Run json_array_sql() and return the JSON text ("[]" when no rows)."""
+    row = conn.execute(json_array_sql(fields, source_sql), params).fetchone()
+    return row[0] if row and row[0] is not None else "[]"
@@ -0,0 +1,175 @@
+# feature_store.py - PER-PATIENT ROLLING TREND FEATURES (IN-MEMORY RING BUFFERS)
+"""
+Keeps the last WINDOW_SECONDS of readings for every patient in a ring buffer
+and maintains running sums (n, Σt, Σt², Σx, Σx², Σtx per vital), so mean,
+variance and least-squares slope are updated in O(1) per new reading - no
+history query per prediction.
+
+    store = FeatureStore()
+    store.warm(conn)                           # once, at startup
+    store.push("P001", ts, hr, temp, spo2)     # per reading, O(1) amortized
+    store.features("P001")                     # FEATURE_NAMES order, O(1)
+
+Slopes are per minute. spo2_drop / hr_rise compare the latest reading with a
+slow exponential baseline, so a gradual desaturation shows up even when the
+window itself looks flat.
+
+Running sums drift when values are repeatedly added and subtracted, so every
+`capacity` pushes a window is re-summed from its buffer (and its time origin
+moved to the oldest sample), which keeps the amortized cost O(1).
+"""
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+WINDOW_SECONDS = 300     # trend window: 5 minutes
+CAPACITY = 256           # max readings kept per patient
+BASELINE_ALPHA = 0.02    # EMA weight of the slow per-patient baseline
+
+VITALS = ("hr", "temp", "spo2")
+FEATURE_NAMES = [
+    "hr_mean", "hr_std", "hr_slope", "hr_rise",
+    "temp_mean", "temp_slope",
+    "spo2_mean", "spo2_slope", "spo2_drop",
+    "window_samples",
+]
+
+
+def to_epoch(ts):
+    """vitals.timestamp_utc (ISO-8601, naive means UTC) -> epoch seconds."""
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    try:
+        dt = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return time.time()
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class PatientWindow:
+    def __init__(self, window=WINDOW_SECONDS, capacity=CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.buf = deque()          # (t, hr, temp, spo2), t relative to self.t0
+        self.t0 = None
+        self.baseline = None        # slow EMA of (hr, temp, spo2)
+        self.latest = None
+        self._since_resum = 0
+        self._zero()
+
+    def _zero(self):
+        self.n = 0
+        self.st = 0.0
+        self.stt = 0.0
+        self.sx = [0.0, 0.0, 0.0]
+        self.sxx = [0.0, 0.0, 0.0]
+        self.stx = [0.0, 0.0, 0.0]
+
+    def _add(self, t, xs, sign):
+        self.n += sign
+        self.st += sign * t
+        self.stt += sign * t * t
+        for i, x in enumerate(xs):
+            self.sx[i] += sign * x
+            self.sxx[i] += sign * x * x
+            self.stx[i] += sign * t * x
+
+    def _resum(self):
+        old = [(t + self.t0, *xs) for t, *xs in self.buf]
+        self.t0 = old[0][0] if old else None
+        self.buf.clear()
+        self._zero()
+        for t, *xs in old:
+            t -= self.t0
+            self.buf.append((t, *xs))
+            self._add(t, xs, 1)
+        self._since_resum = 0
+
+    def push(self, t, hr, temp, spo2):
+        xs = (float(hr), float(temp), float(spo2))
+        if self.t0 is None:
+            self.t0 = t
+        rel = t - self.t0
+        while self.buf and (len(self.buf) >= self.capacity or rel - self.buf[0][0] > self.window):
+            old_t, *old_xs = self.buf.popleft()
+            self._add(old_t, old_xs, -1)
+        self.buf.append((rel, *xs))
+        self._add(rel, xs, 1)
+
+        if self.baseline is None:
+            self.baseline = list(xs)
+        else:
+            self.baseline = [b + BASELINE_ALPHA * (x - b) for b, x in zip(self.baseline, xs)]
+        self.latest = xs
+
+        self._since_resum += 1
+        if self._since_resum >= self.capacity:
+            self._resum()
+
+    def _mean(self, i):
+        return self.sx[i] / self.n
+
+    def _std(self, i):
+        var = self.sxx[i] / self.n - self._mean(i) ** 2
+        return math.sqrt(var) if var > 0 else 0.0
+
+    def _slope(self, i):
+        denom = self.n * self.stt - self.st * self.st
+        if self.n < 2 or denom <= 1e-9:
+            return 0.0
+        return (self.n * self.stx[i] - self.st * self.sx[i]) / denom * 60.0
+
+    def features(self):
+        if not self.n:
+            return [0.0] * len(FEATURE_NAMES)
+        hr, temp, spo2 = self.latest
+        return [
+            self._mean(0), self._std(0), self._slope(0), hr - self.baseline[0],
+            self._mean(1), self._slope(1),
+            self._mean(2), self._slope(2), self.baseline[2] - spo2,
+            float(self.n),
+        ]
+
+
+class FeatureStore:
+    def __init__(self, window=WINDOW_SECONDS, capacity=CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.patients = {}
+
+    def push(self, patient_id, ts, hr, temp, spo2):
+        w = self.patients.get(patient_id)
+        if w is None:
+            w = self.patients[patient_id] = PatientWindow(self.window, self.capacity)
+        w.push(to_epoch(ts), hr, temp, spo2)
+
+    def features(self, patient_id):
+        w = self.patients.get(patient_id)
+        return w.features() if w else [0.0] * len(FEATURE_NAMES)
+
+    def features_dict(self, patient_id):
+        return dict(zip(FEATURE_NAMES, self.features(patient_id)))
+
+    def warm(self, conn, up_to_id=None):
+        """Replay each patient's most recent readings (ids <= up_to_id) from SQLite.
+
+        Only called at startup; afterwards the store is fed by push().
+        """
+        if up_to_id is None:
+            up_to_id = conn.execute("SELECT MAX(id) FROM vitals").fetchone()[0] or 0
+        rows = conn.execute("""
+            SELECT patient_id, timestamp_utc, heart_rate_bpm, temperature_c, spo2_percent
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY id DESC) AS rn
+                FROM vitals WHERE id <= ?
+            )
+            WHERE rn <= ? AND heart_rate_bpm IS NOT NULL
+              AND temperature_c IS NOT NULL AND spo2_percent IS NOT NULL
+            ORDER BY id
+        """, (up_to_id, self.capacity)).fetchall()
+        for pid, ts, hr, temp, spo2 in rows:
+            self.push(pid, ts, hr, temp, spo2)
+        return len(rows)
@@ -1,8 +1,12 @@
-import sqlite3
 import time
 import random
 from datetime import datetime, timezone
 import json
+from vitals_channel import CHANNELS, open_producer
+from event_bus import Publisher
+from compact_storage import insert_vitals, is_compact
+from loop_profiler import LoopProfiler
+import storage
 
 DB_PATH = "hospital.db"
 PATIENT_ID = "P001"
@@ -25,7 +29,7 @@ state = VitalState()
 
 def get_connection():
     # keep simple single-thread connection
-    return sqlite3.connect(DB_PATH)
+    return storage.connect(DB_PATH)
 
 def generate_vitals_sample():
     """
@@ -93,43 +97,40 @@ def classify_status(v):
     else:
         return "NORMAL"
 
-def insert_one_reading(conn):
-    c = conn.cursor()
+def insert_one_reading(conn, channel=None, bus=None, compact=None):
     vitals = generate_vitals_sample()
     status = classify_status(vitals)
     ts = datetime.now(timezone.utc).isoformat()
 
     raw_payload = json.dumps(vitals)
 
-    c.execute("""
-        INSERT INTO vitals (
-            timestamp_utc,
-            patient_id,
-            device_id,
-            heart_rate_bpm,
-            temperature_c,
-            spo2_percent,
-            systolic_bp,
-            diastolic_bp,
-            rr,
-            raw_payload,
-            health_status
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?)
-    """, (
+    # insert_vitals() returns the new id for both the plain and the compact storage format;
+    # storage.write() commits it, retrying while another process holds the write lock
+    vid = storage.write(
+        conn,
+        insert_vitals,
         ts,
         PATIENT_ID,
-        DEVICE_ID,
         vitals["heart_rate_bpm"],
         vitals["temperature_c"],
         vitals["spo2_percent"],
         vitals["systolic_bp"],
         vitals["diastolic_bp"],
         vitals["rr"],
-        raw_payload,
-        status
-    ))
-
-    conn.commit()
+        health_status=status,
+        device_id=DEVICE_ID,
+        raw_payload=raw_payload,
+        compact=compact,
+    )
+
+    # Hand the committed reading straight to the predictor (SQLite stays the durable copy)
+    if channel is not None:
+        channel.publish(vid, PATIENT_ID, time.time(),
+                        vitals["heart_rate_bpm"], vitals["temperature_c"], vitals["spo2_percent"],
+                        vitals["systolic_bp"], vitals["diastolic_bp"], vitals["rr"], status)
+    # ... and wake up whoever is waiting for new vitals
+    if bus is not None:
+        bus.publish("vitals", {"ids": [vid], "patients": [PATIENT_ID]})
     print(f"[{ts}] P001 → {vitals} | Status: {status}")
 
 def main():
@@ -137,15 +138,24 @@ def main():
     print("    - Vitals vary smoothly from previous readings")
     print("    - 10% chance of stress episode (HR^, Temp^, SpO2v)")
     conn = get_connection()
+    # Storage format looked up once; restart after `python compact_storage.py` converts the file
+    compact = is_compact(conn)
+    channel = open_producer(CHANNELS[0])
+    bus = Publisher()
+    profiler = LoopProfiler("generate_vitals")  # LOOP_PROFILE=1, see loop_profiler.py
 
     try:
         while True:
-            insert_one_reading(conn)
+            with profiler.cycle():
+                insert_one_reading(conn, channel, bus, compact)
             time.sleep(5)
     except KeyboardInterrupt:
         print("\nStopped by user.")
     finally:
         conn.close()
+        bus.close()
+        if channel is not None:
+            channel.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,235 @@
+# loop_profiler.py - OPT-IN MEMORY / PER-CYCLE PROFILING FOR THE LONG-RUNNING LOOPS
+"""
+ai_predictor.py, generate_vitals.py and data_simulator.py run for weeks, so a
+slow leak or a cycle that gets a little more expensive every hour only shows
+up once the box is in trouble. With LOOP_PROFILE=1 each of them reports on
+itself, without a restart under a profiler:
+
+    profiler = LoopProfiler("ai_predictor")   # does nothing unless LOOP_PROFILE=1
+    while True:
+        with profiler.cycle():                # the work, not the sleep
+            ...
+
+* per cycle   : wall and CPU (process) time; every report gives count, mean,
+                p50/p95/max for the cycles since the previous one
+* memory      : RSS plus tracemalloc - traced bytes, and the source lines
+                whose allocations grew most since the first cycle and since
+                the previous report (a leak climbs both lists report after report)
+* on SIGUSR1  : a sampling profiler records every thread's stack at
+                LOOP_PROFILE_SAMPLE_HZ for LOOP_PROFILE_SAMPLE_SECONDS and
+                writes them in collapsed-stack form (flamegraph.pl, speedscope)
+* on SIGUSR2  : a report right after the current cycle
+
+Reports are appended to LOOP_PROFILE_DIR/<name>.<pid>.txt every
+LOOP_PROFILE_INTERVAL seconds and on exit, with a one-line summary on stdout.
+LOOP_PROFILE_SNAPSHOTS=1 also keeps the latest tracemalloc snapshot as
+<name>.<pid>.snap for tracemalloc.Snapshot.load().
+
+tracemalloc slows down allocation-heavy code; LOOP_PROFILE_FRAMES=0 keeps the
+timing and sampling but turns it off (more frames = better leak tracebacks,
+more overhead).
+"""
+import atexit
+import fnmatch
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+ENABLED = os.environ.get("LOOP_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("LOOP_PROFILE_DIR", "profiles")
+REPORT_INTERVAL = float(os.environ.get("LOOP_PROFILE_INTERVAL", "300"))   # seconds
+TRACE_FRAMES = int(os.environ.get("LOOP_PROFILE_FRAMES", "1"))            # 0 = no tracemalloc
+TOP_LINES = int(os.environ.get("LOOP_PROFILE_TOP", "10"))
+SAMPLE_SECONDS = float(os.environ.get("LOOP_PROFILE_SAMPLE_SECONDS", "30"))
+SAMPLE_HZ = float(os.environ.get("LOOP_PROFILE_SAMPLE_HZ", "100"))
+KEEP_SNAPSHOTS = os.environ.get("LOOP_PROFILE_SNAPSHOTS", "0") == "1"
+
+MIB = 1 << 20
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes():
+    """Current resident set size (None where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler(threading.Thread):
+    """Counts collapsed stacks of every other thread at a fixed rate, then writes them out."""
+
+    def __init__(self, path, seconds=SAMPLE_SECONDS, hz=SAMPLE_HZ):
+        super().__init__(name="loop-profiler-sampler", daemon=True)
+        self.path = path
+        self.seconds = seconds
+        self.interval = 1.0 / hz
+        self.stacks = Counter()
+        self.samples = 0
+
+    def run(self):
+        names = {}
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        with open(self.path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"[PROFILE] {self.samples} stack samples written to {self.path}")
+
+
+class LoopProfiler:
+    def __init__(self, name, enabled=ENABLED, interval=REPORT_INTERVAL, frames=TRACE_FRAMES,
+                 top=TOP_LINES, directory=PROFILE_DIR):
+        self.name = name
+        self.enabled = enabled
+        if not enabled:
+            return
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.prefix = os.path.join(directory, f"{name}.{os.getpid()}")
+        self.started = time.monotonic()
+        self.next_report = self.started + interval
+        self.report_now = False
+        self.cycles = 0
+        self.wall = []      # seconds per cycle since the last report
+        self.cpu = []
+        self.slowest = 0.0
+        self.baseline = None
+        self.previous = None
+        self.sampler = None
+        for f in SNAPSHOT_FILTERS:
+            fnmatch.fnmatch("", f.filename_pattern)  # compile the patterns now, not as traced "growth"
+        if frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.start_sampler())
+            signal.signal(signal.SIGUSR2, lambda signum, frame: setattr(self, "report_now", True))
+        atexit.register(self.close)
+        print(f"[PROFILE] {name}: reports every {interval:.0f}s to {self.prefix}.txt "
+              f"(tracemalloc {'off' if frames <= 0 else f'{frames} frame(s)'}; "
+              f"kill -USR1 {os.getpid()} samples stacks for {SAMPLE_SECONDS:.0f}s)")
+
+    def cycle(self):
+        """Context manager around one loop iteration (a no-op when profiling is off)."""
+        if not self.enabled:
+            return nullcontext()
+        return self._cycle()
+
+    @contextmanager
+    def _cycle(self):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            self.wall.append(wall)
+            self.cpu.append(time.process_time() - cpu0)
+            self.slowest = max(self.slowest, wall)
+            self.cycles += 1
+            if self.baseline is None and tracemalloc.is_tracing():
+                # After the first cycle, so one-off caches filled by it are not counted as growth
+                self.baseline = self.previous = self._snapshot()
+            if self.report_now or time.monotonic() >= self.next_report:
+                self.report()
+
+    def start_sampler(self):
+        if self.sampler is not None and self.sampler.is_alive():
+            return
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.sampler = StackSampler(f"{self.prefix}.{stamp}.stacks")
+        self.sampler.start()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def _growth(self, lines, title, snapshot, since):
+        lines.append(f"  {title}:")
+        stats = [s for s in snapshot.compare_to(since, "lineno") if s.size_diff > 0][:self.top]
+        if not stats:
+            lines.append("    (none)")
+        for stat in stats:
+            frame = stat.traceback[0]
+            lines.append(f"    {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        if self.frames > 1 and stats:
+            # Full allocation traceback of the biggest grower
+            worst = next(s for s in snapshot.compare_to(since, "traceback") if s.size_diff > 0)
+            lines.extend(f"      {line}" for line in worst.traceback.format())
+
+    def report(self):
+        now = time.monotonic()
+        self.next_report = now + self.interval
+        self.report_now = False
+        lines = [f"=== {self.name} pid {os.getpid()} at {datetime.now().isoformat(timespec='seconds')}, "
+                 f"up {now - self.started:.0f}s, {self.cycles} cycles"]
+        summary = f"[PROFILE] {self.name}: {len(self.wall)} cycles"
+        if self.wall:
+            wall, cpu = sorted(self.wall), self.cpu
+            lines.append(f"  cycle wall ms: mean {sum(wall) / len(wall) * 1e3:.2f}  "
+                         f"p50 {_percentile(wall, 0.5) * 1e3:.2f}  p95 {_percentile(wall, 0.95) * 1e3:.2f}  "
+                         f"max {wall[-1] * 1e3:.2f}  (slowest ever {self.slowest * 1e3:.2f})")
+            lines.append(f"  cycle cpu ms : mean {sum(cpu) / len(cpu) * 1e3:.2f}  max {max(cpu) * 1e3:.2f}  "
+                         f"cpu/wall {sum(cpu) / max(sum(wall), 1e-9):.0%}")
+            summary += f", wall p95 {_percentile(wall, 0.95) * 1e3:.1f} ms"
+        self.wall, self.cpu = [], []
+        rss = rss_bytes()
+        if rss is not None:
+            lines.append(f"  rss {rss / MIB:.1f} MiB")
+            summary += f", rss {rss / MIB:.1f} MiB"
+        if tracemalloc.is_tracing() and self.baseline is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = self._snapshot()
+            lines.append(f"  traced {current / MIB:.2f} MiB (peak {peak / MIB:.2f} MiB), "
+                         f"tracemalloc overhead {tracemalloc.get_tracemalloc_memory() / MIB:.2f} MiB")
+            self._growth(lines, "growth since first cycle", snapshot, self.baseline)
+            self._growth(lines, "growth since last report", snapshot, self.previous)
+            if KEEP_SNAPSHOTS:
+                snapshot.dump(f"{self.prefix}.snap")
+            self.previous = snapshot
+            summary += f", traced {current / MIB:.2f} MiB"
+        with open(f"{self.prefix}.txt", "a") as f:
+            f.write("\n".join(lines) + "\n\n")
+        print(summary)
+
+    def close(self):
+        """Final report (also run at exit)."""
+        if self.enabled and (self.wall or self.cycles == 0):
+            self.report()
+        self.enabled = False
@@ -0,0 +1,106 @@
+# micro_batcher.py - COALESCE CONCURRENT /predict REQUESTS INTO ONE MODEL CALL
+"""
+A model call costs about the same for 1 row as for 100 (the 300-tree forest
+spends most of its time in per-call overhead), so scoring every request on
+its own wastes the CPU exactly when load is high.
+
+    batcher = MicroBatcher(fn)          # fn(X) -> one result per row of X
+    results = await batcher.submit(X)   # X: (n, k) array, returns n results
+
+Requests are queued; a single task takes the first one, drains everything
+else already waiting (up to PREDICT_MAX_BATCH rows), optionally lingers
+PREDICT_BATCH_WAIT_MS for more, then runs fn once on the concatenated rows
+in its own thread and hands every request its slice. While fn runs, new
+requests pile up in the queue and become the next batch - under load the
+batches grow by themselves, when idle a request is scored immediately.
+
+API_PREDICT_BATCH=0 scores every request on its own (bench_predict.py
+compares both).
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ENABLED = os.environ.get("API_PREDICT_BATCH", "1") != "0"
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "512"))             # rows per model call
+PREDICT_BATCH_WAIT = float(os.environ.get("PREDICT_BATCH_WAIT_MS", "0")) / 1000  # seconds
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch=PREDICT_MAX_BATCH, max_wait=PREDICT_BATCH_WAIT, enabled=ENABLED):
+        self.fn = fn
+        self.max_batch = max_batch if enabled else 1
+        self.max_wait = max_wait if enabled else 0.0
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hospital-predict")
+        self.calls = 0      # model calls made
+        self.rows = 0       # rows scored
+        self.requests = 0   # submit() calls served
+
+    async def submit(self, X):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            size += len(item[0])
+        return [(X, f) for X, f in batch if not f.cancelled()]  # client went away
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            X = np.concatenate([X for X, _ in batch]) if len(batch) > 1 else batch[0][0]
+            try:
+                results = await loop.run_in_executor(self._executor, self.fn, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.calls += 1
+            self.rows += len(X)
+            self.requests += len(batch)
+            start = 0
+            for part, future in batch:
+                if not future.done():
+                    future.set_result(results[start:start + len(part)])
+                start += len(part)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "rows": self.rows,
+            "requests": self.requests,
+            "mean_batch_rows": round(self.rows / self.calls, 1) if self.calls else 0.0,
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,240 @@
+# purge.py - CHUNKED, NON-BLOCKING BULK DELETE (REPLACES clean_to_p001.py)
+"""
+Deletes history in small transactions so the generator, predictor and API
+keep writing/reading while a big purge runs.
+
+    python purge.py --keep P001                      # what clean_to_p001.py did
+    python purge.py --patients P004,P007             # remove these patients entirely
+    python purge.py --before 2025-12-01              # readings older than a date (all patients)
+    python purge.py --patients P002 --after 2026-01-01 --before 2026-02-01
+    python purge.py --where "health_status = 'TEST'" # any predicate over vitals columns
+    python purge.py --keep P001 --dry-run            # only count what would go
+
+Two modes:
+
+* patients only (--patients / --keep): every row of those patients goes -
+  predictions, prediction_versions, alerts, vitals, the user link and the
+  patient itself (its patient_latest row follows through its trigger).
+* readings (--before / --after / --where, optionally limited to patients):
+  matching vitals rows go together with everything derived from them
+  (predictions, prediction_versions and alerts with that vitals_id);
+  patients stay.
+
+Each batch of at most --batch rows is one short write transaction followed
+by a --pause, so other writers get the lock in between. Batches walk the
+primary key forward, so the whole purge is one pass over each table. The
+compact format (compact_storage.py) is purged in its *_store tables.
+patient_latest rows that pointed at a deleted reading/prediction are
+recomputed for those patients only.
+
+Afterwards the freed pages are returned to the OS with PRAGMA
+incremental_vacuum, --vacuum-pages at a time. That needs auto_vacuum =
+INCREMENTAL (new databases from database.py have it); --enable-incremental
+switches an older file over once, with a full VACUUM.
+"""
+import argparse
+import sys
+import time
+
+import compact_storage
+import database
+import storage
+
+DB_PATH = "hospital.db"
+BATCH_ROWS = 2000
+PAUSE = 0.05            # seconds between batches
+VACUUM_PAGES = 1000     # pages released per incremental_vacuum step
+BUSY_TIMEOUT = 10       # seconds to wait for the write lock
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+
+
+def _in(values):
+    return ",".join("?" * len(values))
+
+
+def batched_delete(conn, table, key, where, params, batch, pause, dry_run):
+    """Delete rows of table matching where, `batch` keys per transaction. Returns rows (to be) deleted."""
+    if dry_run:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+    cols = ", ".join(key)
+    deleted, last = 0, None
+    while True:
+        after = "" if last is None else f"({cols}) > ({_in(last)}) AND "
+        keys = conn.execute(f"SELECT {cols} FROM {table} WHERE {after}({where}) ORDER BY {cols} LIMIT ?",
+                            [*(last or ()), *params, batch]).fetchall()
+        if not keys:
+            return deleted
+        with conn:
+            conn.executemany(f"DELETE FROM {table} WHERE ({cols}) = ({_in(key)})", keys)
+        deleted += len(keys)
+        last = keys[-1]
+        time.sleep(pause)
+
+
+def purge_patients(conn, tables, pcond, pparams, batch, pause, dry_run):
+    counts = {}
+    for table, key in tables:
+        counts[table] = batched_delete(conn, table, key, pcond, pparams, batch, pause, dry_run)
+    return counts
+
+
+def purge_readings(conn, tables, vitals_table, where, params, batch, pause, dry_run, source="vitals"):
+    """Delete matching vitals plus rows derived from them, one batch of vitals ids per transaction.
+
+    source is what where is evaluated against: `vitals`, or COMPACT_SOURCE for the compact format.
+    """
+    dependents = [(t, key) for t, key in tables if t not in (vitals_table, "patients", "user_patients")]
+    counts = dict.fromkeys([t for t, _ in dependents] + [vitals_table], 0)
+    if dry_run:
+        selected = f"SELECT id FROM {source} WHERE {where}"
+        for table, _ in dependents:
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE vitals_id IN ({selected})",
+                                         params).fetchone()[0]
+        counts[vitals_table] = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+        return counts
+    last = 0
+    while True:
+        # Selected through `vitals` (table or compact view + ts_ms) so --where sees the usual columns
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM {source} WHERE id > ? AND ({where}) ORDER BY id LIMIT ?",
+                                          [last, *params, batch])]
+        if not ids:
+            return counts
+        with conn:
+            for table, _ in dependents:
+                counts[table] += conn.execute(f"DELETE FROM {table} WHERE vitals_id IN ({_in(ids)})",
+                                              ids).rowcount
+            counts[vitals_table] += conn.execute(f"DELETE FROM {vitals_table} WHERE id IN ({_in(ids)})",
+                                                 ids).rowcount
+        last = ids[-1]
+        time.sleep(pause)
+
+
+# Compact format: the view's columns for --where plus the store's ts_ms for --after / --before,
+# so a time window is an integer comparison instead of rendering timestamp_utc for every row
+COMPACT_SOURCE = "(SELECT vitals.*, vitals_store.ts_ms FROM vitals JOIN vitals_store USING (id))"
+
+
+def refresh_latest(conn, vitals_table, predictions_table):
+    """Recompute patient_latest for patients whose latest reading/prediction was purged."""
+    stale = [r[0] for r in conn.execute(f"""
+        SELECT patient_id FROM patient_latest l
+        WHERE (l.vitals_id IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM {vitals_table} WHERE id = l.vitals_id))
+           OR (l.prediction_id IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM {predictions_table} WHERE id = l.prediction_id))
+    """)]
+    if stale:
+        database.rebuild_patient_latest(conn, stale)
+    return stale
+
+
+def reclaim(conn, pages, pause):
+    """Hand free pages back to the OS in small steps. Returns pages released."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        print(f"[INFO] {free} free pages kept for reuse - auto_vacuum is not INCREMENTAL "
+              f"(run once with --enable-incremental to switch)")
+        return 0
+    released = 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free:
+        # executescript steps the pragma to completion (execute() frees a single page)
+        conn.executescript(f"PRAGMA incremental_vacuum({pages})")
+        left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if left >= free:
+            break
+        released += free - left
+        free = left
+        time.sleep(pause)
+    return released
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=DB_PATH)
+    who = ap.add_mutually_exclusive_group()
+    who.add_argument("--patients", help="comma separated patient ids to purge")
+    who.add_argument("--keep", help="comma separated patient ids to keep; every other patient is purged")
+    ap.add_argument("--after", help="readings at or after this ISO-8601 time")
+    ap.add_argument("--before", help="readings before this ISO-8601 time")
+    ap.add_argument("--where", help="extra SQL predicate over vitals columns")
+    ap.add_argument("--dry-run", action="store_true", help="count only, delete nothing")
+    ap.add_argument("--batch", type=int, default=BATCH_ROWS, help="rows per delete transaction")
+    ap.add_argument("--pause", type=float, default=PAUSE, help="seconds between batches")
+    ap.add_argument("--vacuum-pages", type=int, default=VACUUM_PAGES)
+    ap.add_argument("--enable-incremental", action="store_true",
+                    help="switch the file to auto_vacuum=INCREMENTAL (one full VACUUM)")
+    args = ap.parse_args(argv)
+
+    readings_mode = bool(args.after or args.before or args.where)
+    if not (readings_mode or args.patients or args.keep):
+        ap.error("nothing selected: give --patients, --keep, --after, --before or --where")
+
+    conn = storage.connect(args.db, busy_timeout_ms=BUSY_TIMEOUT * 1000)
+    compact = compact_storage.is_compact(conn)
+    vitals_table = "vitals_store" if compact else "vitals"
+    predictions_table = "predictions_store" if compact else "predictions"
+    # Delete order: derived rows first, the patient last; (table, key walked in batches)
+    tables = [(predictions_table, ["id"]), ("prediction_versions", ["model_version", "vitals_id"]),
+              ("alerts", ["id"]), (vitals_table, ["id"]), ("user_patients", ["user_id"]),
+              ("patients", ["rowid"])]
+    tables = [(t, key) for t, key in tables if _table_exists(conn, t)]
+    if not args.dry_run:
+        # Batched lookups by vitals_id must not scan these tables once per batch
+        if _table_exists(conn, "prediction_versions"):
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_prediction_versions_vitals "
+                         "ON prediction_versions(vitals_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_vitals ON alerts(vitals_id)")
+        conn.commit()
+
+    pcond, pparams = "1", []
+    if args.patients or args.keep:
+        pparams = [p.strip() for p in (args.patients or args.keep).split(",") if p.strip()]
+        pcond = f"patient_id {'IN' if args.patients else 'NOT IN'} ({_in(pparams)})"
+
+    t0 = time.perf_counter()
+    if readings_mode:
+        where, params = [pcond], list(pparams)
+        ts, bound = ("ts_ms", compact_storage.to_ms) if compact else ("timestamp_utc", str)
+        if args.after:
+            where.append(f"{ts} >= ?")
+            params.append(bound(args.after))
+        if args.before:
+            where.append(f"{ts} < ?")
+            params.append(bound(args.before))
+        if args.where:
+            where.append(f"({args.where})")
+        counts = purge_readings(conn, tables, vitals_table, " AND ".join(where), params,
+                                args.batch, args.pause, args.dry_run,
+                                source=COMPACT_SOURCE if compact else "vitals")
+    else:
+        counts = purge_patients(conn, tables, pcond, pparams, args.batch, args.pause, args.dry_run)
+
+    verb = "would delete" if args.dry_run else "deleted"
+    for table, n in counts.items():
+        print(f"  {table:<20} {verb} {n} rows")
+    if args.dry_run:
+        conn.close()
+        return counts
+
+    stale = refresh_latest(conn, vitals_table, predictions_table)
+    if stale:
+        print(f"  patient_latest       recomputed for {len(stale)} patient(s)")
+    print(f"[OK] Purged {sum(counts.values())} rows in {time.perf_counter() - t0:.1f}s")
+
+    if args.enable_incremental and conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")  # the one blocking step: required to change auto_vacuum
+        print("[OK] auto_vacuum switched to INCREMENTAL")
+    released = reclaim(conn, args.vacuum_pages, args.pause)
+    if released:
+        print(f"[OK] Released {released} free pages to the OS")
+    conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
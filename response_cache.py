@@ -0,0 +1,119 @@
+# response_cache.py - WRITE-INVALIDATED RESPONSE CACHE FOR THE AGGREGATE ENDPOINTS
+"""
+/patients, /alerts and /dashboard/summary only change when some process
+commits to hospital.db, yet every dashboard poll used to recompute them.
+
+The cache key is (endpoint, params); every entry is tagged with the value of
+`PRAGMA data_version` it was computed at. data_version is a per-connection
+counter that SQLite bumps whenever ANOTHER connection commits to the file,
+so one dedicated, never-writing connection per process can revalidate an
+entry with a single PRAGMA (microseconds, no table reads) on each request.
+
+* hit      : same data_version -> return the stored result, no query at all
+* miss     : run the query once; concurrent requests for the same key and
+             version wait for that one query instead of starting their own
+             (single-flight), so N dashboards cost one query per change.
+             The query runs in its own task and every request awaits it
+             through asyncio.shield(), so a client that disconnects (its
+             request is cancelled) does not cancel it for the others
+* bounded  : LRU, at most CACHE_MAX_ENTRIES entries / CACHE_MAX_BYTES of text
+
+It is conservative: any commit (a new session row, a purge ...) invalidates
+every entry. Each API worker keeps its own cache; they never disagree with
+the database because validity is always checked against the file itself.
+API_CACHE=0 disables it.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+
+import storage
+
+DB_PATH = "hospital.db"
+ENABLED = os.environ.get("API_CACHE", "1") != "0"
+CACHE_MAX_ENTRIES = int(os.environ.get("API_CACHE_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.environ.get("API_CACHE_BYTES", str(32 << 20)))
+
+
+def _size(value):
+    return len(value) if isinstance(value, (str, bytes)) else 256
+
+
+class ResponseCache:
+    def __init__(self, path=DB_PATH, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 enabled=ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._conn = None
+        self._entries = OrderedDict()   # key -> (data_version, value, size)
+        self._bytes = 0
+        self._inflight = {}             # (key, data_version) -> Task running compute()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0                 # requests that waited on another request's query
+
+    def version(self):
+        # Only ever used from the event loop thread, and never writes
+        if self._conn is None:
+            self._conn = storage.connect(self.path, check_same_thread=False)
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    async def get(self, key, compute):
+        """Return the cached value for key, or await compute() (at most once per data change)."""
+        if not self.enabled:
+            return await compute()
+        version = self.version()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        flight = self._inflight.get((key, version))
+        if flight is not None:
+            self.shared += 1
+            return await asyncio.shield(flight)
+
+        self.misses += 1
+        flight = self._inflight[(key, version)] = asyncio.ensure_future(self._load(key, version, compute))
+        # Retrieve the exception even when every waiter has been cancelled
+        flight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(flight)
+
+    async def _load(self, key, version, compute):
+        try:
+            value = await compute()
+        finally:
+            del self._inflight[(key, version)]
+        self._store(key, version, value)
+        return value
+
+    def _store(self, key, version, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (version, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
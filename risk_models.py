@@ -0,0 +1,118 @@
+# risk_models.py - LIGHTWEIGHT RISK MODELS DISTILLED FROM THE 300-TREE FOREST
+"""
+Drop-in replacements for real_hospital_model.pkl built by distill_model.py.
+Both expose what ai_predictor.score() uses from a scikit-learn classifier:
+predict_proba(X) -> [[P(low), P(high)], ...], classes_ and n_features_in_,
+on the same normalized (hr, temp, spo2) features.
+
+    GridRiskModel     P(high) precomputed on a regular grid over the 3-D
+                      feature space, trilinear interpolation between nodes;
+                      pure numpy, one uint8 per node
+    ProbaRegressor    any regressor fitted to the forest's probabilities
+                      (fewer/shallower trees, gradient boosting)
+
+risk_models.json (the manifest distill_model.py writes) lists every
+candidate with its size, load time, latency and agreement with the forest;
+select_model() picks one for a per-sample latency budget. synthetic_stream()
+is the vitals mix bench_cascade.py and distill_model.py both sample.
+"""
+import json
+import os
+import random
+
+import numpy as np
+
+MANIFEST_PATH = "risk_models.json"
+CORNERS = np.array([[(c >> k) & 1 for k in range(3)] for c in range(8)])  # unit cube, (hr, temp, spo2)
+
+
+class GridRiskModel:
+    def __init__(self, lows, steps, table):
+        self.lows = np.asarray(lows, dtype=float)
+        self.steps = np.asarray(steps, dtype=float)
+        self.table = np.asarray(table, dtype=np.uint8)  # P(high) * 255 at every grid node
+        self.classes_ = np.array([0, 1])
+        self.n_features_in_ = 3
+
+    @classmethod
+    def fit(cls, teacher, lows, highs, steps):
+        """Evaluate teacher.predict_proba at every node of the grid lows..highs (inclusive)."""
+        lows, highs, steps = (np.asarray(a, dtype=float) for a in (lows, highs, steps))
+        shape = np.round((highs - lows) / steps).astype(int) + 1
+        axes = [lo + st * np.arange(n) for lo, st, n in zip(lows, steps, shape)]
+        nodes = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        probs = teacher.predict_proba(nodes)[:, 1].reshape(shape)
+        return cls(lows, steps, np.round(probs * 255))
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=float)
+        shape = np.array(self.table.shape)
+        pos = np.clip((X - self.lows) / self.steps, 0, shape - 1)  # outside the grid: nearest edge
+        i0 = np.minimum(pos.astype(int), shape - 2)
+        f = pos - i0
+        # The 8 surrounding nodes as flat offsets, weighted by the product of per-axis fractions
+        strides = np.array([shape[1] * shape[2], shape[2], 1])
+        w = np.where(CORNERS[None], f[:, None], 1 - f[:, None]).prod(axis=2)
+        p = (w * self.table.ravel()[(i0 @ strides)[:, None] + CORNERS @ strides]).sum(axis=1) / 255
+        return np.column_stack([1 - p, p])
+
+
+class ProbaRegressor:
+    """Classifier interface over a regressor trained on soft (probability) targets."""
+
+    def __init__(self, regressor):
+        self.regressor = regressor
+        self.classes_ = np.array([0, 1])
+        self.n_features_in_ = 3
+
+    def predict_proba(self, X):
+        p = np.clip(self.regressor.predict(X), 0.0, 1.0)
+        return np.column_stack([1 - p, p])
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def select_model(manifest, budget_us, min_agreement=0.99):
+    """The most faithful model whose single-reading latency fits budget_us.
+
+    Only models whose label agreement with the forest is at least
+    min_agreement are considered; ties go to the faster one. Returns a
+    manifest entry, or None when nothing qualifies.
+    """
+    fits = [m for m in manifest["models"]
+            if m["latency_us"]["1"] <= budget_us and m["label_agreement"] >= min_agreement]
+    if not fits:
+        return None
+    return max(fits, key=lambda m: (m["label_agreement"], -m["latency_us"]["1"]))
+
+
+def synthetic_stream(n, seed=7):
+    """n raw (hr, temp, spo2) rows, alternating data_simulator.py and generate_vitals.py-like readings."""
+    rng = random.Random(seed)
+    rows = []
+    hr, temp, spo2 = 75.0, 36.8, 97.0
+    for i in range(n):
+        if i % 2:
+            # data_simulator.py
+            if rng.random() < 0.18:
+                rows.append((rng.randint(128, 178), round(rng.uniform(38.9, 41.5), 1), rng.randint(65, 89)))
+            else:
+                rows.append((rng.randint(58, 108), round(rng.uniform(36.2, 37.8), 1), rng.randint(93, 100)))
+        else:
+            # generate_vitals.py-like drift with occasional episodes
+            if rng.random() < 0.10:
+                hr += rng.randint(2, 6)
+                temp += rng.uniform(0.1, 0.4)
+                spo2 -= rng.randint(1, 3)
+            else:
+                hr += (75 - hr) * 0.1 + rng.randint(-1, 1)
+                temp += (36.8 - temp) * 0.1 + rng.uniform(-0.05, 0.05)
+                spo2 += (97 - spo2) * 0.1 + rng.choice([-1, 0, 0, 0, 1])
+            hr, temp, spo2 = max(50, min(180, hr)), max(36.0, min(42.0, temp)), max(80, min(100, spo2))
+            rows.append((round(hr), round(temp, 1), round(spo2)))
+    return np.array(rows, dtype=float)
@@ -1,79 +1,214 @@
-# run_all.py - FINAL FIXED VERSION (NO IMPORT ERRORS)
+# run_all.py - SUPERVISOR: PARALLEL START, READINESS PROBES, RESTART WITH BACKOFF
+"""
+Starts every service at once and reports each one as ready when its probe
+passes (instead of fixed sleeps between launches):
+
+    event bus     socket accepts connections
+    generator     process still running after a moment
+    predictor     ai_predictor.ready holds the predictor's pid (model loaded)
+    api           GET / returns 200
+    dashboard     port 8501 accepts connections
+
+The database is only created when hospital.db is missing or unusable, and
+only then cleaned down to P001 - restarts keep the existing history.
+A child that exits is restarted after 1, 2, 4 ... RESTART_MAX_BACKOFF
+seconds; the backoff resets once it has stayed up for RESTART_RESET_AFTER.
+
+    python run_all.py           # development: API under uvicorn --reload
+    python run_all.py --prod    # API via serve.py (API_WORKERS workers, no reloader)
+"""
 import subprocess
 import time
 import os
 import signal
+import socket
 import sys
+import urllib.request
 
 # Get the directory where run_all.py is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(BASE_DIR)  # Critical: Set correct working directory
+sys.path.insert(0, BASE_DIR)
+
+import database
+import event_bus
+
+# ai_predictor.READY_PATH - not imported, that would load numpy/joblib here
+PREDICTOR_READY = "ai_predictor.ready"
+
+API_PORT = 8000
+DASHBOARD_PORT = 8501
+PROBE_INTERVAL = 0.2        # seconds between probes / liveness checks
+STARTED_GRACE = 1.0         # a probe-less service counts as ready after this long alive
+RESTART_MAX_BACKOFF = 30    # seconds
+RESTART_RESET_AFTER = 60    # seconds of uptime that reset the backoff
+STOP_TIMEOUT = 15           # seconds to wait on shutdown (covers the API's graceful drain)
+PROD = "--prod" in sys.argv
+
+
+# ---------------------------------------------------------------- probes
+def port_open(port, host="127.0.0.1"):
+    try:
+        socket.create_connection((host, port), timeout=0.2).close()
+        return True
+    except OSError:
+        return False
+
+
+def bus_up(service):
+    try:
+        event_bus._connect(timeout=0.2).close()
+        return True
+    except OSError:
+        return False
+
+
+def still_running(service):
+    return time.monotonic() - service.started >= STARTED_GRACE
+
+
+def model_loaded(service):
+    try:
+        with open(PREDICTOR_READY) as f:
+            return f.read().strip() == str(service.proc.pid)
+    except OSError:
+        return False
+
+
+def api_up(service):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{API_PORT}/", timeout=0.5) as r:
+            return r.status == 200
+    except OSError:
+        return False
+
+
+def dashboard_up(service):
+    return port_open(DASHBOARD_PORT)
+
+
+# ---------------------------------------------------------------- services
+class Service:
+    def __init__(self, name, cmd, probe):
+        self.name = name
+        self.cmd = cmd
+        self.probe = probe
+        self.proc = None
+        self.started = 0.0
+        self.ready_at = None
+        self.restarts = 0
+        self.backoff = 1.0
+        self.restart_at = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.ready_at = None
+        self.restart_at = None
+        try:
+            self.proc = subprocess.Popen(self.cmd, cwd=BASE_DIR)
+        except OSError as e:
+            print(f"[ERROR] {self.name}: cannot start ({e})")
+            self.proc = None
+            self.schedule_restart()
+
+    def schedule_restart(self):
+        if time.monotonic() - self.started >= RESTART_RESET_AFTER:
+            self.backoff = 1.0
+        self.restart_at = time.monotonic() + self.backoff
+        print(f"[WARN] {self.name}: restarting in {self.backoff:.0f}s")
+        self.backoff = min(self.backoff * 2, RESTART_MAX_BACKOFF)
+
+    def check(self):
+        """Probe readiness / liveness once. Returns True the moment it becomes ready."""
+        if self.restart_at is not None:
+            if time.monotonic() >= self.restart_at:
+                self.restarts += 1
+                self.start()
+            return False
+        code = self.proc.poll()
+        if code is not None:
+            print(f"[WARN] {self.name}: exited with code {code}")
+            self.schedule_restart()
+            return False
+        if self.ready_at is None and self.probe(self):
+            self.ready_at = time.monotonic()
+            return True
+        return False
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+
+
+SERVICES = [
+    Service("event bus", [sys.executable, "event_bus.py"], bus_up),
+    # Single-patient vitals generator (P001, every 5s)
+    Service("generator", [sys.executable, "generate_vitals.py"], still_running),
+    Service("predictor", [sys.executable, "ai_predictor.py"], model_loaded),
+    Service("api", [sys.executable, "serve.py", "--port", str(API_PORT)] if PROD else
+                   [sys.executable, "-m", "uvicorn", "api:app",
+                    "--host", "127.0.0.1", "--port", str(API_PORT), "--reload"], api_up),
+    Service("dashboard", [sys.executable, "-m", "streamlit", "run", "dashboard.py",
+                          f"--server.port={DASHBOARD_PORT}",
+                          "--server.headless=true",
+                          "--server.enableCORS=false",
+                          "--server.enableXsrfProtection=false"], dashboard_up),
+]
 
-processes = []
 
 def stop_all(signum=None, frame=None):
     print("\nShutting down all services...")
-    for p in processes:
+    for s in SERVICES:
+        s.stop()
+    deadline = time.monotonic() + STOP_TIMEOUT
+    for s in SERVICES:
+        if s.proc is None:
+            continue
         try:
-            p.terminate()
-            p.wait(timeout=5)
-        except:
-            pass
+            s.proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            s.proc.kill()
     sys.exit(0)
 
-signal.signal(signal.SIGINT, stop_all)
-
-print("Creating database...")
-os.system("python database.py")
-
-print("Cleaning database to single patient (P001)...")
-os.system("python clean_to_p001.py")
-
-print("Starting services...")
-
-# 1. Single-patient vitals generator (P001, every 5s)
-processes.append(subprocess.Popen(["python", "generate_vitals.py"], cwd=BASE_DIR))
-
-time.sleep(2)
-
-# 2. AI predictor  (Safe version: run the file directly)
-processes.append(subprocess.Popen([
-    sys.executable, "ai_predictor.py"
-], cwd=BASE_DIR))
-
-time.sleep(2)
-
-# 3. API - Run using Python module
-processes.append(subprocess.Popen([
-    sys.executable, "-m", "uvicorn",
-    "api:app", 
-    "--host", "127.0.0.1", 
-    "--port", "8000",
-    "--reload"
-], cwd=BASE_DIR))
 
-time.sleep(6)
+def main():
+    signal.signal(signal.SIGINT, stop_all)
+    signal.signal(signal.SIGTERM, stop_all)
+    t0 = time.monotonic()
 
-# 4. Dashboard (clean, no warnings)
-processes.append(subprocess.Popen([
-    "streamlit", "run", "dashboard.py",
-    "--server.port=8501",
-    "--server.headless=true",
-    "--server.enableCORS=false",
-    "--server.enableXsrfProtection=false"
-], cwd=BASE_DIR))
+    # Keep an existing database; only a freshly created one is cut down to P001
+    if database.init_db(database.DB_PATH, reset=False):
+        print("Created hospital.db - cleaning database to single patient (P001)...")
+        subprocess.run([sys.executable, "clean_to_p001.py"], cwd=BASE_DIR)
+    else:
+        print("Using existing hospital.db")
+    if not database.schema_ready():
+        sys.exit("hospital.db has no usable schema")
 
-print("\n" + "="*70)
-print("ALL SERVICES STARTED SUCCESSFULLY!")
-print("Dashboard → http://localhost:8501")
-print("API       → http://127.0.0.1:8000")
-print("Database  → hospital.db (in this folder)")
-print("Press Ctrl+C to stop everything")
-print("="*70 + "\n")
+    print("Starting services...")
+    if os.path.exists(PREDICTOR_READY):
+        os.remove(PREDICTOR_READY)
+    for s in SERVICES:
+        s.start()
 
-try:
+    announced = False
     while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    stop_all()
-    
\ No newline at end of file
+        for s in SERVICES:
+            if s.check():
+                print(f"[READY] {s.name} in {s.ready_at - t0:.1f}s"
+                      + (f" (restart #{s.restarts})" if s.restarts else ""))
+        if not announced and all(s.ready_at is not None for s in SERVICES):
+            announced = True
+            print("\n" + "="*70)
+            print(f"ALL SERVICES READY IN {time.monotonic() - t0:.1f}s")
+            print(f"Dashboard → http://localhost:{DASHBOARD_PORT}")
+            print(f"API       → http://127.0.0.1:{API_PORT}")
+            print("Database  → hospital.db (in this folder)")
+            print(f"Events    → http://127.0.0.1:{API_PORT}/events")
+            print("Press Ctrl+C to stop everything")
+            print("="*70 + "\n")
+        time.sleep(PROBE_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
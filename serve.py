@@ -0,0 +1,86 @@
+# serve.py - PRODUCTION API SERVER (MULTI-WORKER, PRELOAD CHECKS, GRACEFUL SHUTDOWN)
+"""
+    python serve.py                         # API_WORKERS workers on 127.0.0.1:8000
+    python serve.py --workers 4 --host 0.0.0.0
+
+Unlike `uvicorn api:app --reload` (one worker plus a file watcher) this runs
+several uvicorn worker processes behind one listening socket. Everything
+that only has to happen once is done here, before the workers start:
+
+* hospital.db must already exist (run database.py / run_all.py); tables
+  added since it was created are created (and backfilled) here
+* the database is switched to WAL, so readers in every worker proceed while
+  the predictor writes (journal_mode is persistent in the file)
+* the users/sessions tables are created, and workers are told so through
+  API_PRELOADED=1 instead of re-running the DDL on every login
+* api.py is imported once to fail fast on errors, and the model pickle is
+  loaded once to prove it is readable with the installed scikit-learn
+
+The model load is a pre-flight check only: uvicorn starts the workers as
+fresh processes (spawn, not a fork of this one), so each worker loads its
+own copy of the model at startup (api._load_model) - memory use grows with
+--workers by roughly the size of the model.
+
+Workers share no memory, so every piece of state that must be consistent
+across them lives in hospital.db: sessions are looked up in the sessions
+table on each request. On SIGTERM/SIGINT uvicorn stops accepting, lets
+in-flight requests finish for up to API_GRACEFUL_TIMEOUT seconds, then exits.
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+import database
+import storage
+
+API_WORKERS = int(os.environ.get("API_WORKERS", str(os.cpu_count() or 1)))
+GRACEFUL_TIMEOUT = float(os.environ.get("API_GRACEFUL_TIMEOUT", "10"))
+MODEL_PATH = "real_hospital_model.pkl"  # same file ai_predictor.py trains/loads
+
+
+def preload(db_path=database.DB_PATH):
+    """One-time checks before any worker starts. Exits with a message on failure."""
+    if not os.path.exists(db_path):
+        sys.exit(f"{db_path} not found - run `python database.py --if-missing` first")
+    conn = storage.connect(db_path)
+    mode = storage.init_file(conn)  # switches the file to WAL
+    database.create_schema(conn)  # adds newer tables (e.g. patient_latest) to an older database
+    if not database.schema_ready(db_path):
+        sys.exit(f"{db_path} has no usable schema")
+
+    conn.close()
+    print(f"[OK] {db_path} journal_mode={mode}")
+
+    import api
+    api._ensure_auth_tables()
+    print("[OK] API app imported, auth tables ready")
+
+    if os.path.exists(MODEL_PATH):
+        import joblib
+        model = joblib.load(MODEL_PATH)
+        print(f"[OK] Model {MODEL_PATH} loads ({type(model).__name__}); each worker loads its own copy")
+    else:
+        print(f"[WARN] {MODEL_PATH} not found - ai_predictor.py will train it on first start")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=API_WORKERS)
+    ap.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+
+    preload()
+    os.environ["API_PRELOADED"] = "1"  # inherited by the worker processes
+
+    print(f"API Server → http://{args.host}:{args.port} ({args.workers} workers)")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers,
+                timeout_graceful_shutdown=args.graceful_timeout, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# storage.py - ONE WAY TO OPEN hospital.db, SHARED BY EVERY PROCESS
+"""
+The API, the predictor, both vitals producers and the maintenance scripts all
+open hospital.db through connect(), so they agree on how to share it:
+
+    busy_timeout            a writer waits up to DB_BUSY_TIMEOUT_MS for the
+                            lock instead of failing with "database is locked"
+    synchronous = NORMAL    WAL commits without an fsync each; a power cut can
+                            lose the last transactions, never corrupt the file
+    mmap_size / cache_size  reads served from the page cache / mapped file
+
+Two settings belong to the file, not the connection, and are applied once by
+init_file() where the database is created or migrated (database.init_db,
+serve.py's preload, compact_storage.migrate) rather than on every open:
+
+    auto_vacuum = INCREMENTAL  purge.py reclaims space with it; set before WAL so a
+                            brand-new file gets it, an older file switches at its next VACUUM
+    journal_mode = WAL      readers never block the writer and vice versa
+
+Busy handling: busy_timeout covers waiting for the lock, but SQLite gives up
+immediately when waiting cannot help (a deferred transaction that read, then
+tries to write after another writer committed). Write transactions should
+therefore start with BEGIN IMMEDIATE - write() does, and retries the whole
+transaction with exponential backoff (plus jitter) on SQLITE_BUSY/LOCKED.
+
+Prepared statements: sqlite3 keeps the last STATEMENT_CACHE compiled
+statements per connection, keyed by SQL text, so SQL kept in module
+constants with ? parameters is compiled once per connection.
+
+bench_contention.py measures several writer processes against one file
+with these settings versus a bare sqlite3.connect().
+"""
+import os
+import random
+import sqlite3
+import time
+
+DB_PATH = "hospital.db"
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "NORMAL")              # OFF / NORMAL / FULL
+MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 << 20)))       # bytes, 0 = off
+CACHE_KIB = int(os.environ.get("DB_CACHE_KIB", "16384"))              # page cache per connection
+STATEMENT_CACHE = 256                                                 # prepared statements per connection
+RETRIES = int(os.environ.get("DB_RETRIES", "8"))
+BACKOFF = 0.01       # seconds before the first retry, doubled each time ...
+BACKOFF_MAX = 1.0    # ... up to this
+
+BUSY_CODES = {getattr(sqlite3, "SQLITE_BUSY", 5), getattr(sqlite3, "SQLITE_LOCKED", 6)}
+
+
+def connect(path=DB_PATH, readonly=False, busy_timeout_ms=BUSY_TIMEOUT_MS, row_factory=None,
+            isolation_level="", check_same_thread=True):
+    """Open path with the shared per-connection settings. readonly opens it with mode=ro."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=busy_timeout_ms / 1000,
+                               isolation_level=isolation_level, check_same_thread=check_same_thread,
+                               cached_statements=STATEMENT_CACHE)
+    else:
+        conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=isolation_level,
+                               check_same_thread=check_same_thread, cached_statements=STATEMENT_CACHE)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+    return conn
+
+
+def init_file(conn):
+    """Persistent file settings for a database being created or migrated; returns journal_mode."""
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # before WAL, or a new file keeps NONE
+    # Switching to WAL needs a moment without other connections; it is a no-op once set
+    return with_retry(conn.execute, "PRAGMA journal_mode = WAL").fetchone()[0]
+
+
+def is_busy(error):
+    """True for SQLITE_BUSY / SQLITE_LOCKED ("database is locked"), which are worth retrying."""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return (code & 0xFF) in BUSY_CODES
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def with_retry(fn, *args, retries=RETRIES):
+    """fn(*args), retried with exponential backoff while SQLite reports busy/locked."""
+    delay = BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy(e):
+                raise
+        time.sleep(delay * random.uniform(0.5, 1.0))  # jitter: retrying writers do not collide again
+        delay = min(delay * 2, BACKOFF_MAX)
+
+
+def write(conn, fn, *args, retries=RETRIES, **kwargs):
+    """Run fn(conn, *args, **kwargs) in one BEGIN IMMEDIATE transaction, retried as a whole when busy.
+
+    Returns fn's result. fn must not commit; it may be called more than once.
+    """
+    if conn.in_transaction:
+        raise RuntimeError("storage.write() needs a connection without an open transaction")
+
+    def attempt():
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args, **kwargs)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return result
+
+    return with_retry(attempt, retries=retries)
+
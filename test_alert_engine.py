@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+test_alert_engine.py - Restart checks for alert_engine.py on a non-UTC host
+Run with `python test_alert_engine.py` (or pytest); uses an in-memory database.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import alert_engine
+import database
+from alert_engine import AlertEngine, COOLDOWN_SECONDS
+
+NON_UTC_TZ = "America/New_York"
+
+
+def with_tz(tz, fn):
+    """Run fn() with the process time zone set to tz (POSIX only)."""
+    old = os.environ.get("TZ")
+    os.environ["TZ"] = tz
+    time.tzset()
+    try:
+        return fn()
+    finally:
+        if old is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = old
+        time.tzset()
+
+
+def test_epoch_reads_naive_as_utc():
+    def check():
+        now = 1760000000.0
+        assert alert_engine._epoch(datetime.utcfromtimestamp(now).isoformat()) == now
+        assert alert_engine._epoch("2025-10-09T08:53:20+00:00") == now
+    with_tz(NON_UTC_TZ, check)
+
+
+def test_cooldown_survives_restart():
+    def check():
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(database.SCHEMA)
+        c = conn.cursor()
+        engine = AlertEngine(conn)
+        t0 = time.time() - 3600
+        assert engine.observe(c, "P001", 1, 0.9, 150, 40.0, 85, now=t0) == "opened"
+        for i in range(alert_engine.RESOLVE_AFTER):
+            engine.observe(c, "P001", 2 + i, 0.1, 70, 36.8, 98, now=t0 + 10 + i)
+        conn.commit()
+        resolved_at = t0 + 10 + alert_engine.RESOLVE_AFTER - 1
+
+        restarted = AlertEngine(conn)
+        assert abs(restarted.episodes["P001"].resolved_at - resolved_at) < 1e-3
+        # Long after the cooldown a new critical reading opens a new episode
+        assert restarted.observe(c, "P001", 9, 0.9, 150, 40.0, 85,
+                                 now=resolved_at + COOLDOWN_SECONDS + 60) == "opened"
+    with_tz(NON_UTC_TZ, check)
+
+
+def test_reopen_after_restart_keeps_peak_and_samples():
+    def check():
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(database.SCHEMA)
+        c = conn.cursor()
+        engine = AlertEngine(conn)
+        t0 = time.time() - 3600
+        engine.observe(c, "P001", 1, 0.95, 150, 40.0, 85, now=t0)
+        for i in range(5):
+            engine.observe(c, "P001", 2 + i, 0.8, 140, 39.5, 88, now=t0 + 1 + i)
+        for i in range(alert_engine.RESOLVE_AFTER):
+            engine.observe(c, "P001", 10 + i, 0.1, 70, 36.8, 98, now=t0 + 10 + i)
+        conn.commit()
+        peak, samples = conn.execute("SELECT peak_confidence, samples FROM alerts").fetchone()
+        assert (peak, samples) == (0.95, 9)
+
+        restarted = AlertEngine(conn)
+        now = t0 + 60
+        assert restarted.observe(c, "P001", 20, 0.75, 130, 39.0, 90, now=now) == "reopened"
+        assert restarted.observe(c, "P001", 21, 0.8, 130, 39.0, 90,
+                                 now=now + alert_engine.UPDATE_INTERVAL) == "updated"
+        for i in range(alert_engine.RESOLVE_AFTER):
+            restarted.observe(c, "P001", 30 + i, 0.1, 70, 36.8, 98, now=now + 100 + i)
+        conn.commit()
+        rows = conn.execute("SELECT peak_confidence, samples, handled FROM alerts").fetchall()
+        assert rows == [(0.95, samples + 2 + alert_engine.RESOLVE_AFTER, 1)]
+    with_tz(NON_UTC_TZ, check)
+
+
+def main():
+    tests = [test_epoch_reads_naive_as_utc, test_cooldown_survives_restart,
+             test_reopen_after_restart_keeps_peak_and_samples]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\nResult: {len(tests)}/{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -137,6 +137,106 @@ def test_vitals_history():
         print(f"❌ Failed: {e}")
         return False
 
+def test_ward_early_warning():
+    """Test 6: NEWS2 Ward View"""
+    print_header("TEST 6: Early-Warning Ward View (/ward/early-warning)")
+    try:
+        response = requests.get(f"{BASE_URL}/ward/early-warning?limit=5", timeout=5)
+        if response.status_code == 200:
+            ward = response.json()
+            print(f"✅ Retrieved NEWS2 scores for {len(ward)} patient(s)")
+            for w in ward[:3]:
+                print(f"\n   {w['full_name']} ({w['patient_id']})")
+                print(f"   ├─ NEWS2: {w['news2_score']} ({w['clinical_risk']})")
+                print(f"   └─ Incomplete vitals: {w['incomplete']}")
+            return True
+        else:
+            print(f"❌ Error: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        return False
+
+def test_top_risk_patients():
+    """Test 7: Top-K Highest-Risk Patients"""
+    print_header("TEST 7: Top Risk Patients (/patients?sort=confidence&limit=3)")
+    try:
+        response = requests.get(f"{BASE_URL}/patients?sort=confidence&limit=3", timeout=5)
+        if response.status_code == 200:
+            patients = response.json()
+            confidences = [p['confidence'] for p in patients]
+            if len(patients) > 3 or confidences != sorted(confidences, reverse=True):
+                print(f"❌ Expected at most 3 patients by descending risk, got {confidences}")
+                return False
+            print(f"✅ Retrieved {len(patients)} highest-risk patient(s)")
+            for p in patients:
+                print(f"   {p['patient_id']}: {p['risk_level']} ({p['confidence']:.1%})")
+            return True
+        else:
+            print(f"❌ Error: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        return False
+
+def test_predict():
+    """Test 8: On-Demand Risk Scoring"""
+    print_header("TEST 8: On-Demand Scoring (POST /predict)")
+    readings = [
+        {"heart_rate_bpm": 150, "temperature_c": 40.1, "spo2_percent": 82},
+        {"heart_rate_bpm": 72, "temperature_c": 36.8, "spo2_percent": 98},
+    ]
+    try:
+        response = requests.post(f"{BASE_URL}/predict", json=readings, timeout=10)
+        if response.status_code == 200:
+            data = response.json()
+            predictions = data['predictions']
+            if len(predictions) != len(readings):
+                print(f"❌ Expected {len(readings)} predictions, got {len(predictions)}")
+                return False
+            print(f"✅ Scored {len(predictions)} readings with {data['model']}")
+            for r, p in zip(readings, predictions):
+                print(f"   HR {r['heart_rate_bpm']} / {r['temperature_c']}°C / SpO2 {r['spo2_percent']}% → "
+                      f"{p['predicted_label']} ({p['risk_score']:.1%}, {p['stage']})")
+            return True
+        else:
+            print(f"❌ Error: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        return False
+
+def test_sync():
+    """Test 9: Delta Sync"""
+    print_header("TEST 9: Delta Sync (GET /sync)")
+    username = f"sync_test_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    try:
+        response = requests.post(f"{BASE_URL}/auth/register",
+                                 json={"username": username, "password": "sync-test"}, timeout=5)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = requests.get(f"{BASE_URL}/sync", headers=headers, timeout=10)
+        if response.status_code != 200:
+            print(f"❌ Error: {response.status_code}")
+            return False
+        first = response.json()
+        print(f"✅ First sync: {len(first['vitals'])} vitals, {len(first['predictions'])} predictions, "
+              f"{len(first['alerts'])} alerts for {first['patients'] or 'no linked patient'}")
+        print(f"   Content-Encoding: {response.headers.get('Content-Encoding', 'identity')}")
+        response = requests.get(f"{BASE_URL}/sync", params={"since": first['cursor']}, headers=headers, timeout=10)
+        if response.status_code != 200:
+            print(f"❌ Error on delta sync: {response.status_code}")
+            return False
+        delta = response.json()
+        print(f"✅ Delta sync: {len(delta['vitals'])} new vitals, {len(delta['predictions'])} new predictions, "
+              f"{len(delta['alerts'])} changed alerts ({len(response.content)} bytes)")
+        if requests.get(f"{BASE_URL}/sync", timeout=5).status_code != 401:
+            print("❌ /sync answered without a token")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ Failed: {e}")
+        return False
+
 def main():
     print(f"\n{'='*60}")
     print(f"  BACKEND-MOBILE APP INTEGRATION TEST")
@@ -156,6 +256,10 @@ def main():
     results.append(("Get Alerts", test_get_alerts()))
     results.append(("Dashboard Summary", test_dashboard_summary()))
     results.append(("Vitals History", test_vitals_history()))
+    results.append(("Ward Early Warning", test_ward_early_warning()))
+    results.append(("Top Risk Patients", test_top_risk_patients()))
+    results.append(("On-Demand Scoring", test_predict()))
+    results.append(("Delta Sync", test_sync()))
     
     # Summary
     print_header("TEST SUMMARY")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+test_backfill.py - Resume checks for backfill.py
+Run with `python test_backfill.py` (or pytest); uses a throw-away database
+and the real model file.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import backfill
+import database
+from ai_predictor import MODEL_PATH
+from compact_storage import insert_vitals
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), MODEL_PATH)
+
+
+def add_vitals(path, n):
+    conn = sqlite3.connect(path)
+    for i in range(n):
+        insert_vitals(conn, datetime.utcnow().isoformat(), "P001", 70 + i % 60, 36.5 + (i % 30) / 10, 90 + i % 10)
+    conn.commit()
+    conn.close()
+
+
+def unscored(path):
+    conn = sqlite3.connect(path)
+    missing = conn.execute("""SELECT COUNT(*) FROM vitals v WHERE NOT EXISTS
+                              (SELECT 1 FROM prediction_versions p WHERE p.vitals_id = v.id)""").fetchone()[0]
+    conn.close()
+    return missing
+
+
+def run_backfill(path, chunk):
+    backfill.main(["--db", path, "--model", MODEL, "--version", "test", "--workers", "1",
+                   "--chunk", str(chunk)])
+
+
+def test_pending_chunks():
+    assert backfill.pending_chunks([], 1, 25, 10) == [(1, 11), (11, 21), (21, 26)]
+    # The range grew past the last checkpoint: only the new ids are left
+    assert backfill.pending_chunks([(1, 11), (11, 21), (21, 26)], 1, 40, 10) == [(26, 36), (36, 41)]
+    # A smaller --chunk must not count (1, 6) as done just because it starts at 1
+    assert backfill.pending_chunks([(1, 11)], 1, 30, 20) == [(11, 31)]
+    assert backfill.pending_chunks([(1, 6), (11, 16)], 1, 20, 20) == [(6, 11), (16, 21)]
+    assert backfill.pending_chunks([(1, 21)], 1, 20, 7) == []
+
+
+def test_resume_after_growth_and_chunk_change():
+    workdir = tempfile.mkdtemp(prefix="test_backfill_")
+    path = os.path.join(workdir, "hospital.db")
+    try:
+        database.init_db(path)
+        add_vitals(path, 48)
+        run_backfill(path, 20)
+        assert unscored(path) == 0
+
+        add_vitals(path, 30)      # last chunk (41, 51) now starts a longer range
+        run_backfill(path, 20)
+        assert unscored(path) == 0
+
+        add_vitals(path, 25)      # resumed with a different --chunk
+        run_backfill(path, 7)
+        assert unscored(path) == 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    tests = [test_pending_chunks, test_resume_after_growth_and_chunk_change]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\nResult: {len(tests)}/{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
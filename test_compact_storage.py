@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+test_compact_storage.py - The compact views must return exactly what the legacy tables held
+Run with `python test_compact_storage.py` (or pytest); uses throw-away databases.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import api
+import compact_storage
+import database
+import storage
+from compact_storage import insert_vitals
+from write_behind import PREDICTION_SQL
+
+TIMESTAMPS = [
+    "2026-03-01T08:15:30.123456+00:00",   # producers: datetime.now(timezone.utc).isoformat()
+    "2026-03-01T08:15:30.999999",         # predictor: datetime.utcnow().isoformat()
+    "2026-03-01T08:15:31+00:00",          # isoformat() drops a zero fraction
+    "2026-03-01T08:15:31",
+    "2026-03-01T08:15:31.5Z",             # anything else is kept verbatim
+    "2026-03-01 10:15:31.250+02:00",
+    None,
+]
+
+
+def payload(hr, temp, spo2, **dumps_kwargs):
+    return json.dumps({"heart_rate_bpm": hr, "temperature_c": temp, "spo2_percent": spo2,
+                       "systolic_bp": 120, "diastolic_bp": 80, "rr": 16}, **dumps_kwargs)
+
+
+def fill(conn):
+    """Vitals and predictions in every text shape the producers, the predictor and humans write."""
+    for i, ts in enumerate(TIMESTAMPS):
+        hr, temp, spo2 = 70 + i, 36.5 + i / 10, 95
+        raw = [payload(hr, temp, spo2), payload(hr, temp, spo2, separators=(",", ":")),
+               payload(hr, temp, spo2, indent=1), '{"heart_rate_bpm": 1}', None][i % 5]
+        vid = insert_vitals(conn, ts, "P001", hr, temp, spo2, 120, 80, 16,
+                            health_status="NORMAL", device_id="DEV-1", raw_payload=raw)
+        detail = {"risk_score": 0.25, "hr": hr, "temp": temp, "spo2": spo2, "stage": "low",
+                  "trend": {"hr_slope": 0.125, "spo2_min": 94.0}}
+        prediction_json = [json.dumps(detail), json.dumps(detail, separators=(",", ":")),
+                           json.dumps({**detail, "hr": 1}), "not json", None][i % 5]
+        conn.execute(PREDICTION_SQL, (ts, "P001", "m", prediction_json, "Low Risk", 0.25, vid, "low"))
+    conn.commit()
+
+
+def dump(conn):
+    return {name: conn.execute(f"SELECT * FROM {name} ORDER BY 1").fetchall()
+            for name in ("vitals", "predictions", "patient_latest")}
+
+
+def new_db(workdir, name, compact=False):
+    path = os.path.join(workdir, name)
+    database.init_db(path)
+    conn = sqlite3.connect(path)
+    if compact:
+        compact_storage.migrate(conn)
+    for table in ("predictions", "vitals", "patient_latest"):
+        conn.execute(f"DELETE FROM {table}")  # the demo seed is stamped with the current time
+    conn.commit()
+    return conn
+
+
+def test_migrate_keeps_text():
+    workdir = tempfile.mkdtemp(prefix="test_compact_")
+    try:
+        conn = new_db(workdir, "hospital.db")
+        fill(conn)
+        before = dump(conn)
+        assert compact_storage.migrate(conn)
+        assert dump(conn) == before
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_compact_inserts_match_legacy():
+    workdir = tempfile.mkdtemp(prefix="test_compact_")
+    try:
+        legacy = new_db(workdir, "legacy.db")
+        compact = new_db(workdir, "compact.db", compact=True)
+        fill(legacy)
+        fill(compact)
+        assert dump(compact) == dump(legacy)
+        rows = compact.execute("SELECT ts_text, raw_payload FROM vitals_store ORDER BY id").fetchall()
+        # Only each table's own isoformat() spelling is rebuilt; the rest is kept as text
+        assert [t for t, _ in rows] == [None, *TIMESTAMPS[1:]]
+        assert rows[0][1] is None and rows[1][1] is None     # nor are payloads the columns rebuild
+        stored = compact.execute("SELECT ts_text, derived FROM predictions_store ORDER BY id").fetchall()
+        assert [t for t, _ in stored] == [TIMESTAMPS[0], None, *TIMESTAMPS[2:]]
+        assert [d for _, d in stored[:5]] == [2, 1, 0, 0, 0]  # json.dumps(), compact, verbatim
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def test_to_ms_matches_ts_ms():
+    workdir = tempfile.mkdtemp(prefix="test_compact_")
+    try:
+        conn = new_db(workdir, "hospital.db", compact=True)
+        fill(conn)
+        # Exact for the rebuilt spelling; text timestamps are rounded to the millisecond
+        for table, exact in (("vitals_store", [0, 2, 3]), ("predictions_store", [1, 2, 3])):
+            stored = [ms for ms, in conn.execute(f"SELECT ts_ms FROM {table} ORDER BY id")]
+            assert [stored[i] for i in exact] == [compact_storage.to_ms(TIMESTAMPS[i]) for i in exact]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def api_reads(conn):
+    """What the API endpoints return for P001 (the /sync cursor holds the read time, so it is left out)."""
+    reads = {"history": api._read_vitals_history(conn, "P001", 5),
+             "detail": api._read_patient_detail(conn, "P001"),
+             "ward": [tuple(r) for r in api._read_ward_vitals(conn)]}
+    for name, cursor in (("sync", None), ("sync after", {"v": 3, "p": 3, "a": 0, "u": "2026-01-01T00:00:00"})):
+        body = json.loads(api._read_sync(conn, "token", cursor, False)[0])
+        del body["cursor"]
+        reads[name] = body
+    return reads
+
+
+def test_api_reads_match_legacy():
+    workdir = tempfile.mkdtemp(prefix="test_compact_")
+    try:
+        legacy = new_db(workdir, "legacy.db")
+        legacy.executescript("""
+            CREATE TABLE sessions (token TEXT PRIMARY KEY, user_id INTEGER NOT NULL, expires_at TEXT NOT NULL);
+            CREATE TABLE user_patients (user_id INTEGER PRIMARY KEY, patient_id TEXT UNIQUE NOT NULL);
+            INSERT INTO sessions VALUES ('token', 1, '9999-01-01T00:00:00');
+            INSERT INTO user_patients VALUES (1, 'P001');
+        """)
+        fill(legacy)
+        legacy.close()
+        shutil.copy(os.path.join(workdir, "legacy.db"), os.path.join(workdir, "compact.db"))
+        conns = [storage.connect(os.path.join(workdir, name), row_factory=sqlite3.Row)
+                 for name in ("legacy.db", "compact.db")]
+        assert compact_storage.migrate(conns[1])
+        for conn in conns:
+            fill(conn)  # rows written through the views after the conversion too
+        legacy_reads, compact_reads = (api_reads(conn) for conn in conns)
+        assert len(json.loads(legacy_reads["history"])) == 5
+        assert legacy_reads["sync"]["vitals"] and legacy_reads["sync after"]["predictions"]
+        assert compact_reads == legacy_reads
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    tests = [test_migrate_keeps_text, test_compact_inserts_match_legacy, test_to_ms_matches_ts_ms,
+             test_api_reads_match_legacy]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\nResult: {len(tests)}/{len(tests)} tests passed")
+
+
+if __name__ == "__main__":
+    main()
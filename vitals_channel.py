@@ -0,0 +1,176 @@
+# vitals_channel.py - SHARED-MEMORY RING BUFFER FOR LATEST VITALS (PRODUCER → PREDICTOR)
+"""
+Lets generate_vitals.py / data_simulator.py hand new readings straight to
+ai_predictor.py through a multiprocessing.shared_memory ring of fixed-size
+records, instead of the predictor discovering them by polling SQLite.
+SQLite stays the durable store: producers publish only AFTER their commit
+(so every record carries a real vitals id) and the predictor keeps a slow DB
+poll as a backstop for anything the channel missed.
+
+Layout (little-endian):
+
+    header  : magic "VCH1" | capacity u32 | record size u32 | pad | write_seq u64
+    slot[i] : seq u64 | vitals_id i64 | ts_ms i64 | hr, temp, spo2, sbp, dbp, rr f64
+              | patient_id 16s | health_status 12s
+
+One ring per producer (single writer, so no cross-process locking is
+needed). The writer fills a slot, stamps the slot's seq, then bumps
+write_seq. A reader re-checks the slot seq after copying the payload and
+drops the record if the writer lapped it meanwhile; records overwritten
+before they were read are reported as `missed` and left to the DB poll.
+
+Segments outlive their producer on purpose (a restarted producer continues
+the sequence and the consumer stays attached). `python vitals_channel.py
+--unlink` removes them.
+"""
+import os
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+CHANNELS = ["hospital_vitals_generator", "hospital_vitals_simulator"]
+CAPACITY = 4096
+ENABLED = os.environ.get("VITALS_CHANNEL", "1") != "0"
+
+MAGIC = b"VCH1"
+HEADER = struct.Struct("<4sII4xQ")          # magic, capacity, record size, write_seq
+RECORD = struct.Struct("<Qqq6d16s12s")      # seq, vitals_id, ts_ms, 6 vitals, patient, status
+SEQ = struct.Struct("<Q")
+WRITE_SEQ_OFFSET = 16
+
+
+def _open(name, create, size=0):
+    # Never let multiprocessing's resource tracker unlink a segment when one
+    # process exits - producer and consumer lifetimes are independent.
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _nan(x):
+    return float("nan") if x is None else float(x)
+
+
+def _none(x, cast=float):
+    return None if x != x else cast(x)  # NaN -> None
+
+
+class VitalsChannel:
+    def __init__(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        magic, self.capacity, record_size, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"shared memory segment {shm.name!r} is not a vitals channel")
+        self.read_seq = self.write_seq()
+
+    # ------------------------------------------------------------ open / close
+    @classmethod
+    def create(cls, name, capacity=CAPACITY):
+        """Producer side: create the ring, or reuse it (and its sequence) after a restart."""
+        size = HEADER.size + capacity * RECORD.size
+        try:
+            shm = _open(name, True, size)
+            HEADER.pack_into(shm.buf, 0, MAGIC, capacity, RECORD.size, 0)
+        except FileExistsError:
+            shm = _open(name, False)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        """Consumer side: attach to an existing ring; None if the producer has not created it yet."""
+        try:
+            return cls(_open(name, False))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    # ------------------------------------------------------------ producer
+    def write_seq(self):
+        return SEQ.unpack_from(self.buf, WRITE_SEQ_OFFSET)[0]
+
+    def publish(self, vitals_id, patient_id, ts, hr, temp, spo2,
+                sbp=None, dbp=None, rr=None, status=None):
+        """Publish one committed reading. ts is epoch seconds (defaults to now)."""
+        seq = self.write_seq() + 1
+        off = HEADER.size + ((seq - 1) % self.capacity) * RECORD.size
+        SEQ.pack_into(self.buf, off, 0)  # slot is being rewritten
+        RECORD.pack_into(self.buf, off, 0, vitals_id, int((ts or time.time()) * 1000),
+                         _nan(hr), _nan(temp), _nan(spo2), _nan(sbp), _nan(dbp), _nan(rr),
+                         patient_id.encode()[:16], (status or "").encode()[:12])
+        SEQ.pack_into(self.buf, off, seq)
+        SEQ.pack_into(self.buf, WRITE_SEQ_OFFSET, seq)
+
+    # ------------------------------------------------------------ consumer
+    def read(self):
+        """Return (records, missed) published since the previous read().
+
+        Each record is a dict with vitals_id, patient_id, ts (epoch seconds),
+        heart_rate_bpm, temperature_c, spo2_percent, systolic_bp,
+        diastolic_bp, rr and health_status.
+        """
+        head = self.write_seq()
+        if head < self.read_seq:          # segment was recreated
+            self.read_seq = 0
+        start = max(self.read_seq, head - self.capacity)
+        missed = start - self.read_seq
+        records = []
+        for seq in range(start + 1, head + 1):
+            off = HEADER.size + ((seq - 1) % self.capacity) * RECORD.size
+            fields = RECORD.unpack_from(self.buf, off)
+            if fields[0] != seq or SEQ.unpack_from(self.buf, off)[0] != seq:
+                missed += 1               # lapped by the producer while reading
+                continue
+            _, vid, ts_ms, hr, temp, spo2, sbp, dbp, rr, pid, status = fields
+            records.append({
+                "vitals_id": vid,
+                "patient_id": pid.rstrip(b"\0").decode(),
+                "ts": ts_ms / 1000.0,
+                "heart_rate_bpm": _none(hr, int),
+                "temperature_c": _none(temp),
+                "spo2_percent": _none(spo2, int),
+                "systolic_bp": _none(sbp, int),
+                "diastolic_bp": _none(dbp, int),
+                "rr": _none(rr, int),
+                "health_status": status.rstrip(b"\0").decode() or None,
+            })
+        self.read_seq = head
+        return records, missed
+
+
+def open_producer(name):
+    """Create the producer ring, or None when the channel is disabled/unavailable."""
+    if not ENABLED:
+        return None
+    try:
+        return VitalsChannel.create(name)
+    except OSError as e:
+        print(f"[WARN] vitals channel {name} unavailable ({e}); SQLite only")
+        return None
+
+
+if __name__ == "__main__":
+    if "--unlink" in sys.argv:
+        for name in CHANNELS:
+            try:
+                shm = shared_memory.SharedMemory(name=name)  # tracked, so unlink() unregisters it cleanly
+                shm.close()
+                shm.unlink()
+                print(f"removed {name}")
+            except FileNotFoundError:
+                pass
+    else:
+        for name in CHANNELS:
+            ch = VitalsChannel.attach(name)
+            print(f"{name}: " + (f"write_seq={ch.write_seq()} capacity={ch.capacity}" if ch else "not created"))
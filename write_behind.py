@@ -0,0 +1,204 @@
+# write_behind.py - BATCHED WRITE-BEHIND FOR PREDICTIONS AND ALERTS
+"""
+Buffers INSERT/UPDATE statements from the predictor and flushes them in one
+short transaction (BEGIN IMMEDIATE ... executemany ... COMMIT), so the
+SQLite write lock is held only for the flush itself - never while the model
+is scoring.
+
+A flush happens when the buffer reaches max_batch statements, when the
+oldest buffered statement is older than max_delay seconds (checked on every
+execute() and maybe_flush()), or on flush()/close().
+
+Consecutive statements with the same SQL are sent with executemany; the
+original order of statements is always preserved, which the alert episode
+UPDATEs rely on.
+
+DURABILITY
+----------
+* A record handed to execute()/add_prediction() is NOT durable. It lives in
+  process memory until the next successful flush.
+* A crash or kill -9 loses at most the unflushed buffer: up to max_batch
+  statements or max_delay seconds of work.
+* Each flush is one transaction: either every buffered statement commits or
+  none does. A failed flush (e.g. "database is locked") is rolled back, the
+  statements stay buffered in order and are retried after max_delay.
+* The buffer holds at most max_buffered statements. When flushes keep
+  failing and it fills up, execute() blocks the caller (retrying the flush
+  every max_delay) instead of growing without limit or dropping statements
+  the alert episodes depend on. Each such wait is logged and counted in the
+  metrics (full_waits, full_wait_ms_total).
+* Nothing is lost permanently by a crash: predictions are derived from
+  vitals, and vitals without a committed prediction are picked up again by
+  ai_predictor.py; AlertEngine rebuilds its state from committed alert rows.
+
+on_flush(ops), if given, is called with the committed (sql, params) list
+after every successful flush - the predictor uses it to announce new
+predictions/alerts on the event bus (event_bus.py) only once they are
+visible to other processes.
+
+Metrics (see metrics()) are also written as JSON to metrics_path after each
+flush so they can be inspected from outside the process.
+"""
+import json
+import os
+import sqlite3
+import time
+
+import storage
+
+MAX_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", "200"))
+MAX_DELAY = float(os.environ.get("WRITE_BEHIND_DELAY", "1.0"))
+MAX_BUFFERED = int(os.environ.get("WRITE_BEHIND_MAX_BUFFERED", "20000"))
+METRICS_PATH = "write_behind_metrics.json"
+
+PREDICTION_SQL = """INSERT INTO predictions
+    (timestamp_utc, patient_id, model_name, prediction_json, predicted_label, confidence, vitals_id, stage)
+    VALUES (?,?,?,?,?,?,?,?)"""
+
+
+class WriteBehindWriter:
+    def __init__(self, db_path="hospital.db", max_batch=MAX_BATCH, max_delay=MAX_DELAY,
+                 metrics_path=METRICS_PATH, on_flush=None, max_buffered=MAX_BUFFERED):
+        # isolation_level=None: transactions are managed explicitly in flush()
+        self.conn = storage.connect(db_path, isolation_level=None)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_buffered = max(max_buffered, max_batch)
+        self.metrics_path = metrics_path
+        self.on_flush = on_flush
+        self._ops = []
+        self._oldest = None
+        self._retry_at = 0.0
+        self._pending_vitals = set()
+        self._stats = {
+            "flushes": 0,
+            "failed_flushes": 0,
+            "statements_written": 0,
+            "last_flush_statements": 0,
+            "last_flush_utc": None,
+            "last_error": None,
+            "lock_ms_last": 0.0,
+            "lock_ms_max": 0.0,
+            "lock_ms_total": 0.0,
+            "full_waits": 0,
+            "full_wait_ms_total": 0.0,
+        }
+
+    # -------------------------------------------------------------- buffering
+    def execute(self, sql, params=()):
+        """Queue a statement (cursor-compatible, so AlertEngine can write through it)."""
+        if len(self._ops) >= self.max_buffered:
+            self._wait_for_room()
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._ops.append((sql, params))
+        self.maybe_flush()
+
+    def add_prediction(self, params):
+        """Queue a predictions row; params follow PREDICTION_SQL."""
+        self._pending_vitals.add(params[6])
+        self.execute(PREDICTION_SQL, params)
+
+    def pending_vitals(self):
+        """Vitals ids scored but not yet committed, sorted (empty when nothing is pending).
+
+        The predictor polls with `v.id NOT IN (...)` these ids so it never
+        re-scores a row whose prediction is still sitting in the buffer.
+        """
+        return sorted(self._pending_vitals)
+
+    def seconds_until_flush(self):
+        """How long the caller may block before maybe_flush() has work to do (inf when idle)."""
+        if not self._ops:
+            return float("inf")
+        due = max(self._oldest + self.max_delay, self._retry_at)
+        return max(0.0, due - time.monotonic())
+
+    def maybe_flush(self):
+        if not self._ops or time.monotonic() < self._retry_at:
+            return False
+        if len(self._ops) >= self.max_batch or time.monotonic() - self._oldest >= self.max_delay:
+            return self.flush()
+        return False
+
+    def _wait_for_room(self):
+        """The buffer is full because flushes keep failing: block until one succeeds."""
+        self._stats["full_waits"] += 1
+        print(f"[WARN] write-behind buffer full ({len(self._ops)} statements, "
+              f"{self._stats['failed_flushes']} failed flushes so far) - waiting for the database")
+        t0 = time.monotonic()
+        while not self.flush():
+            time.sleep(self.max_delay)
+        waited_ms = (time.monotonic() - t0) * 1000
+        self._stats["full_wait_ms_total"] = round(self._stats["full_wait_ms_total"] + waited_ms, 3)
+        print(f"[OK] write-behind buffer flushed after {waited_ms / 1000:.1f}s")
+
+    # -------------------------------------------------------------- flushing
+    def flush(self):
+        """Write everything buffered in one transaction. Returns True on success."""
+        if not self._ops:
+            return True
+        ops = self._ops
+        t0 = time.perf_counter()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            i = 0
+            while i < len(ops):
+                sql = ops[i][0]
+                j = i
+                while j < len(ops) and ops[j][0] == sql:
+                    j += 1
+                self.conn.executemany(sql, [p for _, p in ops[i:j]])
+                i = j
+            self.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            self._stats["failed_flushes"] += 1
+            self._stats["last_error"] = str(e)
+            self._retry_at = time.monotonic() + self.max_delay  # back off before retrying
+            self._write_metrics()
+            return False
+
+        lock_ms = (time.perf_counter() - t0) * 1000
+        s = self._stats
+        s["flushes"] += 1
+        s["statements_written"] += len(ops)
+        s["last_flush_statements"] = len(ops)
+        s["last_flush_utc"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        s["lock_ms_last"] = round(lock_ms, 3)
+        s["lock_ms_max"] = round(max(s["lock_ms_max"], lock_ms), 3)
+        s["lock_ms_total"] = round(s["lock_ms_total"] + lock_ms, 3)
+        self._ops = []
+        self._oldest = None
+        self._retry_at = 0.0
+        self._pending_vitals.clear()
+        self._write_metrics()
+        if self.on_flush is not None:
+            self.on_flush(ops)
+        return True
+
+    # -------------------------------------------------------------- metrics
+    def metrics(self):
+        m = dict(self._stats)
+        m["pending_statements"] = len(self._ops)
+        m["max_batch"] = self.max_batch
+        m["max_buffered"] = self.max_buffered
+        m["max_delay_s"] = self.max_delay
+        m["lock_ms_avg"] = round(m["lock_ms_total"] / m["flushes"], 3) if m["flushes"] else 0.0
+        return m
+
+    def _write_metrics(self):
+        if not self.metrics_path:
+            return
+        tmp = self.metrics_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.metrics(), f, indent=2)
+            os.replace(tmp, self.metrics_path)
+        except OSError:
+            pass  # metrics are best effort, never fail a flush over them
+
+    def close(self):
+        self.flush()
+        self.conn.close()